@@ -0,0 +1,91 @@
+# benchmarks/bench_numero_orden.py
+"""
+Velocidad de inserción de pedidos con cada generador de numero_orden.
+Cada pedido se crea en su propia transacción, como en la compra. Escribe
+en la base de DATABASE_URL (úsese una base de pruebas ya migrada) y borra
+los pedidos que crea al terminar.
+
+    python benchmarks/bench_numero_orden.py [--pedidos 20000] [--previos 200000]
+
+``--previos`` carga antes ese número de pedidos para que el índice único
+sea grande: ahí es donde las claves aleatorias dispersan las escrituras.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'libreria_online.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from decimal import Decimal  # noqa: E402
+
+from django.db import IntegrityError, connection, transaction  # noqa: E402
+
+from pedidos.models import Pedido  # noqa: E402
+from pedidos.numeracion import GeneradorSecuencial, GeneradorUUID  # noqa: E402
+from usuarios.models import Usuario  # noqa: E402
+
+GENERADORES = {
+    'uuid4[:10]': GeneradorUUID,
+    'secuencial': GeneradorSecuencial,
+}
+
+
+def insertar(usuario, generador, cantidad):
+    """Devuelve (segundos, números, colisiones). Una colisión es un IntegrityError en plena compra."""
+    numeros = []
+    colisiones = 0
+    inicio = time.perf_counter()
+    while len(numeros) < cantidad:
+        try:
+            with transaction.atomic():
+                numero = generador.generar()
+                Pedido.objects.create(usuario=usuario, total=Decimal('10.00'), numero_orden=numero)
+        except IntegrityError:
+            colisiones += 1
+            continue
+        numeros.append(numero)
+    return time.perf_counter() - inicio, numeros, colisiones
+
+
+def cargar_previos(usuario, cantidad, generador):
+    lote = 5_000
+    for desde in range(0, cantidad, lote):
+        Pedido.objects.bulk_create([
+            Pedido(usuario=usuario, total=Decimal('10.00'), numero_orden=generador.generar())
+            for _ in range(min(lote, cantidad - desde))
+        ], ignore_conflicts=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pedidos', type=int, default=20_000)
+    parser.add_argument('--previos', type=int, default=200_000)
+    args = parser.parse_args()
+
+    usuario, _ = Usuario.objects.get_or_create(username='bench_numero_orden',
+                                               defaults={'email': 'bench_numero_orden@example.com'})
+    print(f"Base: {connection.vendor}, {args.previos} pedidos previos, {args.pedidos} inserciones por generador")
+    print(f"{'generador':>12} {'s':>8} {'pedidos/s':>10} {'en orden %':>11} {'colisiones':>11}")
+    try:
+        for nombre, clase in GENERADORES.items():
+            Pedido.objects.filter(usuario=usuario).delete()
+            generador = clase()
+            cargar_previos(usuario, args.previos, generador)
+            segundos, numeros, colisiones = insertar(usuario, generador, args.pedidos)
+            # Porcentaje de claves mayores que la anterior: inserciones al final del índice
+            en_orden = sum(b > a for a, b in zip(numeros, numeros[1:])) / max(len(numeros) - 1, 1)
+            print(f"{nombre:>12} {segundos:>8.2f} {args.pedidos / segundos:>10.0f} "
+                  f"{en_orden * 100:>11.1f} {colisiones:>11}")
+    finally:
+        Pedido.objects.filter(usuario=usuario).delete()
+        usuario.delete()
+
+
+if __name__ == '__main__':
+    main()
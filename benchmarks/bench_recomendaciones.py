@@ -0,0 +1,65 @@
+# benchmarks/bench_recomendaciones.py
+"""
+Tiempo de construcción de la matriz de co-compra frente al número de
+líneas de pedido, con datos sintéticos (no toca la base de datos).
+
+    python benchmarks/bench_recomendaciones.py [--libros 50000] [--tamanos 10000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'libreria_online.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from pedidos.recomendaciones import construir_matriz, mejores_vecinos  # noqa: E402
+
+
+def lineas_sinteticas(n_lineas, n_libros, semilla=0):
+    # Pedidos de 1 a 5 líneas; la popularidad de los libros sigue una ley de Zipf
+    rng = np.random.default_rng(semilla)
+    tamanos = rng.integers(1, 6, size=n_lineas)
+    pedidos = np.repeat(np.arange(len(tamanos)), tamanos)[:n_lineas]
+    libros = (rng.zipf(1.3, size=n_lineas) - 1) % n_libros + 1
+    return zip(pedidos.tolist(), libros.tolist())
+
+
+def medir(n_lineas, n_libros, lote):
+    libro_ids = np.arange(1, n_libros + 1)
+    lineas = lineas_sinteticas(n_lineas, n_libros)
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    matriz = construir_matriz(lineas, libro_ids, lineas_por_lote=lote)
+    construccion = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for fila in range(n_libros):
+        mejores_vecinos(matriz, libro_ids, fila)
+    vecinos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return construccion, vecinos, matriz.nnz, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--libros', type=int, default=50_000)
+    parser.add_argument('--lote', type=int, default=200_000)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'lineas':>10} {'matriz (s)':>11} {'top-N (s)':>10} {'pares':>10} {'pico MB':>8}")
+    for n_lineas in args.tamanos:
+        construccion, vecinos, pares, pico = medir(n_lineas, args.libros, args.lote)
+        print(f"{n_lineas:>10} {construccion:>11.2f} {vecinos:>10.2f} {pares:>10} {pico / 2**20:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# carrito/invitado.py
+"""
+Carrito de los visitantes sin sesión iniciada. Vive en una cookie firmada
+({libro_id: cantidad}), así que mirar y cambiar el carrito no escribe en
+la base de datos: solo se leen los libros para pintarlo y validar el
+stock. Al iniciar sesión se fusiona con el Carrito del usuario
+(ver carrito.models.fusionar_carrito_invitado).
+"""
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+
+from libros.models import Libro
+from .models import Carrito, ItemCarrito
+from .operaciones import ResultadoActualizacion
+from .reservas import ajustar_reservas, vencimiento
+
+COOKIE = 'carrito'
+SAL = 'carrito.invitado'
+DURACION = 60 * 60 * 24 * 30
+# Una cookie no debe pasar de ~4 KB
+MAX_LINEAS = 50
+
+
+class CarritoInvitado:
+    def __init__(self, lineas=None):
+        self.lineas = dict(lineas or {})
+        self.modificado = False
+
+    @classmethod
+    def desde_peticion(cls, request):
+        valor = request.COOKIES.get(COOKIE)
+        if not valor:
+            return cls()
+        try:
+            pares = signing.loads(valor, salt=SAL, max_age=DURACION)
+            return cls({int(libro_id): int(cantidad) for libro_id, cantidad in pares if int(cantidad) > 0})
+        except (signing.BadSignature, TypeError, ValueError):
+            # Cookie caducada, manipulada o de otro formato: se empieza de cero
+            carrito = cls()
+            carrito.modificado = True
+            return carrito
+
+    def __bool__(self):
+        return bool(self.lineas)
+
+    def cantidad_de(self, libro_id):
+        return self.lineas.get(libro_id, 0)
+
+    def fijar(self, libro_id, cantidad):
+        if cantidad > 0:
+            self.lineas[libro_id] = cantidad
+        else:
+            self.lineas.pop(libro_id, None)
+        self.modificado = True
+
+    def sumar(self, libro, cantidad=1):
+        """Como sumar_al_carrito, sin reservar: la nueva cantidad, o None si no hay unidades libres."""
+        nueva = self.cantidad_de(libro.id) + cantidad
+        if nueva > libro.unidades_disponibles or (libro.id not in self.lineas and len(self.lineas) >= MAX_LINEAS):
+            return None
+        self.fijar(libro.id, nueva)
+        return nueva
+
+    def vaciar(self):
+        self.lineas = {}
+        self.modificado = True
+
+    def lineas_con_libros(self):
+        """ItemCarrito sin guardar (id = id del libro) con su libro y subtotal, en una consulta."""
+        libros = (Libro.objects.filter(id__in=list(self.lineas))
+                  .select_related('autor')
+                  .only('id', 'titulo', 'precio', 'stock', 'reservado', 'autor__nombre')
+                  .order_by('id'))
+        lineas = []
+        for libro in libros:
+            linea = ItemCarrito(id=libro.id, libro=libro, cantidad=self.lineas[libro.id])
+            linea.subtotal = libro.precio * linea.cantidad
+            lineas.append(linea)
+        return lineas
+
+    def actualizar(self, cantidades):
+        """Como operaciones.actualizar_cantidades, validando el stock con una consulta de Libro."""
+        cantidades = {libro_id: cantidad for libro_id, cantidad in cantidades.items() if libro_id in self.lineas}
+        cambiadas, eliminadas, sin_stock = [], [], []
+        for linea in self.lineas_con_libros():
+            if linea.libro_id not in cantidades:
+                continue
+            cantidad = cantidades[linea.libro_id]
+            if cantidad <= 0:
+                eliminadas.append(linea)
+                self.fijar(linea.libro_id, 0)
+            elif cantidad > linea.maximo:
+                sin_stock.append((linea, cantidad))
+            elif cantidad != linea.cantidad:
+                linea.cantidad = cantidad
+                cambiadas.append(linea)
+                self.fijar(linea.libro_id, cantidad)
+        return ResultadoActualizacion(cambiadas, eliminadas, sin_stock)
+
+    def guardar(self, response):
+        if not self.modificado:
+            return
+        if not self.lineas:
+            response.delete_cookie(COOKIE, samesite='Lax')
+            return
+        response.set_cookie(
+            COOKIE,
+            signing.dumps(sorted(self.lineas.items()), salt=SAL, compress=True),
+            max_age=DURACION,
+            httponly=True,
+            samesite='Lax',
+            secure=settings.SESSION_COOKIE_SECURE,
+        )
+
+
+def fusionar(carrito_invitado, usuario):
+    """
+    Pasa las líneas del carrito de invitado al Carrito del usuario con un
+    único upsert. Como en sumar_al_carrito, las unidades añadidas se
+    reservan: con los libros bloqueados se suman a las que ya hubiera
+    hasta donde alcancen las unidades libres (stock - reservado), sin
+    que la línea pase del stock.
+    """
+    with transaction.atomic():
+        carrito, _ = Carrito.objects.get_or_create(usuario=usuario)
+        carrito.marcar_actividad()
+        libros = (Libro.objects.select_for_update()
+                  .filter(id__in=list(carrito_invitado.lineas))
+                  .order_by('id')
+                  .values_list('id', 'stock', 'reservado'))
+        libres = {libro_id: (stock, max(stock - reservado, 0)) for libro_id, stock, reservado in libros}
+        actuales = {
+            libro_id: (cantidad, reservada) for libro_id, cantidad, reservada in
+            carrito.items.select_for_update().values_list('libro_id', 'cantidad', 'reservada')
+        }
+        hasta = vencimiento()
+        lineas, deltas = [], {}
+        for libro_id, cantidad in carrito_invitado.lineas.items():
+            actual, reservada = actuales.get(libro_id, (0, 0))
+            stock, libres_libro = libres.get(libro_id, (0, 0))
+            # Ni más de lo libre ni una línea mayor que el stock
+            anadidas = min(cantidad, libres_libro, stock - actual)
+            if anadidas <= 0:
+                continue
+            lineas.append(ItemCarrito(carrito=carrito, libro_id=libro_id, cantidad=actual + anadidas,
+                                      reservada=reservada + anadidas, reservado_hasta=hasta))
+            deltas[libro_id] = anadidas
+        ItemCarrito.objects.bulk_create(
+            lineas,
+            update_conflicts=True,
+            unique_fields=['carrito', 'libro'],
+            update_fields=['cantidad', 'reservada', 'reservado_hasta'],
+        )
+        ajustar_reservas(deltas)
+    return carrito
@@ -0,0 +1,107 @@
+# carrito/limpieza.py
+"""
+Purga de carritos abandonados y sesiones caducadas (ver ``python manage.py
+purgar_carritos``). Se borra por lotes pequeños, cada uno en su propia
+transacción corta y recorriendo un índice (Carrito.actualizado,
+Session.expire_date), con una pausa entre lotes: ni se bloquean las tablas
+ni se retrasa a quien esté comprando.
+"""
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Carrito, ItemCarrito
+from .reservas import bloquear_libros, liberar
+
+# filas: {tabla: filas borradas}; segundos: duración total, pausas incluidas
+ResultadoPurga = namedtuple('ResultadoPurga', ['filas', 'segundos'])
+
+# Motores de sesión que guardan en la tabla django_session
+MOTORES_SESION_BD = ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db')
+
+
+def _por_lotes(siguiente_lote, borrar, lote, pausa):
+    inicio = time.monotonic()
+    filas = {}
+    while True:
+        with transaction.atomic():
+            claves = siguiente_lote(lote)
+            if claves:
+                for tabla, borradas in borrar(claves).items():
+                    filas[tabla] = filas.get(tabla, 0) + borradas
+        if len(claves) < lote:
+            break
+        if pausa:
+            time.sleep(pausa)
+    return ResultadoPurga(filas, time.monotonic() - inicio)
+
+
+def purgar_carritos(dias, lote=500, pausa=0, ahora=None):
+    """
+    Borra los carritos (y sus líneas) sin actividad en ``dias`` días,
+    devolviendo antes al stock lo que aún tuvieran reservado.
+    """
+    limite = (ahora or timezone.now()) - timedelta(days=dias)
+    abandonados = Carrito.objects.filter(actualizado__lt=limite)
+
+    def siguiente_lote(lote):
+        return list(abandonados.order_by('actualizado').values_list('id', flat=True)[:lote])
+
+    def borrar(ids):
+        candidatos = abandonados.filter(id__in=ids)
+        # Libros antes que carritos, como en carrito/reservas.py
+        bloquear_libros(ItemCarrito.objects.filter(carrito__in=candidatos).values('libro_id'))
+        # Bloqueados y releídos: si alguno volvió a usarse mientras tanto se
+        # queda, y a los demás nadie les añade líneas hasta el DELETE
+        ids = list(candidatos.select_for_update().values_list('id', flat=True))
+        liberar(ItemCarrito.objects.filter(carrito_id__in=ids, reservada__gt=0))
+        _, por_modelo = Carrito.objects.filter(id__in=ids).delete()
+        return {
+            ItemCarrito._meta.db_table: por_modelo.get(ItemCarrito._meta.label, 0),
+            Carrito._meta.db_table: por_modelo.get(Carrito._meta.label, 0),
+        }
+
+    return _por_lotes(siguiente_lote, borrar, lote, pausa)
+
+
+def purgar_sesiones(lote=500, pausa=0, ahora=None):
+    """Borra las sesiones caducadas; None si las sesiones no se guardan en la base de datos."""
+    if settings.SESSION_ENGINE not in MOTORES_SESION_BD:
+        return None
+    caducadas = Session.objects.filter(expire_date__lt=ahora or timezone.now())
+
+    def siguiente_lote(lote):
+        return list(caducadas.order_by('expire_date').values_list('session_key', flat=True)[:lote])
+
+    def borrar(claves):
+        return {Session._meta.db_table: caducadas.filter(session_key__in=claves).delete()[0]}
+
+    return _por_lotes(siguiente_lote, borrar, lote, pausa)
+
+
+def compactar(tablas):
+    """
+    Devuelve al sistema el espacio de las filas borradas sin bloqueos
+    exclusivos: VACUUM (no VACUUM FULL) en PostgreSQL e incremental_vacuum
+    en SQLite si la base se creó con auto_vacuum = INCREMENTAL (un VACUUM
+    completo bloquearía toda la base). Devuelve las tablas compactadas.
+    """
+    if connection.in_atomic_block or not tablas:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for tabla in tablas:
+                cursor.execute(f'VACUUM (ANALYZE) {connection.ops.quote_name(tabla)}')
+            return list(tablas)
+        if connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA auto_vacuum')
+            if cursor.fetchone()[0] == 2:
+                cursor.execute('PRAGMA incremental_vacuum')
+                cursor.fetchall()
+                return list(tablas)
+    return []
@@ -0,0 +1,29 @@
+# carrito/management/commands/liberar_reservas.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from carrito.reservas import liberar_vencidas
+
+
+class Command(BaseCommand):
+    help = "Devuelve al stock las reservas de carrito vencidas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500,
+                            help="Líneas liberadas por transacción.")
+        parser.add_argument('--pausa', type=float, default=0,
+                            help="Segundos de espera entre lotes.")
+        parser.add_argument('--continuo', action='store_true',
+                            help="Seguir barriendo periódicamente en lugar de terminar.")
+        parser.add_argument('--intervalo', type=float, default=60,
+                            help="Segundos entre barridos (modo continuo).")
+
+    def handle(self, *args, **options):
+        while True:
+            liberadas = liberar_vencidas(options['lote'], options['pausa'])
+            if liberadas or not options['continuo']:
+                self.stdout.write(self.style.SUCCESS(f"{liberadas} reservas vencidas liberadas"))
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
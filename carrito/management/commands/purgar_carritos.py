@@ -0,0 +1,46 @@
+# carrito/management/commands/purgar_carritos.py
+from django.core.management.base import BaseCommand
+
+from carrito.limpieza import compactar, purgar_carritos, purgar_sesiones
+
+
+class Command(BaseCommand):
+    help = "Borra por lotes los carritos abandonados y las sesiones caducadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30,
+                            help="Días sin actividad tras los que un carrito se da por abandonado.")
+        parser.add_argument('--lote', type=int, default=500,
+                            help="Filas borradas por transacción.")
+        parser.add_argument('--pausa', type=float, default=0.05,
+                            help="Segundos de espera entre lotes.")
+        parser.add_argument('--sin-sesiones', action='store_true',
+                            help="No purgar las sesiones caducadas.")
+        parser.add_argument('--compactar', action='store_true',
+                            help="Liberar después el espacio de las tablas purgadas.")
+
+    def informar(self, resultado):
+        total = sum(resultado.filas.values())
+        por_segundo = total / resultado.segundos if resultado.segundos else 0
+        for tabla, filas in resultado.filas.items():
+            self.stdout.write(f"{tabla}: {filas} filas borradas")
+        self.stdout.write(f"{total} filas en {resultado.segundos:.1f}s ({por_segundo:.0f} filas/s)")
+
+    def handle(self, *args, **options):
+        tablas = []
+        resultado = purgar_carritos(options['dias'], options['lote'], options['pausa'])
+        self.informar(resultado)
+        tablas += [tabla for tabla, filas in resultado.filas.items() if filas]
+
+        if not options['sin_sesiones']:
+            resultado = purgar_sesiones(options['lote'], options['pausa'])
+            if resultado is None:
+                self.stdout.write("Las sesiones no se guardan en la base de datos; no hay nada que purgar.")
+            else:
+                self.informar(resultado)
+                tablas += [tabla for tabla, filas in resultado.filas.items() if filas]
+
+        compactadas = compactar(tablas) if options['compactar'] else []
+        self.stdout.write(self.style.SUCCESS(
+            f"Tablas compactadas: {', '.join(compactadas) if compactadas else 'ninguna'}"
+        ))
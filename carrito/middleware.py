@@ -0,0 +1,18 @@
+# carrito/middleware.py
+from .invitado import CarritoInvitado
+
+
+class CarritoInvitadoMiddleware:
+    """
+    Expone el carrito de la cookie como ``request.carrito_invitado`` y, si
+    la vista lo cambió, reescribe la cookie en la respuesta.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.carrito_invitado = CarritoInvitado.desde_peticion(request)
+        response = self.get_response(request)
+        request.carrito_invitado.guardar(response)
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0002_initial'),
+        ('libros', '0007_reservas_carrito'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemcarrito',
+            name='reservada',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='itemcarrito',
+            name='reservado_hasta',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='itemcarrito',
+            index=models.Index(condition=models.Q(('reservado_hasta__isnull', False)), fields=['reservado_hasta'], name='item_reserva_vence_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0003_reservas_carrito'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='carrito',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -1,42 +1,94 @@
 # carrito/models.py
-from decimal import Decimal
+from datetime import timedelta
+
 from django.db import models
+from django.utils import timezone
 from usuarios.models import Usuario
 from libros.models import Libro
+from django.contrib.auth.signals import user_logged_in
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
+from .precios import calcular_resumen, invalidar_resumen
+
+# Precisión con la que se lleva Carrito.actualizado: basta para la purga de
+# carritos abandonados y evita una escritura más en cada clic
+MARGEN_ACTIVIDAD = timedelta(hours=1)
 
 class Carrito(models.Model):
     usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
-    actualizado = models.DateTimeField(auto_now=True)
+    # Última actividad; las líneas se cambian con upserts y bulk_update que
+    # no pasan por save(), así que la renueva marcar_actividad (ver carrito/limpieza.py)
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"Carrito de {self.usuario.email}"
     
     def obtener_total(self):
-        return sum(item.obtener_subtotal() for item in self.items.all())
+        return calcular_resumen(self).subtotal
     
     def aplicar_cupon(self, cupon):
-        if cupon.es_valido():
-            return self.obtener_total() * (1 - Decimal(str(cupon.descuento)) / 100)
-        return self.obtener_total()
+        return calcular_resumen(self, cupon).total
+    
+    def marcar_actividad(self):
+        ahora = timezone.now()
+        if self.actualizado and ahora - self.actualizado < MARGEN_ACTIVIDAD:
+            return
+        Carrito.objects.filter(pk=self.pk).update(actualizado=ahora)
+        self.actualizado = ahora
+
+class ItemCarritoQuerySet(models.QuerySet):
+    def con_libros(self):
+        # Todo lo que pintan el carrito y la confirmación en una sola consulta
+        return self.select_related('libro__autor').only(
+            'id', 'carrito_id', 'cantidad', 'reservada',
+            'libro__id', 'libro__titulo', 'libro__precio', 'libro__stock', 'libro__reservado',
+            'libro__autor__nombre',
+        ).order_by('id')
 
 class ItemCarrito(models.Model):
     carrito = models.ForeignKey(Carrito, related_name='items', on_delete=models.CASCADE)
     libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
     cantidad = models.PositiveIntegerField(default=1)
+    # Unidades de la línea retenidas en Libro.reservado y hasta cuándo
+    # (ver carrito/reservas.py); al vencer las libera liberar_reservas
+    reservada = models.PositiveIntegerField(default=0)
+    reservado_hasta = models.DateTimeField(blank=True, null=True)
+    
+    objects = ItemCarritoQuerySet.as_manager()
     
     class Meta:
         unique_together = ('carrito', 'libro')
+        indexes = [
+            # Barrido de reservas vencidas: solo las líneas que retienen unidades
+            models.Index(fields=['reservado_hasta'], name='item_reserva_vence_idx',
+                         condition=models.Q(reservado_hasta__isnull=False)),
+        ]
     
     def __str__(self):
         return f"{self.cantidad} x {self.libro.titulo}"
     
     def obtener_subtotal(self):
         return self.libro.precio * self.cantidad
+    
+    @property
+    def maximo(self):
+        # Lo que ya retiene la línea más lo que queda libre del libro
+        return self.reservada + self.libro.unidades_disponibles
 
 @receiver(pre_save, sender=ItemCarrito)
 def verificar_stock(sender, instance, **kwargs):
-    if instance.cantidad > instance.libro.stock:
-        raise ValueError(f"No hay suficiente stock para {instance.libro.titulo}")
\ No newline at end of file
+    # Las unidades reservadas ya están garantizadas: sin nada por reservar no se consulta el libro
+    if instance.cantidad > instance.reservada and instance.cantidad > instance.maximo:
+        raise ValueError(f"No hay suficiente stock para {instance.libro.titulo}")
+
+@receiver(user_logged_in)
+def fusionar_carrito_invitado(sender, request, user, **kwargs):
+    # Lo que se añadió sin sesión pasa al carrito del usuario y la cookie se borra
+    carrito_invitado = getattr(request, 'carrito_invitado', None)
+    if not carrito_invitado:
+        return
+    from .invitado import fusionar
+    fusionar(carrito_invitado, user)
+    carrito_invitado.vaciar()
+    invalidar_resumen(request)
@@ -0,0 +1,151 @@
+# carrito/operaciones.py
+from collections import namedtuple
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from libros.models import Libro
+from .models import ItemCarrito
+from .reservas import ajustar_reservas, vencimiento
+
+# actualizados/eliminados: líneas afectadas; sin_stock: [(línea, cantidad pedida)]
+# de las que no se cambiaron por superar el stock
+ResultadoActualizacion = namedtuple('ResultadoActualizacion', ['actualizados', 'eliminados', 'sin_stock'])
+
+ITEMS = ItemCarrito._meta.db_table
+LIBROS = Libro._meta.db_table
+
+# Reserva las unidades en el libro solo si quedan libres. Es la fila que
+# serializa los clics simultáneos: dos carritos no pueden reservar más que
+# el stock.
+SQL_RESERVAR = f"""
+    UPDATE {LIBROS} SET reservado = reservado + %s
+    WHERE id = %s AND stock - reservado >= %s
+"""
+
+# Inserta la línea o le suma las unidades ya reservadas y renueva el plazo
+SQL_LINEA = f"""
+    INSERT INTO {ITEMS} (carrito_id, libro_id, cantidad, reservada, reservado_hasta)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (carrito_id, libro_id) DO UPDATE
+        SET cantidad = {ITEMS}.cantidad + excluded.cantidad,
+            reservada = {ITEMS}.reservada + excluded.reservada,
+            reservado_hasta = excluded.reservado_hasta
+    RETURNING cantidad
+"""
+
+# En PostgreSQL ambas cosas van en una sentencia con un UPDATE en un CTE:
+# si el libro no tiene unidades libres el INSERT no recibe ninguna fila
+SQL_SUMAR = f"""
+    WITH reserva AS ({SQL_RESERVAR} RETURNING id)
+    INSERT INTO {ITEMS} (carrito_id, libro_id, cantidad, reservada, reservado_hasta)
+    SELECT %s, id, %s, %s, %s FROM reserva
+    ON CONFLICT (carrito_id, libro_id) DO UPDATE
+        SET cantidad = {ITEMS}.cantidad + excluded.cantidad,
+            reservada = {ITEMS}.reservada + excluded.reservada,
+            reservado_hasta = excluded.reservado_hasta
+    RETURNING cantidad
+"""
+
+
+def _sumar_sql(carrito_id, libro_id, cantidad):
+    hasta = vencimiento()
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(SQL_SUMAR, [cantidad, libro_id, cantidad, carrito_id, cantidad, cantidad, hasta])
+        else:
+            # SQLite no admite UPDATE dentro de WITH: dos sentencias en la misma transacción
+            cursor.execute(SQL_RESERVAR, [cantidad, libro_id, cantidad])
+            if not cursor.rowcount:
+                return None
+            cursor.execute(SQL_LINEA, [carrito_id, libro_id, cantidad, cantidad, hasta])
+        fila = cursor.fetchone()
+    return fila[0] if fila else None
+
+
+def _sumar_orm(carrito_id, libro_id, cantidad):
+    # Motores sin INSERT ... ON CONFLICT: la reserva con un UPDATE condicionado
+    # sobre F() y la línea con UPDATE o, si no había, INSERT; la restricción
+    # única resuelve la carrera entre ambos
+    with transaction.atomic():
+        reservado = (Libro.objects.filter(id=libro_id, stock__gte=F('reservado') + cantidad)
+                     .update(reservado=F('reservado') + cantidad))
+        if not reservado:
+            return None
+        hasta = vencimiento()
+        lineas = ItemCarrito.objects.filter(carrito_id=carrito_id, libro_id=libro_id)
+        if not lineas.update(cantidad=F('cantidad') + cantidad, reservada=F('reservada') + cantidad,
+                             reservado_hasta=hasta):
+            try:
+                with transaction.atomic():
+                    ItemCarrito.objects.bulk_create([ItemCarrito(
+                        carrito_id=carrito_id, libro_id=libro_id, cantidad=cantidad,
+                        reservada=cantidad, reservado_hasta=hasta)])
+                return cantidad
+            except IntegrityError:
+                lineas.update(cantidad=F('cantidad') + cantidad, reservada=F('reservada') + cantidad,
+                              reservado_hasta=hasta)
+        return lineas.values_list('cantidad', flat=True).get()
+
+
+def sumar_al_carrito(carrito_id, libro_id, cantidad=1):
+    """
+    Añade ``cantidad`` unidades del libro al carrito reservándolas (ver
+    carrito/reservas.py) y renueva el plazo de la reserva de la línea.
+    Devuelve la nueva cantidad de la línea, o None si no quedan unidades
+    libres (o el libro no existe) y no se cambió nada.
+    """
+    if connection.vendor in ('postgresql', 'sqlite'):
+        return _sumar_sql(carrito_id, libro_id, cantidad)
+    return _sumar_orm(carrito_id, libro_id, cantidad)
+
+
+def actualizar_cantidades(carrito, cantidades):
+    """
+    Aplica de una vez las cantidades de ``cantidades`` ({item_id: cantidad})
+    a las líneas del carrito: una consulta lee las líneas con el stock de
+    sus libros (bloqueados), un bulk_update cambia las que caben, un único
+    DELETE quita las que quedan a cero y un UPDATE ajusta las reservas.
+    Subir una cantidad reserva la línea entera y renueva el plazo;
+    bajarla o quitar la línea libera lo que sobra. El stock se valida aquí
+    (bulk_update no pasa por la señal verificar_stock de cada línea). Las
+    líneas que superan las unidades libres se dejan como estaban.
+    """
+    with transaction.atomic():
+        # Líneas y libros bloqueados en la misma consulta, los libros en orden de id
+        lineas = (carrito.items.filter(id__in=list(cantidades))
+                  .select_related('libro')
+                  .select_for_update(of=('self', 'libro'))
+                  .only('id', 'carrito_id', 'cantidad', 'reservada', 'reservado_hasta',
+                        'libro__id', 'libro__titulo', 'libro__stock', 'libro__reservado')
+                  .order_by('libro_id'))
+        cambiadas, eliminadas, sin_stock = [], [], []
+        deltas = {}
+        hasta = vencimiento()
+        for linea in lineas:
+            cantidad = cantidades[linea.id]
+            if cantidad <= 0:
+                eliminadas.append(linea)
+                deltas[linea.libro_id] = -linea.reservada
+            elif cantidad > linea.maximo:
+                sin_stock.append((linea, cantidad))
+            elif cantidad != linea.cantidad:
+                if cantidad > linea.cantidad:
+                    # Se reserva la línea entera (ya se validó contra maximo), también
+                    # lo que tenía sin reserva por haber vencido
+                    reservada = cantidad
+                    linea.reservado_hasta = hasta
+                else:
+                    reservada = min(linea.reservada, cantidad)
+                deltas[linea.libro_id] = reservada - linea.reservada
+                linea.cantidad, linea.reservada = cantidad, reservada
+                cambiadas.append(linea)
+
+        if cambiadas:
+            ItemCarrito.objects.bulk_update(cambiadas, ['cantidad', 'reservada', 'reservado_hasta'])
+        if eliminadas:
+            ItemCarrito.objects.filter(id__in=[linea.id for linea in eliminadas]).delete()
+        ajustar_reservas(deltas)
+        if cambiadas or eliminadas:
+            carrito.marcar_actividad()
+    return ResultadoActualizacion(cambiadas, eliminadas, sin_stock)
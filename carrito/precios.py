@@ -0,0 +1,83 @@
+# carrito/precios.py
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+CENTAVOS = Decimal('0.01')
+
+
+def calcular_descuento(subtotal, cupon=None):
+    if not cupon:
+        return Decimal('0.00')
+    return (subtotal * Decimal(cupon.descuento) / 100).quantize(CENTAVOS, ROUND_HALF_UP)
+
+
+class ResumenCarrito:
+    """
+    Líneas, subtotal, descuento y total de un carrito calculados con una
+    sola consulta. Las plantillas lo reciben como ``resumen``.
+    """
+
+    def __init__(self, carrito, items, cupon=None, cupon_invalido=False):
+        self.carrito = carrito
+        self.items = items
+        self.cupon = cupon
+        self.cupon_invalido = cupon_invalido
+        self.cantidad_articulos = sum(item.cantidad for item in items)
+        self.subtotal = sum((item.subtotal for item in items), Decimal('0.00'))
+        self.descuento = calcular_descuento(self.subtotal, cupon)
+        self.total = self.subtotal - self.descuento
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def libro_ids(self):
+        return [item.libro_id for item in self.items]
+
+
+def lineas_con_subtotal(carrito):
+    subtotal = ExpressionWrapper(
+        F('cantidad') * F('libro__precio'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    return carrito.items.con_libros().annotate(subtotal=subtotal)
+
+
+def calcular_resumen(carrito, cupon=None):
+    cupon_invalido = bool(cupon) and not cupon.es_valido()
+    return ResumenCarrito(
+        carrito,
+        list(lineas_con_subtotal(carrito)),
+        cupon=None if cupon_invalido else cupon,
+        cupon_invalido=cupon_invalido,
+    )
+
+
+def cupon_de_sesion(request):
+    from pedidos.models import Cupon
+    if 'cupon_id' not in request.session:
+        return None
+    return Cupon.objects.filter(id=request.session['cupon_id']).first()
+
+
+def obtener_resumen(request, carrito=None):
+    """Resumen del carrito del usuario (o del invitado), calculado una sola vez por petición."""
+    resumen = getattr(request, '_resumen_carrito', None)
+    if resumen is None and not request.user.is_authenticated:
+        # Invitado: líneas de la cookie, sin carrito guardado ni cupón
+        resumen = ResumenCarrito(None, request.carrito_invitado.lineas_con_libros())
+        request._resumen_carrito = resumen
+    elif resumen is None:
+        if carrito is None:
+            from .models import Carrito
+            carrito, _ = Carrito.objects.get_or_create(usuario=request.user)
+        resumen = calcular_resumen(carrito, cupon_de_sesion(request))
+        request._resumen_carrito = resumen
+    return resumen
+
+
+def invalidar_resumen(request):
+    request.__dict__.pop('_resumen_carrito', None)
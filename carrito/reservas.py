@@ -0,0 +1,92 @@
+# carrito/reservas.py
+"""
+Reservas de stock de los carritos. Añadir un libro retiene sus unidades
+durante RESERVA_CARRITO_MINUTOS: se suman a Libro.reservado (y a la
+``reservada`` de la línea), de modo que lo que se puede vender es
+``stock - reservado``. Comprar consume la reserva (ver
+pedidos.compra.crear_pedido) y ``python manage.py liberar_reservas``
+devuelve las vencidas por lotes.
+
+Quien toque Libro.reservado y las líneas a la vez bloquea primero los
+libros, en orden de id, y luego las líneas, como crear_pedido.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from libros.models import Libro
+from .models import ItemCarrito
+
+
+def vencimiento():
+    return timezone.now() + timedelta(minutes=settings.RESERVA_CARRITO_MINUTOS)
+
+
+def ajustar_reservas(deltas):
+    """
+    Suma {libro_id: delta} a Libro.reservado con un único UPDATE. No
+    comprueba el stock: quien reserva más debe haberlo validado con los
+    libros bloqueados.
+    """
+    deltas = {libro_id: delta for libro_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    return Libro.objects.filter(id__in=deltas).update(reservado=Case(
+        *[When(id=libro_id, then=F('reservado') + Value(delta)) for libro_id, delta in deltas.items()],
+        default=F('reservado'),
+        output_field=PositiveIntegerField(),
+    ))
+
+
+def bloquear_libros(libro_ids):
+    list(Libro.objects.select_for_update().filter(id__in=libro_ids).order_by('id').values_list('id', flat=True))
+
+
+def liberar(lineas):
+    """
+    Devuelve al stock lo que retienen ``lineas`` (un QuerySet de
+    ItemCarrito) y las deja sin reserva. Bloquea antes los libros y luego
+    las líneas. Devuelve cuántas líneas se liberaron.
+    """
+    bloquear_libros(lineas.values('libro_id'))
+    # Releídas ya bloqueadas: una compra o un clic pudo consumirlas o renovarlas
+    filas = list(lineas.select_for_update().values_list('id', 'libro_id', 'reservada'))
+    deltas = defaultdict(int)
+    for _, libro_id, reservada in filas:
+        deltas[libro_id] -= reservada
+    ajustar_reservas(deltas)
+    ItemCarrito.objects.filter(id__in=[item_id for item_id, _, _ in filas]).update(
+        reservada=0, reservado_hasta=None)
+    return len(filas)
+
+
+def liberar_vencidas(lote=500, pausa=0, ahora=None):
+    """
+    Devuelve al stock las reservas vencidas antes de ``ahora``, ``lote``
+    líneas por transacción (las recorre el índice parcial de
+    reservado_hasta) y esperando ``pausa`` segundos entre lotes para no
+    acaparar los bloqueos. Las líneas siguen en el carrito, sin reserva.
+    Devuelve cuántas líneas se liberaron.
+    """
+    ahora = ahora or timezone.now()
+    liberadas = 0
+    while True:
+        with transaction.atomic():
+            candidatas = list(
+                ItemCarrito.objects.filter(reservado_hasta__lt=ahora)
+                .order_by('reservado_hasta')
+                .values_list('id', flat=True)[:lote]
+            )
+            if not candidatas:
+                break
+            liberadas += liberar(ItemCarrito.objects.filter(id__in=candidatas, reservado_hasta__lt=ahora))
+        if len(candidatas) < lote:
+            break
+        if pausa:
+            time.sleep(pausa)
+    return liberadas
@@ -5,7 +5,9 @@ from . import views
 urlpatterns = [
     path('', views.ver_carrito, name='ver_carrito'),
     path('agregar/<int:libro_id>/', views.agregar_al_carrito, name='agregar_al_carrito'),
+    path('agregar/<int:libro_id>/json/', views.agregar_al_carrito_json, name='agregar_al_carrito_json'),
     path('eliminar/<int:item_id>/', views.eliminar_del_carrito, name='eliminar_del_carrito'),
+    path('actualizar/', views.actualizar_carrito, name='actualizar_carrito'),
     path('actualizar/<int:item_id>/', views.actualizar_cantidad, name='actualizar_cantidad'),
     path('aplicar-cupon/', views.aplicar_cupon, name='aplicar_cupon'),
 ]
\ No newline at end of file
@@ -2,69 +2,126 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_POST
 from .models import Carrito, ItemCarrito
+from .operaciones import actualizar_cantidades, sumar_al_carrito
+from .precios import CENTAVOS, obtener_resumen
 from libros.models import Libro
 from pedidos.models import Cupon
+from pedidos.recomendaciones import recomendaciones_para
 
-@login_required
 def ver_carrito(request):
-    carrito, _ = Carrito.objects.get_or_create(usuario=request.user)
-    return render(request, 'carrito/carrito.html', {'carrito': carrito})
+    resumen = obtener_resumen(request)
+    return render(request, 'carrito/carrito.html', {
+        'carrito': resumen.carrito,
+        'resumen': resumen,
+        'recomendaciones': recomendaciones_para(resumen.libro_ids()),
+    })
+
+def _sumar(request, libro_id):
+    """Una unidad más en el carrito del usuario o en el de la cookie: (carrito, nueva cantidad o None)."""
+    if request.user.is_authenticated:
+        carrito, _ = Carrito.objects.get_or_create(usuario=request.user)
+        carrito.marcar_actividad()
+        return carrito, sumar_al_carrito(carrito.id, libro_id)
+    libro = Libro.objects.only('id', 'stock', 'reservado').filter(id=libro_id).first()
+    return None, request.carrito_invitado.sumar(libro) if libro else None
 
-@login_required
 def agregar_al_carrito(request, libro_id):
-    libro = get_object_or_404(Libro, id=libro_id)
-    carrito, created = Carrito.objects.get_or_create(usuario=request.user)
-    
-    # Verificar stock
-    if libro.stock <= 0:
-        messages.error(request, f"Lo sentimos, '{libro.titulo}' no está disponible en este momento.")
-        return redirect('libro_detalle', libro_id=libro.id)
-    
-    # Verificar si el libro ya está en el carrito
-    item, created = ItemCarrito.objects.get_or_create(
-        carrito=carrito,
-        libro=libro,
-        defaults={'cantidad': 1}
-    )
-    
-    # Si ya existe, aumentar la cantidad
-    if not created:
-        if item.cantidad + 1 <= libro.stock:
-            item.cantidad += 1
-            item.save()
-        else:
-            messages.warning(request, f"No hay suficiente stock para más unidades de '{libro.titulo}'.")
+    _, cantidad = _sumar(request, libro_id)
+    libro = get_object_or_404(Libro.objects.only('id', 'titulo', 'stock', 'reservado'), id=libro_id)
     
-    messages.success(request, f"'{libro.titulo}' añadido al carrito.")
+    if cantidad is None:
+        if not libro.disponible():
+            messages.error(request, f"Lo sentimos, '{libro.titulo}' no está disponible en este momento.")
+            return redirect('detalle_libro', libro_id=libro.id)
+        messages.warning(request, f"No hay suficiente stock para más unidades de '{libro.titulo}'.")
+    else:
+        messages.success(request, f"'{libro.titulo}' añadido al carrito.")
     return redirect('ver_carrito')
 
-@login_required
+@require_POST
+def agregar_al_carrito_json(request, libro_id):
+    # Versión para fetch(): una sentencia para la línea y otra para el resumen
+    carrito, cantidad = _sumar(request, libro_id)
+    if cantidad is None and not Libro.objects.filter(id=libro_id).exists():
+        return JsonResponse({'ok': False, 'error': "El libro no existe."}, status=404)
+    
+    resumen = obtener_resumen(request, carrito)
+    datos = {
+        'ok': cantidad is not None,
+        'cantidad': cantidad,
+        'articulos': resumen.cantidad_articulos,
+        'subtotal': str(resumen.subtotal.quantize(CENTAVOS)),
+        'descuento': str(resumen.descuento),
+        'total': str(resumen.total.quantize(CENTAVOS)),
+    }
+    if cantidad is None:
+        datos['error'] = "No hay suficiente stock."
+        return JsonResponse(datos, status=409)
+    return JsonResponse(datos)
+
 def eliminar_del_carrito(request, item_id):
-    item = get_object_or_404(ItemCarrito, id=item_id, carrito__usuario=request.user)
-    item.delete()
-    messages.success(request, f"'{item.libro.titulo}' eliminado del carrito.")
+    if not request.user.is_authenticated:
+        # En el carrito de invitado cada línea se identifica por su libro
+        if not request.carrito_invitado.cantidad_de(item_id):
+            raise Http404
+        request.carrito_invitado.fijar(item_id, 0)
+        titulo = Libro.objects.filter(id=item_id).values_list('titulo', flat=True).first()
+        messages.success(request, f"'{titulo}' eliminado del carrito.")
+        return redirect('ver_carrito')
+    item = get_object_or_404(ItemCarrito.objects.select_related('carrito'), id=item_id, carrito__usuario=request.user)
+    # Por actualizar_cantidades para liberar también su reserva
+    _avisar_actualizacion(request, actualizar_cantidades(item.carrito, {item_id: 0}))
     return redirect('ver_carrito')
 
-@login_required
+def _avisar_actualizacion(request, resultado):
+    for linea in resultado.eliminados:
+        messages.success(request, f"'{linea.libro.titulo}' eliminado del carrito.")
+    for linea, cantidad in resultado.sin_stock:
+        messages.error(request, f"No hay suficiente stock para {cantidad} unidades de '{linea.libro.titulo}'.")
+    if resultado.actualizados:
+        messages.success(request, "Carrito actualizado.")
+
+def _actualizar(request, cantidades):
+    if request.user.is_authenticated:
+        carrito = Carrito.objects.filter(usuario=request.user).first()
+        if carrito:
+            _avisar_actualizacion(request, actualizar_cantidades(carrito, cantidades))
+    else:
+        _avisar_actualizacion(request, request.carrito_invitado.actualizar(cantidades))
+
 def actualizar_cantidad(request, item_id):
     if request.method == 'POST':
-        item = get_object_or_404(ItemCarrito, id=item_id, carrito__usuario=request.user)
-        nueva_cantidad = int(request.POST.get('cantidad', 1))
-        
-        # Validar que la cantidad no exceda el stock
-        if nueva_cantidad <= 0:
-            item.delete()
-            messages.success(request, f"'{item.libro.titulo}' eliminado del carrito.")
-        elif nueva_cantidad <= item.libro.stock:
-            item.cantidad = nueva_cantidad
-            item.save()
-            messages.success(request, "Carrito actualizado.")
-        else:
-            messages.error(request, f"No hay suficiente stock para {nueva_cantidad} unidades de '{item.libro.titulo}'.")
-        
-        return redirect('ver_carrito')
+        if request.user.is_authenticated:
+            get_object_or_404(ItemCarrito, id=item_id, carrito__usuario=request.user)
+        elif not request.carrito_invitado.cantidad_de(item_id):
+            raise Http404
+        try:
+            nueva_cantidad = int(request.POST.get('cantidad', 1))
+        except ValueError:
+            messages.error(request, "Cantidad no válida.")
+            return redirect('ver_carrito')
+        _actualizar(request, {item_id: nueva_cantidad})
+    return redirect('ver_carrito')
+
+@require_POST
+def actualizar_carrito(request):
+    # Todas las cantidades del carrito en un solo envío: campos cantidad-<id de línea>
+    # (en el carrito de invitado, <id del libro>)
+    cantidades = {}
+    for campo, valor in request.POST.items():
+        if not campo.startswith('cantidad-'):
+            continue
+        try:
+            cantidades[int(campo.removeprefix('cantidad-'))] = int(valor)
+        except ValueError:
+            messages.error(request, "Alguna cantidad no es válida; no se ha cambiado nada.")
+            return redirect('ver_carrito')
+    
+    if cantidades:
+        _actualizar(request, cantidades)
     return redirect('ver_carrito')
 
 @login_required
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'libros',
     'carrito',
     'pedidos',
+    'reportes',
 ]
 
 MIDDLEWARE = [
@@ -55,6 +56,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'carrito.middleware.CarritoInvitadoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -148,12 +150,46 @@ LOGIN_URL = '/usuarios/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/usuarios/login/'
 
+# Generador de Pedido.numero_orden (ver pedidos/numeracion.py)
+NUMERO_ORDEN_GENERADOR = 'pedidos.numeracion.GeneradorSecuencial'
+
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-STORAGES = {
+# En producción, la URL del servidor web o la CDN que sirve MEDIA_ROOT; los
+# nombres por contenido (libros/3f/a9/…) admiten
+# Cache-Control: public, max-age=31536000, immutable
+MEDIA_URL = os.getenv('MEDIA_URL', '/media/')
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+# Hilos que generan las variantes de las portadas (ver libros/imagenes.py);
+# con 0 se generan en el mismo hilo al confirmar la transacción
+IMAGENES_HILOS = int(os.getenv('IMAGENES_HILOS', '2'))
+
+# Si los libros relacionados encolados se recalculan en un hilo al confirmar
+# la transacción; si no, solo con `calcular_relacionados --pendientes`
+RELACIONADOS_EN_SEGUNDO_PLANO = os.getenv('RELACIONADOS_EN_SEGUNDO_PLANO', 'True') == 'True'
 
+# Minutos que un carrito retiene las unidades que añade (ver carrito/reservas.py)
+RESERVA_CARRITO_MINUTOS = int(os.getenv('RESERVA_CARRITO_MINUTOS', '15'))
+
+STORAGES = {
+    # Nombres por contenido, sin duplicados (ver libros/almacenamiento.py)
+    "default": {
+        "BACKEND": "libros.almacenamiento.AlmacenamientoContenido",
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
 }
 
+
+# Correo saliente. Las confirmaciones se guardan en la bandeja de salida
+# (pedidos.CorreoPendiente) y las envía `python manage.py enviar_correos`
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+EMAIL_TIMEOUT = 30
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-responder@libreria.local')
@@ -1,7 +1,7 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from libros.views import servir_medio
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -9,7 +9,13 @@ urlpatterns = [
     path('usuarios/', include('usuarios.urls')),
     path('carrito/', include('carrito.urls')),
     path('pedidos/', include('pedidos.urls')),
+    path('reportes/', include('reportes.urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Portadas subidas, solo en desarrollo: en producción MEDIA_ROOT lo sirve el
+# servidor web o una CDN (MEDIA_URL), con la misma caché inmutable para los
+# nombres por contenido
+if settings.DEBUG and settings.MEDIA_URL.startswith('/'):
+    urlpatterns += [
+        re_path(r'^%s(?P<ruta>.+)$' % settings.MEDIA_URL.lstrip('/'), servir_medio, name='servir_medio'),
+    ]
\ No newline at end of file
@@ -0,0 +1,97 @@
+# libros/almacenamiento.py
+"""
+Almacenamiento de medios direccionado por contenido. Cada archivo se guarda
+con el SHA-256 de su contenido como nombre, repartido en dos niveles de
+subdirectorios (``libros/3f/a9/3fa9….jpg``) para que ningún directorio
+crezca sin límite. Subir dos veces la misma portada no ocupa más espacio y
+un nombre nunca cambia de contenido, así que sus URLs se pueden cachear
+para siempre (ver ``libros.views.servir_medio``).
+
+Dos subidas simultáneas de la misma portada escriben el mismo nombre: no
+se busca un nombre libre (get_available_name lo devuelve tal cual) y cada
+una escribe en un temporal que luego renombra encima, así que quien
+llegue segundo reemplaza el archivo por uno idéntico.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+NIVELES = 2
+CARACTERES_POR_NIVEL = 2
+_NIVEL = r'[0-9a-f]{%d}/' % CARACTERES_POR_NIVEL
+PATRON_NOMBRE = re.compile(r'(?:^|/)' + _NIVEL * NIVELES + r'[0-9a-f]{64}(?:\.[a-z0-9]+)?$')
+
+# mkstemp crea los temporales con 0600; el archivo final lleva
+# FILE_UPLOAD_PERMISSIONS o, si no se fijó, estos (la umask no se toca:
+# cambiarla afecta a todos los hilos del proceso)
+PERMISOS_ARCHIVO = 0o644
+
+
+def direccionado(nombre):
+    """Si ``nombre`` ya es un nombre por contenido (y su contenido es inmutable)."""
+    return bool(PATRON_NOMBRE.search(nombre or ''))
+
+
+def resumen(contenido):
+    sha = hashlib.sha256()
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    for trozo in contenido.chunks():
+        sha.update(trozo if isinstance(trozo, bytes) else trozo.encode('utf-8'))
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    return sha.hexdigest()
+
+
+class AlmacenamientoContenido(FileSystemStorage):
+    # Varios registros pueden apuntar al mismo archivo: quien borre debe
+    # comprobar antes que nadie más lo usa
+    comparte_archivos = True
+
+    def nombre_por_contenido(self, nombre, contenido):
+        directorio, base = os.path.split(nombre)
+        extension = os.path.splitext(base)[1].lower()
+        sha = resumen(contenido)
+        niveles = [sha[i * CARACTERES_POR_NIVEL:(i + 1) * CARACTERES_POR_NIVEL] for i in range(NIVELES)]
+        return '/'.join(parte for parte in [directorio, *niveles, sha + extension] if parte)
+
+    def get_available_name(self, name, max_length=None):
+        # Un nombre por contenido ya ocupado guarda exactamente ese contenido
+        if direccionado(name):
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        if not direccionado(name):
+            return super()._save(name, content)
+        ruta = self.path(name)
+        directorio = os.path.dirname(ruta)
+        os.makedirs(directorio, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix='.subida-')
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                for trozo in content.chunks():
+                    archivo.write(trozo if isinstance(trozo, bytes) else trozo.encode('utf-8'))
+            os.chmod(temporal, self.file_permissions_mode or PERMISOS_ARCHIVO)
+            # Atómico: nadie lee nunca un archivo a medio escribir
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return name
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        nombre = self.nombre_por_contenido(name, content)
+        if self.exists(nombre):
+            # Mismo contenido: se reutiliza el archivo existente
+            return nombre
+        return super().save(nombre, content, max_length=max_length)
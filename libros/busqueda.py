@@ -0,0 +1,99 @@
+# libros/busqueda.py
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Libro, LibroBusqueda
+
+TABLA_FTS = 'libros_libro_fts'
+TAMANO_LOTE_INDEXADO = 500
+
+
+def componer_documento(titulo, autor, categorias, descripcion):
+    partes = [titulo, autor, *categorias, descripcion or '']
+    return '\n'.join(parte for parte in partes if parte)
+
+
+def construir_documento(libro):
+    return componer_documento(libro.titulo, libro.autor.nombre,
+                              [categoria.nombre for categoria in libro.categorias.all()],
+                              libro.descripcion)
+
+
+def guardar_documentos(documentos):
+    """Inserta o reemplaza documentos ya construidos: {libro_id: documento}."""
+    LibroBusqueda.objects.bulk_create(
+        [LibroBusqueda(libro_id=libro_id, documento=documento) for libro_id, documento in documentos.items()],
+        update_conflicts=True,
+        unique_fields=['libro'],
+        update_fields=['documento'],
+    )
+
+
+def indexar_libros(libro_ids):
+    """Regenera el documento de búsqueda de los libros indicados, por lotes."""
+    libro_ids = list(libro_ids)
+    for inicio in range(0, len(libro_ids), TAMANO_LOTE_INDEXADO):
+        lote = libro_ids[inicio:inicio + TAMANO_LOTE_INDEXADO]
+        libros = (Libro.objects.filter(id__in=lote)
+                  .select_related('autor')
+                  .prefetch_related('categorias')
+                  .only('id', 'titulo', 'descripcion', 'autor__nombre'))
+        guardar_documentos({libro.id: construir_documento(libro) for libro in libros})
+
+
+def _consulta_fts5(termino):
+    # Cada palabra se busca como prefijo; las comillas evitan que la
+    # sintaxis de FTS5 (AND, NEAR, *, ...) escrita por el usuario se interprete
+    palabras = re.findall(r'\w+', termino)
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def buscar(queryset, termino):
+    """
+    Filtra ``queryset`` (de Libro) por ``termino`` y anota ``rango``
+    (mayor es más relevante). Usa el índice de texto completo del motor.
+    """
+    termino = (termino or '').strip()
+    if not termino:
+        return queryset.annotate(rango=Value(0.0, output_field=FloatField()))
+
+    if connection.vendor == 'postgresql':
+        coincidencias = RawSQL(
+            "SELECT libro_id FROM libros_librobusqueda "
+            "WHERE vector @@ websearch_to_tsquery('spanish', %s) OR %s <%% documento",
+            (termino, termino),
+        )
+        # ts_rank y word_similarity son real (float4): en double precision el
+        # valor ordenado es el mismo que vuelve en el cursor y se compara con él
+        rango = RawSQL(
+            "SELECT (ts_rank(vector, websearch_to_tsquery('spanish', %s)) + word_similarity(%s, documento))"
+            "::double precision "
+            "FROM libros_librobusqueda WHERE libro_id = libros_libro.id",
+            (termino, termino),
+            output_field=FloatField(),
+        )
+    elif connection.vendor == 'sqlite':
+        consulta = _consulta_fts5(termino)
+        if not consulta:
+            return queryset.none()
+        coincidencias = RawSQL(
+            f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s",
+            (consulta,),
+        )
+        # bm25 devuelve valores negativos: cuanto menor, más relevante
+        rango = RawSQL(
+            f"SELECT -bm25({TABLA_FTS}) FROM {TABLA_FTS} "
+            f"WHERE {TABLA_FTS} MATCH %s AND rowid = libros_libro.id",
+            (consulta,),
+            output_field=FloatField(),
+        )
+    else:
+        # Otros motores: sin índice de texto completo, se busca sobre el documento
+        return queryset.filter(busqueda__documento__icontains=termino).annotate(
+            rango=Value(0.0, output_field=FloatField())
+        )
+
+    return queryset.filter(Q(id__in=coincidencias)).annotate(rango=rango)
@@ -0,0 +1,158 @@
+# libros/imagenes.py
+"""
+Variantes redimensionadas de las portadas (Libro.imagen). Cada tamaño se
+guarda en WebP y en JPEG, a 1x y 2x, junto al original en el mismo
+almacenamiento. Las rutas quedan en Libro.variantes_imagen:
+
+    {'origen': 'libros/portada.png',
+     'tarjeta': {'webp': [[250, 'libros/portada.tarjeta-250w.webp'], ...],
+                 'jpeg': [...]},
+     ...}
+
+``origen`` es el nombre del archivo del que salieron; si no coincide con
+``imagen.name`` las variantes están pendientes o desfasadas. Se generan
+en un grupo de hilos tras confirmar la transacción, o con
+``python manage.py generar_variantes_imagen``.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps
+
+from .models import Libro
+
+logger = logging.getLogger(__name__)
+
+# nombre: (ancho, alto, recortar). Recortar llena la caja exacta (como
+# object-fit: cover); si no, la imagen cabe en la caja sin deformarse.
+VARIANTES = {
+    'miniatura': (80, 112, True),
+    'tarjeta': (250, 280, True),
+    'detalle': (480, 720, False),
+}
+DENSIDADES = (1, 2)
+# formato: (formato de Pillow, extensión, opciones de guardado)
+FORMATOS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_grupo = None
+_cerrojo_grupo = threading.Lock()
+
+
+def pendiente(libro):
+    return bool(libro.imagen) and (libro.variantes_imagen or {}).get('origen') != libro.imagen.name
+
+
+def _nombre_variante(original, variante, ancho, extension):
+    raiz, _ = os.path.splitext(original)
+    return f"{raiz}.{variante}-{ancho}w.{extension}"
+
+
+def _a_rgb(imagen):
+    # JPEG no admite transparencia: se compone sobre fondo blanco
+    if imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, 'white')
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        return fondo
+    return imagen.convert('RGB')
+
+
+def _redimensionar(imagen, ancho, alto, recortar):
+    if recortar:
+        return ImageOps.fit(imagen, (ancho, alto), Image.Resampling.LANCZOS)
+    copia = imagen.copy()
+    copia.thumbnail((ancho, alto), Image.Resampling.LANCZOS)
+    return copia
+
+
+def _codificar(imagen, formato):
+    formato_pil, _, opciones = FORMATOS[formato]
+    salida = BytesIO()
+    imagen.save(salida, formato_pil, **opciones)
+    return salida.getvalue()
+
+
+def _rutas(variantes):
+    return {
+        ruta
+        for variante, formatos in variantes.items() if variante != 'origen'
+        for tamanos in formatos.values()
+        for _, ruta in tamanos
+    }
+
+
+def generar_variantes(libro_id):
+    """
+    Genera y guarda las variantes de la portada actual del libro. Si la
+    portada cambia mientras tanto no se sobrescribe el registro: la
+    siguiente generación (programada por ese cambio) lo hará.
+    """
+    libro = Libro.objects.only('id', 'imagen', 'variantes_imagen').filter(id=libro_id).first()
+    if libro is None or not libro.imagen:
+        return None
+    almacen = libro.imagen.storage
+    original = libro.imagen.name
+    # Con almacenamiento por contenido otra portada idéntica usa los mismos archivos
+    compartido = getattr(almacen, 'comparte_archivos', False)
+
+    with libro.imagen.open('rb') as archivo, Image.open(archivo) as imagen:
+        imagen = _a_rgb(ImageOps.exif_transpose(imagen))
+        variantes = {'origen': original}
+        for variante, (ancho, alto, recortar) in VARIANTES.items():
+            variantes[variante] = {formato: [] for formato in FORMATOS}
+            for densidad in DENSIDADES:
+                # Sin ampliar: una portada pequeña no gana nada a 2x
+                if densidad > 1 and (imagen.width < ancho * densidad or imagen.height < alto * densidad):
+                    continue
+                redimensionada = _redimensionar(imagen, ancho * densidad, alto * densidad, recortar)
+                for formato, (_, extension, _) in FORMATOS.items():
+                    nombre = _nombre_variante(original, variante, ancho * densidad, extension)
+                    if almacen.exists(nombre) and not compartido:
+                        almacen.delete(nombre)
+                    nombre = almacen.save(nombre, ContentFile(_codificar(redimensionada, formato)))
+                    variantes[variante][formato].append([redimensionada.width, nombre])
+
+    actualizado = (Libro.objects.filter(id=libro_id, imagen=original)
+                   .update(variantes_imagen=variantes))
+    obsoletas = _rutas(libro.variantes_imagen or {}) - _rutas(variantes)
+    if not actualizado:
+        obsoletas = _rutas(variantes)
+    if not compartido:
+        for ruta in obsoletas:
+            almacen.delete(ruta)
+    return variantes if actualizado else None
+
+
+def _tarea(libro_id):
+    try:
+        generar_variantes(libro_id)
+    except Exception:
+        logger.exception("No se pudieron generar las variantes de la portada del libro %s", libro_id)
+    finally:
+        # Cada hilo del grupo abre su propia conexión
+        connection.close()
+
+
+def _obtener_grupo():
+    global _grupo
+    with _cerrojo_grupo:
+        if _grupo is None:
+            _grupo = ThreadPoolExecutor(max_workers=settings.IMAGENES_HILOS,
+                                        thread_name_prefix='variantes-imagen')
+        return _grupo
+
+
+def programar_variantes(libro_id):
+    """Encarga las variantes al grupo de hilos (o las genera ya con IMAGENES_HILOS = 0)."""
+    if not settings.IMAGENES_HILOS:
+        return generar_variantes(libro_id)
+    return _obtener_grupo().submit(_tarea, libro_id)
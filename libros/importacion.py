@@ -0,0 +1,313 @@
+# libros/importacion.py
+"""
+Importación masiva del catálogo desde CSV o JSONL. El archivo se lee fila
+a fila y se guarda por lotes: un bulk_create de libros, otro de la tabla
+intermedia de categorías y otro de los documentos de búsqueda. Los
+autores y categorías se resuelven por nombre contra un mapa en memoria, así
+que la memoria depende del lote y del número de autores, no del archivo.
+
+Para la sincronización con el proveedor cada libro guarda la huella de los
+campos sincronizados de la última fila aplicada. Una fila con la misma
+huella no se toca, así que un cambio manual en la tienda se mantiene hasta
+que el proveedor cambie esa fila.
+"""
+import csv
+import hashlib
+import json
+from collections import Counter, namedtuple
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .busqueda import componer_documento, guardar_documentos, indexar_libros
+from .models import Autor, Categoria, Libro
+
+TAMANO_LOTE = 1000
+# En CSV las categorías van en una sola columna separadas por este carácter
+SEPARADOR_CATEGORIAS = '|'
+FORMATOS_LIBRO = dict(Libro.FORMATO_CHOICES)
+# Libro.precio es DecimalField(max_digits=10, decimal_places=2)
+PRECIO_MAXIMO = Decimal('1e8')
+
+LibroCategoria = Libro.categorias.through
+
+# Campos que la sincronización actualiza en libros existentes (más las categorías)
+CAMPOS_SINCRONIZADOS = ('precio', 'stock', 'descripcion')
+
+# creados/actualizados: libros insertados o modificados; sin_cambios: filas
+# cuya huella coincide; descartados: filas inválidas que no se guardaron
+ResultadoImportacion = namedtuple('ResultadoImportacion', ['creados', 'actualizados', 'sin_cambios', 'descartados'])
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+def leer_csv(archivo):
+    lector = csv.DictReader(archivo)
+    for fila in lector:
+        fila['categorias'] = (fila.get('categorias') or '').split(SEPARADOR_CATEGORIAS)
+        yield lector.line_num, fila
+
+
+def leer_jsonl(archivo):
+    for linea, texto in enumerate(archivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            fila = json.loads(texto)
+        except json.JSONDecodeError as e:
+            yield linea, FilaInvalida(f"JSON no válido: {e.msg}")
+            continue
+        if not isinstance(fila, dict):
+            yield linea, FilaInvalida("Cada línea debe ser un objeto JSON.")
+            continue
+        if isinstance(fila.get('categorias'), str):
+            fila['categorias'] = fila['categorias'].split(SEPARADOR_CATEGORIAS)
+        yield linea, fila
+
+
+LECTORES = {'csv': leer_csv, 'jsonl': leer_jsonl}
+
+
+def _texto(fila, campo, obligatorio=True):
+    valor = str(fila.get(campo) or '').strip()
+    if obligatorio and not valor:
+        raise FilaInvalida(f"Falta '{campo}'.")
+    return valor
+
+
+def _limpiar(fila):
+    """Valida una fila y la devuelve con los tipos del modelo."""
+    try:
+        precio = Decimal(str(fila.get('precio', '')).strip())
+    except InvalidOperation:
+        raise FilaInvalida(f"Precio no válido: {fila.get('precio')!r}.")
+    if not precio.is_finite() or not 0 <= precio < PRECIO_MAXIMO or precio.as_tuple().exponent < -2:
+        raise FilaInvalida(f"Precio no válido: {fila.get('precio')!r}.")
+
+    precio = precio.quantize(Decimal('0.01'))
+
+    stock = str(fila.get('stock') or '0').strip()
+    if not stock.isdigit():
+        raise FilaInvalida(f"Stock no válido: {fila.get('stock')!r}.")
+
+    formato = _texto(fila, 'formato', obligatorio=False) or 'fisico'
+    if formato not in FORMATOS_LIBRO:
+        raise FilaInvalida(f"Formato desconocido: {formato!r}.")
+
+    fecha = _texto(fila, 'fecha_publicacion', obligatorio=False)
+    try:
+        fecha = date.fromisoformat(fecha) if fecha else None
+    except ValueError:
+        raise FilaInvalida(f"Fecha no válida: {fecha!r}.")
+
+    titulo = _texto(fila, 'titulo')
+    autor = _texto(fila, 'autor')
+    if len(titulo) > Libro._meta.get_field('titulo').max_length:
+        raise FilaInvalida("Título demasiado largo.")
+    if len(autor) > Autor._meta.get_field('nombre').max_length:
+        raise FilaInvalida("Nombre de autor demasiado largo.")
+    categorias = list(dict.fromkeys(
+        nombre.strip() for nombre in fila.get('categorias') or [] if str(nombre).strip()
+    ))
+    if any(len(nombre) > Categoria._meta.get_field('nombre').max_length for nombre in categorias):
+        raise FilaInvalida("Nombre de categoría demasiado largo.")
+    referencia = _texto(fila, 'referencia', obligatorio=False) or None
+    if referencia and len(referencia) > Libro._meta.get_field('referencia').max_length:
+        raise FilaInvalida("Referencia demasiado larga.")
+
+    limpia = {
+        'referencia': referencia,
+        'titulo': titulo,
+        'autor': autor,
+        'categorias': categorias,
+        'descripcion': _texto(fila, 'descripcion', obligatorio=False),
+        'precio': precio,
+        'stock': int(stock),
+        'formato': formato,
+        'fecha_publicacion': fecha,
+    }
+    limpia['hash_contenido'] = huella(limpia)
+    return limpia
+
+
+def huella(fila):
+    """Resumen de los campos sincronizados de una fila ya validada."""
+    contenido = [str(fila['precio']), fila['stock'], fila['descripcion'], sorted(fila['categorias'])]
+    datos = json.dumps(contenido, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(datos, digest_size=16).hexdigest()
+
+
+def _mapa_por_nombre(modelo):
+    # Con nombres repetidos en la BD se usa el registro más antiguo
+    mapa = {}
+    for id_, nombre in modelo.objects.order_by('id').values_list('id', 'nombre').iterator():
+        mapa.setdefault(nombre, id_)
+    return mapa
+
+
+class ImportadorCatalogo:
+    """
+    Sin ``sincronizar`` solo inserta: las filas con una ``referencia`` que
+    ya existe se descartan. Con ``sincronizar`` la referencia es obligatoria
+    y las filas de libros existentes se comparan por su huella; solo las que
+    cambiaron se leen y se actualizan (precio, stock, descripción y
+    categorías). El título y el autor de un libro existente no se tocan.
+    """
+
+    def __init__(self, tamano_lote=TAMANO_LOTE, sincronizar=False):
+        self.tamano_lote = tamano_lote
+        self.sincronizar = sincronizar
+        self.categorias_cambiadas = False
+        self.autores = _mapa_por_nombre(Autor)
+        self.categorias = _mapa_por_nombre(Categoria)
+
+    def _resolver(self, modelo, mapa, nombres):
+        # Crea de una vez los nombres del lote que aún no existen
+        nuevos = [nombre for nombre in dict.fromkeys(nombres) if nombre not in mapa]
+        if nuevos:
+            for objeto in modelo.objects.bulk_create([modelo(nombre=nombre) for nombre in nuevos]):
+                mapa[objeto.nombre] = objeto.id
+
+    def _crear(self, filas):
+        self._resolver(Autor, self.autores, (fila['autor'] for fila in filas))
+        libros = Libro.objects.bulk_create([
+            Libro(autor_id=self.autores[fila['autor']],
+                  **{campo: valor for campo, valor in fila.items() if campo not in ('autor', 'categorias')})
+            for fila in filas
+        ])
+        LibroCategoria.objects.bulk_create([
+            LibroCategoria(libro_id=libro.id, categoria_id=self.categorias[nombre])
+            for libro, fila in zip(libros, filas)
+            for nombre in fila['categorias']
+        ])
+        # bulk_create no envía señales: los documentos de búsqueda se arman
+        # con los datos del lote, sin volver a leer los libros
+        guardar_documentos({
+            libro.id: componer_documento(fila['titulo'], fila['autor'], fila['categorias'], fila['descripcion'])
+            for libro, fila in zip(libros, filas)
+        })
+        if any(fila['categorias'] for fila in filas):
+            self.categorias_cambiadas = True
+
+    def _actualizar(self, cambios):
+        """Aplica las filas cambiadas: {libro_id: fila}."""
+        libros = Libro.objects.only('id', 'hash_contenido', *CAMPOS_SINCRONIZADOS).in_bulk(list(cambios))
+        campos = {'hash_contenido'}
+        reindexar = set()
+        for libro_id, fila in cambios.items():
+            libro = libros[libro_id]
+            for campo in CAMPOS_SINCRONIZADOS:
+                if getattr(libro, campo) != fila[campo]:
+                    setattr(libro, campo, fila[campo])
+                    campos.add(campo)
+                    if campo == 'descripcion':
+                        reindexar.add(libro_id)
+            libro.hash_contenido = fila['hash_contenido']
+        Libro.objects.bulk_update(libros.values(), sorted(campos))
+
+        # Solo las diferencias en la tabla intermedia
+        deseadas = {
+            libro_id: {self.categorias[nombre] for nombre in fila['categorias']}
+            for libro_id, fila in cambios.items()
+        }
+        sobrantes = []
+        for fila_id, libro_id, categoria_id in (LibroCategoria.objects
+                                                .filter(libro_id__in=list(cambios))
+                                                .values_list('id', 'libro_id', 'categoria_id')):
+            if categoria_id in deseadas[libro_id]:
+                deseadas[libro_id].discard(categoria_id)
+            else:
+                sobrantes.append(fila_id)
+                reindexar.add(libro_id)
+        nuevas = [
+            LibroCategoria(libro_id=libro_id, categoria_id=categoria_id)
+            for libro_id, categorias in deseadas.items()
+            for categoria_id in categorias
+        ]
+        reindexar.update(relacion.libro_id for relacion in nuevas)
+        if sobrantes:
+            LibroCategoria.objects.filter(id__in=sobrantes).delete()
+        LibroCategoria.objects.bulk_create(nuevas)
+        if sobrantes or nuevas:
+            self.categorias_cambiadas = True
+        indexar_libros(reindexar)
+
+    def _guardar_lote(self, lote, descartar):
+        """Guarda un lote de pares (línea, fila) y devuelve los contadores."""
+        existentes = {
+            referencia: (libro_id, huella)
+            for referencia, libro_id, huella in Libro.objects
+            .filter(referencia__in=[fila['referencia'] for _, fila in lote if fila['referencia']])
+            .values_list('referencia', 'id', 'hash_contenido')
+        }
+        nuevas = {}
+        vistos = {}
+        cuenta = Counter()
+        for linea, fila in lote:
+            referencia = fila['referencia']
+            if referencia and (referencia in existentes or referencia in nuevas) and not self.sincronizar:
+                descartar(linea, f"La referencia {referencia!r} ya existe.")
+                cuenta['descartados'] += 1
+            elif referencia in existentes:
+                libro_id, huella = existentes[referencia]
+                # Si la referencia se repite en el archivo gana la última fila
+                vistos[libro_id] = None if fila['hash_contenido'] == huella else fila
+            else:
+                nuevas[referencia or ('linea', linea)] = fila
+
+        self._resolver(Categoria, self.categorias, (
+            nombre for fila in [*nuevas.values(), *vistos.values()] if fila for nombre in fila['categorias']
+        ))
+        cambios = {libro_id: fila for libro_id, fila in vistos.items() if fila}
+        if nuevas:
+            self._crear(list(nuevas.values()))
+        if cambios:
+            self._actualizar(cambios)
+        cuenta.update(creados=len(nuevas), actualizados=len(cambios), sin_cambios=len(vistos) - len(cambios))
+        return cuenta
+
+    def _vaciar(self, lote, descartar):
+        with transaction.atomic():
+            return self._guardar_lote(lote, descartar)
+
+    def importar(self, filas, progreso=None, descartar=None):
+        """
+        Guarda las filas válidas de ``filas`` (pares (línea, dict)) por lotes.
+        ``progreso(procesadas)`` se llama tras cada lote y ``descartar(línea,
+        mensaje)`` con cada fila inválida, que no se guarda.
+        """
+        cuenta = Counter()
+        procesadas = 0
+
+        def _descartar(linea, mensaje):
+            cuenta['descartados'] += 1
+            if descartar:
+                descartar(linea, mensaje)
+
+        lote = []
+        for linea, fila in filas:
+            try:
+                if isinstance(fila, Exception):
+                    raise fila
+                fila = _limpiar(fila)
+                if self.sincronizar and not fila['referencia']:
+                    raise FilaInvalida("Falta 'referencia'.")
+            except FilaInvalida as e:
+                _descartar(linea, str(e))
+                continue
+            lote.append((linea, fila))
+            if len(lote) >= self.tamano_lote:
+                cuenta += self._vaciar(lote, _descartar)
+                procesadas += len(lote)
+                lote = []
+                if progreso:
+                    progreso(procesadas)
+        if lote:
+            cuenta += self._vaciar(lote, _descartar)
+            procesadas += len(lote)
+            if progreso:
+                progreso(procesadas)
+        return ResultadoImportacion(**{campo: cuenta[campo] for campo in ResultadoImportacion._fields})
@@ -0,0 +1,31 @@
+# libros/management/commands/calcular_relacionados.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from libros.relacionados import calcular_para, calcular_todos, procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Recalcula la tabla de libros relacionados a partir de categorías y autor compartidos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500,
+                            help="Libros por lote del cálculo completo (limita la memoria).")
+        parser.add_argument('--libro', type=int, action='append', dest='libros',
+                            help="Recalcular solo estos libros (se puede repetir).")
+        parser.add_argument('--pendientes', action='store_true',
+                            help="Recalcular solo los libros encolados al editar el catálogo y sus vecinos.")
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        if options['libros']:
+            procesados = len(calcular_para(options['libros']))
+        elif options['pendientes']:
+            procesados = procesar_pendientes(tamano_lote=options['lote'])
+        else:
+            procesados = calcular_todos(tamano_lote=options['lote'])
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{procesados} libros procesados en {duracion:.2f}s"
+        ))
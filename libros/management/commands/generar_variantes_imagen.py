@@ -0,0 +1,63 @@
+# libros/management/commands/generar_variantes_imagen.py
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from libros.imagenes import generar_variantes, pendiente
+from libros.models import Libro
+
+
+def _generar(libro_id):
+    try:
+        return generar_variantes(libro_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Genera las variantes redimensionadas de las portadas que aún no las tienen."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true',
+                            help="Regenerar también las portadas que ya tienen variantes.")
+        parser.add_argument('--hilos', type=int, default=4,
+                            help="Portadas procesadas en paralelo; con 0 se procesan en este hilo.")
+
+    def handle(self, *args, **options):
+        libros = (Libro.objects.exclude(imagen='').exclude(imagen__isnull=True)
+                  .only('id', 'imagen', 'variantes_imagen').order_by('id'))
+        pendientes = (libro.id for libro in libros.iterator(chunk_size=500)
+                      if options['todas'] or pendiente(libro))
+        self.procesadas = self.fallidas = 0
+        inicio = time.monotonic()
+
+        if options['hilos'] < 1:
+            for libro_id in pendientes:
+                self._resultado(libro_id, generar_variantes)
+        else:
+            with ThreadPoolExecutor(max_workers=options['hilos']) as grupo:
+                en_curso = {}
+                for libro_id in pendientes:
+                    # Pocas tareas en vuelo: la memoria no crece con el catálogo
+                    if len(en_curso) >= options['hilos'] * 2:
+                        hechas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                        for tarea in hechas:
+                            self._resultado(en_curso.pop(tarea), lambda _: tarea.result())
+                    en_curso[grupo.submit(_generar, libro_id)] = libro_id
+                for tarea in wait(en_curso).done:
+                    self._resultado(en_curso[tarea], lambda _: tarea.result())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.procesadas} portadas procesadas en {time.monotonic() - inicio:.2f}s; "
+            f"{self.fallidas} con errores"
+        ))
+
+    def _resultado(self, libro_id, obtener):
+        try:
+            obtener(libro_id)
+            self.procesadas += 1
+        except Exception as e:
+            self.stderr.write(f"Libro {libro_id}: {e}")
+            self.fallidas += 1
@@ -0,0 +1,60 @@
+# libros/management/commands/importar_catalogo.py
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from libros.importacion import LECTORES, TAMANO_LOTE, ImportadorCatalogo
+from libros.relacionados import calcular_todos
+
+
+class Command(BaseCommand):
+    help = ("Importa libros desde un archivo CSV o JSONL (columnas: referencia, titulo, autor, "
+            "categorias, descripcion, precio, stock, formato, fecha_publicacion).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=sorted(LECTORES),
+                            help="Por defecto se deduce de la extensión del archivo.")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE,
+                            help="Libros guardados por lote.")
+        parser.add_argument('--sincronizar', action='store_true',
+                            help="Actualizar los libros existentes (por referencia) cuyos datos cambiaron.")
+        parser.add_argument('--sin-relacionados', action='store_true',
+                            help="No recalcular la tabla de libros relacionados al terminar.")
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or os.path.splitext(options['archivo'])[1].lstrip('.').lower()
+        if formato not in LECTORES:
+            raise CommandError("Indica --formato csv o jsonl.")
+        if options['lote'] < 1:
+            raise CommandError("--lote debe ser mayor que cero.")
+
+        inicio = time.monotonic()
+
+        def progreso(procesadas):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{procesadas} filas ({procesadas / (time.monotonic() - inicio):.0f} filas/s)")
+
+        def descartar(linea, mensaje):
+            self.stderr.write(f"Línea {linea}: {mensaje}")
+
+        try:
+            archivo = open(options['archivo'], encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f"No se puede abrir {options['archivo']}: {e.strerror}")
+        with archivo:
+            importador = ImportadorCatalogo(tamano_lote=options['lote'], sincronizar=options['sincronizar'])
+            resultado = importador.importar(LECTORES[formato](archivo), progreso, descartar)
+        duracion = time.monotonic() - inicio
+        filas = sum(resultado)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.creados} libros importados, {resultado.actualizados} actualizados y "
+            f"{resultado.sin_cambios} sin cambios en {duracion:.2f}s "
+            f"({filas / duracion if duracion else 0:.0f} filas/s); "
+            f"{resultado.descartados} filas descartadas"
+        ))
+        if importador.categorias_cambiadas and not options['sin_relacionados']:
+            # Un único cálculo completo por matrices en vez de uno por libro
+            calcular_todos()
@@ -0,0 +1,93 @@
+# libros/management/commands/reubicar_imagenes.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from libros.almacenamiento import direccionado
+from libros.models import Libro
+
+
+class Command(BaseCommand):
+    help = ("Mueve las portadas (y sus variantes) guardadas con el nombre original "
+            "al almacenamiento por contenido, por lotes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=200)
+        parser.add_argument('--conservar', action='store_true',
+                            help="No borrar los archivos antiguos tras moverlos.")
+
+    def handle(self, *args, **options):
+        self.almacen = Libro._meta.get_field('imagen').storage
+        if not hasattr(self.almacen, 'nombre_por_contenido'):
+            raise CommandError("El almacenamiento por defecto no es por contenido (STORAGES['default']).")
+
+        inicio = time.monotonic()
+        movidos = errores = 0
+        ultimo = 0
+        while True:
+            lote = list(Libro.objects
+                        .filter(id__gt=ultimo).exclude(imagen='').exclude(imagen__isnull=True)
+                        .only('id', 'imagen', 'variantes_imagen')
+                        .order_by('id')[:options['lote']])
+            if not lote:
+                break
+            ultimo = lote[-1].id
+
+            cambiados, antiguos = [], set()
+            for libro in lote:
+                propios = set()
+                try:
+                    if self._reubicar(libro, propios):
+                        cambiados.append(libro)
+                        antiguos |= propios
+                except OSError as e:
+                    # Lo ya copiado queda en el almacén y el libro sigue con sus archivos
+                    self.stderr.write(f"Libro {libro.id}: {e}")
+                    errores += 1
+            with transaction.atomic():
+                Libro.objects.bulk_update(cambiados, ['imagen', 'variantes_imagen'])
+            movidos += len(cambiados)
+
+            if not options['conservar']:
+                # Solo los archivos que ya no usa ningún libro
+                en_uso = set(Libro.objects.filter(imagen__in=antiguos).values_list('imagen', flat=True))
+                for nombre in antiguos - en_uso:
+                    self.almacen.delete(nombre)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Hasta el libro {ultimo}: {movidos} portadas movidas")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{movidos} portadas movidas en {time.monotonic() - inicio:.2f}s; {errores} con errores"
+        ))
+
+    def _mover(self, nombre, antiguos):
+        if direccionado(nombre):
+            return nombre
+        with self.almacen.open(nombre, 'rb') as archivo:
+            nuevo = self.almacen.save(nombre, archivo)
+        antiguos.add(nombre)
+        return nuevo
+
+    def _reubicar(self, libro, antiguos):
+        variantes = libro.variantes_imagen or {}
+        pendientes = [libro.imagen.name] + [
+            ruta
+            for variante, formatos in variantes.items() if variante != 'origen'
+            for tamanos in formatos.values()
+            for _, ruta in tamanos
+        ]
+        if all(direccionado(nombre) for nombre in pendientes):
+            return False
+
+        original = libro.imagen.name
+        libro.imagen.name = self._mover(original, antiguos)
+        for variante, formatos in variantes.items():
+            if variante == 'origen':
+                continue
+            for tamanos in formatos.values():
+                for tamano in tamanos:
+                    tamano[1] = self._mover(tamano[1], antiguos)
+        if variantes.get('origen') == original:
+            variantes['origen'] = libro.imagen.name
+        return True
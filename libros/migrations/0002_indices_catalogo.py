@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['titulo', 'id'], name='libro_titulo_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['precio', 'id'], name='libro_precio_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['fecha_publicacion', 'id'], name='libro_fecha_id_idx'),
+        ),
+    ]
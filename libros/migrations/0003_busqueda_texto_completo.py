@@ -0,0 +1,98 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SQL_POSTGRESQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE libros_librobusqueda ADD COLUMN vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('spanish', documento)) STORED",
+    "CREATE INDEX libros_librobusqueda_vector_idx ON libros_librobusqueda USING gin (vector)",
+    "CREATE INDEX libros_librobusqueda_trgm_idx ON libros_librobusqueda USING gin (documento gin_trgm_ops)",
+]
+
+SQL_POSTGRESQL_REVERSO = [
+    "DROP INDEX IF EXISTS libros_librobusqueda_trgm_idx",
+    "DROP INDEX IF EXISTS libros_librobusqueda_vector_idx",
+    "ALTER TABLE libros_librobusqueda DROP COLUMN IF EXISTS vector",
+]
+
+# Tabla FTS5 de contenido externo sincronizada con triggers
+SQL_SQLITE = [
+    "CREATE VIRTUAL TABLE libros_libro_fts USING fts5("
+    "documento, content='libros_librobusqueda', content_rowid='libro_id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER libros_librobusqueda_ai AFTER INSERT ON libros_librobusqueda BEGIN "
+    "INSERT INTO libros_libro_fts(rowid, documento) VALUES (new.libro_id, new.documento); END",
+    "CREATE TRIGGER libros_librobusqueda_ad AFTER DELETE ON libros_librobusqueda BEGIN "
+    "INSERT INTO libros_libro_fts(libros_libro_fts, rowid, documento) "
+    "VALUES ('delete', old.libro_id, old.documento); END",
+    "CREATE TRIGGER libros_librobusqueda_au AFTER UPDATE ON libros_librobusqueda BEGIN "
+    "INSERT INTO libros_libro_fts(libros_libro_fts, rowid, documento) "
+    "VALUES ('delete', old.libro_id, old.documento); "
+    "INSERT INTO libros_libro_fts(rowid, documento) VALUES (new.libro_id, new.documento); END",
+]
+
+SQL_SQLITE_REVERSO = [
+    "DROP TRIGGER IF EXISTS libros_librobusqueda_au",
+    "DROP TRIGGER IF EXISTS libros_librobusqueda_ad",
+    "DROP TRIGGER IF EXISTS libros_librobusqueda_ai",
+    "DROP TABLE IF EXISTS libros_libro_fts",
+]
+
+
+def _ejecutar(schema_editor, sentencias):
+    for sentencia in sentencias:
+        schema_editor.execute(sentencia)
+
+
+def crear_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _ejecutar(schema_editor, SQL_POSTGRESQL)
+    elif vendor == 'sqlite':
+        _ejecutar(schema_editor, SQL_SQLITE)
+
+
+def borrar_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _ejecutar(schema_editor, SQL_POSTGRESQL_REVERSO)
+    elif vendor == 'sqlite':
+        _ejecutar(schema_editor, SQL_SQLITE_REVERSO)
+
+
+def poblar_documentos(apps, schema_editor):
+    Libro = apps.get_model('libros', 'Libro')
+    LibroBusqueda = apps.get_model('libros', 'LibroBusqueda')
+    libros = Libro.objects.select_related('autor').prefetch_related('categorias')
+    documentos = []
+    for libro in libros.iterator(chunk_size=500):
+        partes = [libro.titulo, libro.autor.nombre]
+        partes.extend(categoria.nombre for categoria in libro.categorias.all())
+        partes.append(libro.descripcion or '')
+        documentos.append(LibroBusqueda(libro_id=libro.id, documento='\n'.join(p for p in partes if p)))
+        if len(documentos) >= 500:
+            LibroBusqueda.objects.bulk_create(documentos)
+            documentos = []
+    LibroBusqueda.objects.bulk_create(documentos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0002_indices_catalogo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibroBusqueda',
+            fields=[
+                ('libro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='busqueda', serialize=False, to='libros.libro')),
+                ('documento', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(crear_indices, borrar_indices),
+        migrations.RunPython(poblar_documentos, migrations.RunPython.noop),
+    ]
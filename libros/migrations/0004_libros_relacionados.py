@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0003_busqueda_texto_completo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibroRelacionado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntuacion', models.PositiveIntegerField()),
+                ('posicion', models.PositiveSmallIntegerField()),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionados', to='libros.libro')),
+                ('relacionado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='libros.libro')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('libro', 'posicion'), name='libro_relacionado_posicion_unica')],
+            },
+        ),
+    ]
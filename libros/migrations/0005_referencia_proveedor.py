@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0004_libros_relacionados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='hash_contenido',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='referencia',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0005_referencia_proveedor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='variantes_imagen',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
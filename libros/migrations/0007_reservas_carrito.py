@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0006_variantes_imagen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='reservado',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
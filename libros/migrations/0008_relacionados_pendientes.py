@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0007_reservas_carrito'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelacionadoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='libros.libro')),
+            ],
+        ),
+    ]
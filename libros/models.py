@@ -1,5 +1,7 @@
 # libros/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
 
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100)
@@ -16,6 +18,18 @@ class Autor(models.Model):
     def __str__(self):
         return self.nombre
 
+class LibroQuerySet(models.QuerySet):
+    # Columnas que usan las tarjetas del catálogo y los cursores de orden
+    CAMPOS_TARJETA = ('id', 'titulo', 'precio', 'stock', 'reservado', 'formato',
+                      'fecha_publicacion', 'imagen', 'variantes_imagen', 'autor__nombre')
+    
+    def catalogo(self):
+        return self.select_related('autor').only(*self.CAMPOS_TARJETA)
+    
+    def detalle(self):
+        return self.select_related('autor').prefetch_related('categorias')
+
+
 class Libro(models.Model):
     FORMATO_CHOICES = [
         ('fisico', 'Físico'),
@@ -28,12 +42,174 @@ class Libro(models.Model):
     descripcion = models.TextField()
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
+    # Unidades retenidas en carritos hasta que se compren o venza la reserva
+    # (ver carrito/reservas.py); se pueden vender stock - reservado
+    reservado = models.PositiveIntegerField(default=0, editable=False)
     formato = models.CharField(max_length=10, choices=FORMATO_CHOICES)
     fecha_publicacion = models.DateField(blank=True, null=True)
     imagen = models.ImageField(upload_to='libros/', blank=True, null=True)
+    # Tamaños reducidos de la portada (ver libros.imagenes)
+    variantes_imagen = models.JSONField(default=dict, blank=True, editable=False)
+    # Identificador del libro en el catálogo del proveedor y huella de la
+    # última fila aplicada (ver libros.importacion)
+    referencia = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    hash_contenido = models.CharField(max_length=32, blank=True, default='')
+    
+    objects = LibroQuerySet.as_manager()
+    
+    class Meta:
+        # Índices para la paginación por cursor del catálogo
+        indexes = [
+            models.Index(fields=['titulo', 'id'], name='libro_titulo_id_idx'),
+            models.Index(fields=['precio', 'id'], name='libro_precio_id_idx'),
+            models.Index(fields=['fecha_publicacion', 'id'], name='libro_fecha_id_idx'),
+        ]
     
     def __str__(self):
         return self.titulo
     
+    def save(self, *args, **kwargs):
+        # reservado solo cambia con UPDATE sobre F() (ver carrito/reservas.py): un
+        # save() completo del formulario o del admin escribiría el valor que leyó
+        # y pisaría las reservas hechas mientras tanto
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name != 'reservado' and campo.attname not in diferidos
+            ]
+        super().save(*args, **kwargs)
+    
+    @property
+    def unidades_disponibles(self):
+        return max(self.stock - self.reservado, 0)
+    
     def disponible(self):
-        return self.stock > 0
\ No newline at end of file
+        return self.unidades_disponibles > 0
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Recordar el autor cargado para saber si cambió al guardar
+        instance = super().from_db(db, field_names, values)
+        instance._autor_id_cargado = instance.__dict__.get('autor_id')
+        return instance
+
+class LibroBusqueda(models.Model):
+    # Documento de búsqueda desnormalizado; los índices de texto completo
+    # (tsvector/trigramas en PostgreSQL, FTS5 en SQLite) se crean en la migración
+    libro = models.OneToOneField(Libro, on_delete=models.CASCADE, primary_key=True, related_name='busqueda')
+    documento = models.TextField()
+    
+    def __str__(self):
+        return f"Búsqueda de {self.libro_id}"
+
+
+class LibroRelacionado(models.Model):
+    # Vecinos precalculados de cada libro (ver libros.relacionados)
+    libro = models.ForeignKey(Libro, related_name='relacionados', on_delete=models.CASCADE)
+    relacionado = models.ForeignKey(Libro, related_name='+', on_delete=models.CASCADE)
+    puntuacion = models.PositiveIntegerField()
+    posicion = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'posicion'], name='libro_relacionado_posicion_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.libro_id} -> {self.relacionado_id} ({self.puntuacion})"
+
+
+class RelacionadoPendiente(models.Model):
+    # Libros cambiados cuyo entorno es demasiado grande para recalcularlo en la
+    # petición; los procesa `calcular_relacionados --pendientes` (ver libros.relacionados)
+    libro = models.ForeignKey(Libro, related_name='+', on_delete=models.CASCADE)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Relacionados pendientes de {self.libro_id}"
+
+
+@receiver(post_save, sender=Libro)
+def indexar_libro(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .busqueda import indexar_libros
+    indexar_libros([instance.pk])
+
+@receiver(m2m_changed, sender=Libro.categorias.through)
+def recordar_libros_categoria(sender, instance, action, reverse, **kwargs):
+    # categoria.libro_set.clear() no trae pk_set en post_clear: se anotan antes sus libros
+    if action == 'pre_clear' and reverse:
+        instance._libros_vaciados = list(instance.libro_set.values_list('id', flat=True))
+
+def _libros_cambiados(instance, action, reverse, pk_set):
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return getattr(instance, '_libros_vaciados', [])
+    return list(pk_set or [])
+
+@receiver(m2m_changed, sender=Libro.categorias.through)
+def indexar_categorias_libro(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from .busqueda import indexar_libros
+    libro_ids = _libros_cambiados(instance, action, reverse, pk_set)
+    if libro_ids:
+        indexar_libros(libro_ids)
+
+@receiver(post_save, sender=Autor)
+def indexar_libros_autor(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    from .busqueda import indexar_libros
+    indexar_libros(instance.libro_set.values_list('id', flat=True))
+
+@receiver(post_save, sender=Categoria)
+def indexar_libros_categoria(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    from .busqueda import indexar_libros
+    indexar_libros(instance.libro_set.values_list('id', flat=True))
+
+@receiver(post_save, sender=Libro)
+def relacionar_libro(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    autor_cambiado = getattr(instance, '_autor_id_cargado', None) != instance.autor_id
+    if created or autor_cambiado:
+        from .relacionados import actualizar_relacionados
+        actualizar_relacionados([instance.pk])
+    instance._autor_id_cargado = instance.autor_id
+
+@receiver(m2m_changed, sender=Libro.categorias.through)
+def relacionar_categorias_libro(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from .relacionados import actualizar_relacionados
+    actualizar_relacionados(_libros_cambiados(instance, action, reverse, pk_set))
+
+@receiver(post_save, sender=Libro)
+def programar_variantes_libro(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Las variantes se generan fuera de la petición, cuando la portada ya está guardada
+    if raw or (update_fields is not None and 'imagen' not in update_fields):
+        return
+    if instance.get_deferred_fields() & {'imagen', 'variantes_imagen'}:
+        return
+    from .imagenes import pendiente, programar_variantes
+    if pendiente(instance):
+        libro_id = instance.pk
+        transaction.on_commit(lambda: programar_variantes(libro_id))
+
+@receiver(pre_delete, sender=Libro)
+def recordar_vecinos_libro(sender, instance, **kwargs):
+    # El borrado en cascada quita las filas; los libros que lo listaban se recalculan después
+    instance._vecinos = list(
+        LibroRelacionado.objects.filter(relacionado=instance).values_list('libro_id', flat=True)
+    )
+
+@receiver(post_delete, sender=Libro)
+def recalcular_vecinos_libro(sender, instance, **kwargs):
+    from .relacionados import recalcular
+    recalcular(getattr(instance, '_vecinos', []))
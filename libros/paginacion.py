@@ -0,0 +1,157 @@
+# libros/paginacion.py
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+
+class _CodificadorCursor(DjangoJSONEncoder):
+    # DjangoJSONEncoder recorta las fechas a milisegundos; el cursor necesita
+    # el valor exacto o se saltaría filas creadas en el mismo milisegundo
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class PaginaCursor:
+    """Una página de resultados con los cursores para moverse a los lados."""
+
+    def __init__(self, objetos, siguiente=None, anterior=None):
+        self.objetos = objetos
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    def __bool__(self):
+        return bool(self.objetos)
+
+    def tiene_otras_paginas(self):
+        return bool(self.siguiente or self.anterior)
+
+
+class PaginadorCursor:
+    """
+    Paginación por keyset: cada página se pide con un WHERE sobre las
+    columnas de orden de la última fila vista, así que nunca se usa
+    OFFSET ni COUNT(*). El último campo de ``orden`` debe ser único
+    (normalmente el id) para que el orden sea estable.
+    """
+
+    SIGUIENTE = 's'
+    ANTERIOR = 'a'
+
+    def __init__(self, queryset, orden, por_pagina=24):
+        self.queryset = queryset
+        self.orden = list(orden)
+        self.por_pagina = por_pagina
+
+    def pagina(self, cursor=None):
+        direccion, valores = self.decodificar(cursor)
+        atras = direccion == self.ANTERIOR
+
+        qs = self.queryset.order_by(*self._ordenamiento(atras))
+        if valores is not None:
+            qs = qs.filter(self._filtro_posterior(valores, atras))
+
+        objetos = list(qs[:self.por_pagina + 1])
+        hay_mas = len(objetos) > self.por_pagina
+        objetos = objetos[:self.por_pagina]
+        if atras:
+            objetos.reverse()
+
+        siguiente = anterior = None
+        if objetos:
+            if hay_mas or atras:
+                siguiente = self.codificar(objetos[-1], self.SIGUIENTE)
+            if (hay_mas and atras) or (valores is not None and not atras):
+                anterior = self.codificar(objetos[0], self.ANTERIOR)
+        return PaginaCursor(objetos, siguiente=siguiente, anterior=anterior)
+
+    # Cursores
+
+    def codificar(self, objeto, direccion):
+        valores = [getattr(objeto, campo) for campo, _ in self.orden]
+        datos = json.dumps({'d': direccion, 'v': valores}, cls=_CodificadorCursor)
+        return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+    def decodificar(self, cursor):
+        # Un cursor inválido o manipulado simplemente vuelve a la primera página
+        if not cursor:
+            return self.SIGUIENTE, None
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+            direccion = datos['d']
+            valores = datos['v']
+            if direccion not in (self.SIGUIENTE, self.ANTERIOR) or len(valores) != len(self.orden):
+                raise ValueError
+            valores = [self._a_python(campo, valor) for (campo, _), valor in zip(self.orden, valores)]
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError):
+            return self.SIGUIENTE, None
+        return direccion, valores
+
+    # Construcción de la consulta
+
+    def _campo_modelo(self, campo):
+        try:
+            return self.queryset.model._meta.get_field(campo)
+        except FieldDoesNotExist:
+            # Anotaciones (p. ej. el rango de búsqueda)
+            return None
+
+    def _a_python(self, campo, valor):
+        campo_modelo = self._campo_modelo(campo)
+        if valor is None or campo_modelo is None:
+            return valor
+        return campo_modelo.to_python(valor)
+
+    def _es_nulable(self, campo):
+        campo_modelo = self._campo_modelo(campo)
+        return campo_modelo is not None and campo_modelo.null
+
+    def _ordenamiento(self, atras):
+        # Los nulos van siempre al final en el sentido de avance
+        ordenamiento = []
+        for campo, descendente in self.orden:
+            descendente = descendente != atras
+            extra = {}
+            if self._es_nulable(campo):
+                extra = {'nulls_first': True} if atras else {'nulls_last': True}
+            expresion = F(campo).desc(**extra) if descendente else F(campo).asc(**extra)
+            ordenamiento.append(expresion)
+        return ordenamiento
+
+    def _posterior(self, campo, valor, descendente, atras):
+        nulos_al_final = self._es_nulable(campo) and not atras
+        if valor is None:
+            # Con los nulos al final no hay nada después de un nulo en esta columna
+            return Q(**{f'{campo}__isnull': False}) if atras else None
+        comparacion = 'lt' if descendente != atras else 'gt'
+        condicion = Q(**{f'{campo}__{comparacion}': valor})
+        if nulos_al_final:
+            condicion |= Q(**{f'{campo}__isnull': True})
+        return condicion
+
+    def _filtro_posterior(self, valores, atras):
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y)
+        filtro = None
+        iguales = Q()
+        for (campo, descendente), valor in zip(self.orden, valores):
+            posterior = self._posterior(campo, valor, descendente, atras)
+            if posterior is not None:
+                filtro = iguales & posterior if filtro is None else filtro | (iguales & posterior)
+            if valor is None:
+                iguales &= Q(**{f'{campo}__isnull': True})
+            else:
+                iguales &= Q(**{campo: valor})
+        return filtro if filtro is not None else Q(pk__in=[])
@@ -0,0 +1,310 @@
+# libros/relacionados.py
+"""
+Libros relacionados precalculados (LibroRelacionado): los
+RELACIONADOS_POR_LIBRO que más categorías y autor comparten con cada uno.
+
+Al cambiar un libro (señales de libros.models) solo se hace en la petición
+lo acotado: su propia lista y las listas que ya lo incluyen o en las que
+ahora entraría por delante del cuarto. Si son más de MAX_INCREMENTAL, o
+cambian más de MAX_CAMBIADOS libros a la vez, el libro se encola en
+RelacionadoPendiente y se recalcula con matrices al confirmar la
+transacción, en un hilo aparte, o con ``calcular_relacionados --pendientes``.
+"""
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Libro, LibroRelacionado, RelacionadoPendiente
+
+logger = logging.getLogger(__name__)
+
+RELACIONADOS_POR_LIBRO = 4
+# Tope de pares (elementos no nulos) del producto de matrices de un lote
+MAX_PARES_POR_LOTE = 2_000_000
+# Listas que se tocan en la petición por cada libro cambiado; con más se encola
+MAX_INCREMENTAL = 200
+# Libros cambiados de una vez (p. ej. categoria.libro_set.add(...)) que se
+# actualizan en la petición; con más se encolan todos
+MAX_CAMBIADOS = 20
+# Cada categoría compartida suma 1; compartir autor suma 2
+PESO_CATEGORIA = 1
+PESO_AUTOR = 2
+
+LibroCategoria = Libro.categorias.through
+
+_grupo = None
+_cerrojo_grupo = threading.Lock()
+
+
+def _guardar(vecinos_por_libro):
+    """Reemplaza las filas de los libros indicados: {libro_id: [(relacionado_id, puntuacion), ...]}"""
+    filas = [
+        LibroRelacionado(libro_id=libro_id, relacionado_id=relacionado_id,
+                         puntuacion=puntuacion, posicion=posicion)
+        for libro_id, vecinos in vecinos_por_libro.items()
+        for posicion, (relacionado_id, puntuacion) in enumerate(vecinos)
+    ]
+    with transaction.atomic():
+        LibroRelacionado.objects.filter(libro_id__in=list(vecinos_por_libro)).delete()
+        LibroRelacionado.objects.bulk_create(filas)
+
+
+def _comparten(libro_id, autor_id):
+    categorias = LibroCategoria.objects.filter(libro_id=libro_id).values('categoria_id')
+    return (Q(id__in=LibroCategoria.objects.filter(categoria_id__in=categorias).values('libro_id'))
+            | Q(autor_id=autor_id))
+
+
+def _puntuacion(libro_id, autor_id):
+    # Puntuación de cada fila de Libro respecto a ``libro_id``, calculada en la BD
+    categorias = LibroCategoria.objects.filter(libro_id=libro_id).values('categoria_id')
+    comunes = (LibroCategoria.objects
+               .filter(libro_id=OuterRef('id'), categoria_id__in=categorias)
+               .order_by()
+               .values('libro_id')
+               .annotate(n=Count('id'))
+               .values('n'))
+    return (Coalesce(Subquery(comunes, output_field=IntegerField()), 0) * PESO_CATEGORIA
+            + Case(When(autor_id=autor_id, then=Value(PESO_AUTOR)), default=Value(0)))
+
+
+def _vecinos(libro_id, autor_id):
+    # Una sola consulta: candidatos por categoría o autor, puntuados y ordenados en la BD
+    candidatos = (Libro.objects
+                  .filter(_comparten(libro_id, autor_id))
+                  .exclude(id=libro_id)
+                  .annotate(puntuacion=_puntuacion(libro_id, autor_id))
+                  .order_by('-puntuacion', '-id')
+                  .values_list('id', 'puntuacion'))
+    return list(candidatos[:RELACIONADOS_POR_LIBRO])
+
+
+def calcular_para(libro_ids):
+    """Recalcula los relacionados de unos pocos libros (camino incremental)."""
+    libros = Libro.objects.filter(id__in=list(libro_ids)).values_list('id', 'autor_id')
+    vecinos = {libro_id: _vecinos(libro_id, autor_id) for libro_id, autor_id in libros}
+    if vecinos:
+        _guardar(vecinos)
+    return vecinos
+
+
+def _listas_afectadas(libro_id, autor_id):
+    """
+    Libros cuya lista puede cambiar con ``libro_id``: los que ya lo listan
+    y los que comparten algo con él y tienen hueco o lo pondrían por
+    delante de su cuarto (a igual puntuación gana el id mayor). Filas
+    (id, puntuación nueva, puntuación con la que lo listan o None).
+    """
+    filas = LibroRelacionado.objects.filter(libro_id=OuterRef('id'))
+    cuarto = filas.filter(posicion=RELACIONADOS_POR_LIBRO - 1)
+    listadores = LibroRelacionado.objects.filter(relacionado_id=libro_id).values('libro_id')
+    return (Libro.objects
+            .filter(_comparten(libro_id, autor_id) | Q(id__in=listadores))
+            .exclude(id=libro_id)
+            .annotate(puntuacion=_puntuacion(libro_id, autor_id),
+                      actual=Subquery(filas.filter(relacionado_id=libro_id).values('puntuacion')[:1]),
+                      cuarta=Subquery(cuarto.values('puntuacion')[:1]),
+                      cuarto_id=Subquery(cuarto.values('relacionado_id')[:1]))
+            .filter(Q(actual__isnull=False) | Q(puntuacion__gt=0) & (
+                Q(cuarta__isnull=True)
+                | Q(puntuacion__gt=F('cuarta'))
+                | Q(puntuacion=F('cuarta'), cuarto_id__lt=libro_id)))
+            .order_by()
+            .values_list('id', 'puntuacion', 'actual'))
+
+
+def _colocar(libro_id, puntuaciones):
+    """
+    Mete ``libro_id`` en las listas de {libro: puntuación nueva} sin
+    recalcularlas: el resto de cada lista no cambia y solo hay que
+    reordenarla (vale si la puntuación no bajó).
+    """
+    listas = defaultdict(list)
+    filas = (LibroRelacionado.objects.filter(libro_id__in=list(puntuaciones))
+             .exclude(relacionado_id=libro_id)
+             .values_list('libro_id', 'relacionado_id', 'puntuacion'))
+    for libro, relacionado, puntuacion in filas:
+        listas[libro].append((relacionado, puntuacion))
+    _guardar({
+        libro: sorted(listas[libro] + [(libro_id, puntuacion)],
+                      key=lambda vecino: (-vecino[1], -vecino[0]))[:RELACIONADOS_POR_LIBRO]
+        for libro, puntuacion in puntuaciones.items()
+    })
+
+
+def recalcular(libro_ids):
+    """Recalcula las listas de ``libro_ids`` ya si son pocas o las encola."""
+    libro_ids = list(libro_ids)
+    if len(libro_ids) > MAX_INCREMENTAL:
+        encolar(libro_ids)
+    elif libro_ids:
+        calcular_para(libro_ids)
+
+
+def actualizar_relacionados(libro_ids):
+    """
+    Pone al día la tabla tras cambiar el autor o las categorías de
+    ``libro_ids`` (o crearlos): la lista de cada uno y las que lo incluyen
+    o deberían incluirlo (el top-k no es simétrico: un libro puede tener
+    que listarlo aunque él no lo liste). Las listas que lo tenían con más
+    puntuación se recalculan; en las demás solo se coloca. Lo que pase de
+    los topes se encola.
+    """
+    libro_ids = list(libro_ids)
+    if len(libro_ids) > MAX_CAMBIADOS:
+        encolar(libro_ids)
+        return
+    for libro_id, autor_id in Libro.objects.filter(id__in=libro_ids).values_list('id', 'autor_id'):
+        calcular_para([libro_id])
+        afectadas = list(_listas_afectadas(libro_id, autor_id)[:MAX_INCREMENTAL + 1])
+        if len(afectadas) > MAX_INCREMENTAL:
+            encolar([libro_id])
+            continue
+        calcular_para([otro for otro, puntuacion, actual in afectadas
+                       if actual is not None and puntuacion < actual])
+        subidas = {otro: puntuacion for otro, puntuacion, actual in afectadas
+                   if actual is None or puntuacion > actual}
+        if subidas:
+            _colocar(libro_id, subidas)
+
+
+def encolar(libro_ids):
+    RelacionadoPendiente.objects.bulk_create([RelacionadoPendiente(libro_id=libro_id) for libro_id in libro_ids])
+    if settings.RELACIONADOS_EN_SEGUNDO_PLANO:
+        transaction.on_commit(programar_pendientes)
+
+
+def procesar_pendientes(tamano_lote=500):
+    """
+    Recalcula con matrices, de una vez, los libros encolados y todas las
+    listas a las que pueden afectar: las que ya los listan y las de
+    quien comparte categoría o autor con ellos. Solo se borran las
+    entradas leídas al empezar. Devuelve los libros procesados.
+    """
+    ultima = RelacionadoPendiente.objects.aggregate(ultima=Max('id'))['ultima']
+    if ultima is None:
+        return 0
+    pendientes = RelacionadoPendiente.objects.filter(id__lte=ultima)
+    cambiados = pendientes.values('libro_id')
+    categorias = LibroCategoria.objects.filter(libro_id__in=cambiados).values('categoria_id')
+    afectados = Libro.objects.filter(
+        Q(id__in=cambiados)
+        | Q(id__in=LibroCategoria.objects.filter(categoria_id__in=categorias).values('libro_id'))
+        | Q(autor_id__in=Libro.objects.filter(id__in=cambiados).values('autor_id'))
+        | Q(id__in=LibroRelacionado.objects.filter(relacionado_id__in=cambiados).values('libro_id'))
+    ).values_list('id', flat=True)
+    procesados = calcular_todos(tamano_lote=tamano_lote, libro_ids=set(afectados))
+    pendientes.delete()
+    return procesados
+
+
+def _tarea():
+    try:
+        procesar_pendientes()
+    except Exception:
+        logger.exception("No se pudieron recalcular los libros relacionados pendientes")
+    finally:
+        # El hilo abre su propia conexión
+        connection.close()
+
+
+def programar_pendientes():
+    """Encarga los pendientes a un único hilo: las tandas se procesan de una en una."""
+    global _grupo
+    with _cerrojo_grupo:
+        if _grupo is None:
+            _grupo = ThreadPoolExecutor(max_workers=1, thread_name_prefix='libros-relacionados')
+    return _grupo.submit(_tarea)
+
+
+def _matriz_indicadora(filas, columnas, n_filas):
+    valores, columnas = np.unique(columnas, return_inverse=True)
+    return sparse.csr_matrix(
+        (np.ones(len(filas), dtype=np.int32), (filas, columnas)),
+        shape=(n_filas, len(valores)),
+    )
+
+
+def _lotes(filas, estimacion, tamano_lote, max_pares):
+    """Parte ``filas`` en lotes de hasta ``tamano_lote`` filas y ~``max_pares`` pares estimados."""
+    lote, pares = [], 0
+    for fila in filas:
+        if lote and (len(lote) == tamano_lote or pares + estimacion[fila] > max_pares):
+            yield np.array(lote)
+            lote, pares = [], 0
+        lote.append(fila)
+        pares += estimacion[fila]
+    if lote:
+        yield np.array(lote)
+
+
+def calcular_todos(tamano_lote=500, libro_ids=None, max_pares=MAX_PARES_POR_LOTE):
+    """
+    Recalcula la tabla completa, o solo las filas de ``libro_ids``. La
+    puntuación de todos los pares de un lote de libros sale de dos
+    productos de matrices dispersas (libros x categorías y libros x
+    autores). Cada fila del producto tiene como mucho tantos elementos
+    como libros comparten categoría o autor con ella; esa cota se calcula
+    antes y los lotes se cortan para no pasar de ``max_pares``, así que la
+    memoria no crece con el catálogo ni con el tamaño de las categorías
+    (salvo un libro que por sí solo supere el tope, que va en un lote
+    propio). Devuelve los libros procesados.
+    """
+    # Un cálculo completo deja al día también lo que estaba encolado hasta ahora
+    encolados = None
+    if libro_ids is None:
+        encolados = RelacionadoPendiente.objects.aggregate(ultima=Max('id'))['ultima']
+    libros = np.array(Libro.objects.order_by('id').values_list('id', 'autor_id'), dtype=np.int64).reshape(-1, 2)
+    ids, autores = libros[:, 0], libros[:, 1]
+    n = len(ids)
+    if not n:
+        if libro_ids is None:
+            LibroRelacionado.objects.all().delete()
+            RelacionadoPendiente.objects.all().delete()
+        return 0
+
+    pares = np.array(LibroCategoria.objects.values_list('libro_id', 'categoria_id'), dtype=np.int64).reshape(-1, 2)
+    por_categoria = _matriz_indicadora(np.searchsorted(ids, pares[:, 0]), pares[:, 1], n)
+    por_autor = _matriz_indicadora(np.arange(n), autores, n)
+    por_categoria_t = por_categoria.T.tocsr()
+    por_autor_t = por_autor.T.tocsr()
+    # Cota de elementos por fila: suma de los tamaños de sus categorías y de su autor
+    estimacion = (por_categoria @ np.asarray(por_categoria.sum(axis=0)).ravel()
+                  + por_autor @ np.asarray(por_autor.sum(axis=0)).ravel())
+
+    if libro_ids is None:
+        filas = np.arange(n)
+    else:
+        pedidos = np.array(sorted(libro_ids), dtype=np.int64)
+        posiciones = np.searchsorted(ids, pedidos)
+        filas = posiciones[(posiciones < n) & (ids[np.minimum(posiciones, n - 1)] == pedidos)]
+
+    for lote in _lotes(filas, estimacion, tamano_lote, max_pares):
+        puntuaciones = (por_categoria[lote] @ por_categoria_t) * PESO_CATEGORIA
+        puntuaciones = puntuaciones + (por_autor[lote] @ por_autor_t) * PESO_AUTOR
+        puntuaciones = puntuaciones.tocsr()
+
+        vecinos = {}
+        for posicion, fila in enumerate(lote):
+            desde, hasta = puntuaciones.indptr[posicion], puntuaciones.indptr[posicion + 1]
+            columnas = puntuaciones.indices[desde:hasta]
+            valores = puntuaciones.data[desde:hasta]
+            propio = columnas != fila
+            columnas, valores = columnas[propio], valores[propio]
+            # Mayor puntuación primero y, a igualdad, el libro más reciente
+            orden = np.lexsort((-ids[columnas], -valores))[:RELACIONADOS_POR_LIBRO]
+            vecinos[int(ids[fila])] = [
+                (int(ids[columnas[i]]), int(valores[i])) for i in orden
+            ]
+        _guardar(vecinos)
+    if encolados is not None:
+        RelacionadoPendiente.objects.filter(id__lte=encolados).delete()
+    return len(filas)
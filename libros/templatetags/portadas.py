@@ -0,0 +1,48 @@
+# libros/templatetags/portadas.py
+from django import template
+
+from libros.imagenes import VARIANTES
+
+register = template.Library()
+
+
+def _fuentes(libro, variante):
+    """{formato: [(ancho, url), ...]} de las variantes ya generadas de la portada actual."""
+    variantes = libro.variantes_imagen or {}
+    if not libro.imagen or variantes.get('origen') != libro.imagen.name:
+        return {}
+    almacen = libro.imagen.storage
+    return {
+        formato: [(ancho, almacen.url(ruta)) for ancho, ruta in tamanos]
+        for formato, tamanos in variantes.get(variante, {}).items() if tamanos
+    }
+
+
+def _srcset(fuentes, formato):
+    return ', '.join(f"{url} {ancho}w" for ancho, url in fuentes.get(formato, []))
+
+
+@register.simple_tag
+def srcset(libro, variante, formato='jpeg'):
+    """Valor del atributo srcset de una variante: "url 250w, url 500w"."""
+    return _srcset(_fuentes(libro, variante), formato)
+
+
+@register.inclusion_tag('libros/_portada.html')
+def portada(libro, variante, clase='', sizes=None):
+    """
+    <picture> con WebP y JPEG de la variante. Mientras no existan las
+    variantes (recién subida o pendiente de generar) usa el original.
+    """
+    ancho, alto, recortar = VARIANTES[variante]
+    fuentes = _fuentes(libro, variante)
+    return {
+        'libro': libro,
+        'clase': clase,
+        'sizes': sizes or f"{ancho}px",
+        'ancho': ancho,
+        'alto': alto if recortar else None,
+        'webp': _srcset(fuentes, 'webp'),
+        'jpeg': _srcset(fuentes, 'jpeg'),
+        'src': fuentes['jpeg'][0][1] if fuentes.get('jpeg') else libro.imagen.url,
+    }
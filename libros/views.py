@@ -1,10 +1,32 @@
 # libros/views.py
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from .models import Libro, Categoria, Autor
-from django.db.models import Q
+from django.views import static
+from .almacenamiento import direccionado
+from .models import Libro, Categoria, Autor, LibroRelacionado
+from .paginacion import PaginadorCursor
+from .busqueda import buscar
+
+LIBROS_POR_PAGINA = 24
+
+# Órdenes estables del catálogo: el id final desempata y hace único el cursor
+ORDENES_CATALOGO = {
+    'titulo': [('titulo', False), ('id', False)],
+    'precio': [('precio', False), ('id', False)],
+    'fecha': [('fecha_publicacion', True), ('id', True)],
+    'recientes': [('id', True)],
+    # Solo tiene sentido con una búsqueda; el rango lo anota libros.busqueda
+    'relevancia': [('rango', True), ('id', True)],
+}
+
+ORDEN_CHOICES = [
+    ('titulo', 'Título'),
+    ('precio', 'Precio'),
+    ('fecha', 'Fecha de publicación'),
+    ('recientes', 'Novedades'),
+    ('relevancia', 'Relevancia'),
+]
 
-@login_required
 def lista_libros(request):
     categorias = Categoria.objects.all()
     
@@ -12,8 +34,13 @@ def lista_libros(request):
     categoria_id = request.GET.get('categoria')
     formato = request.GET.get('formato')
     busqueda = request.GET.get('busqueda')
+    orden = request.GET.get('orden')
+    if orden not in ORDENES_CATALOGO:
+        orden = 'relevancia' if busqueda else 'titulo'
+    elif orden == 'relevancia' and not busqueda:
+        orden = 'titulo'
     
-    libros = Libro.objects.all()
+    libros = Libro.objects.catalogo()
     
     # Aplicar filtros
     if categoria_id:
@@ -23,25 +50,46 @@ def lista_libros(request):
         libros = libros.filter(formato=formato)
     
     if busqueda:
-        libros = libros.filter(
-            Q(titulo__icontains=busqueda) | 
-            Q(autor__nombre__icontains=busqueda)
-        )
+        libros = buscar(libros, busqueda)
+    
+    paginador = PaginadorCursor(libros, ORDENES_CATALOGO[orden], por_pagina=LIBROS_POR_PAGINA)
+    pagina = paginador.pagina(request.GET.get('cursor'))
     
     return render(request, 'libros/lista_libros.html', {
-        'libros': libros,
-        'categorias': categorias
+        'libros': pagina,
+        'pagina': pagina,
+        'categorias': categorias,
+        'orden': orden,
+        'ordenes': ORDEN_CHOICES,
     })
 
-@login_required
 def detalle_libro(request, libro_id):
-    libro = get_object_or_404(Libro, id=libro_id)
-    libros_relacionados = Libro.objects.filter(categorias__in=libro.categorias.all()).exclude(id=libro.id).distinct()[:4]
+    libro = get_object_or_404(Libro.objects.detalle(), id=libro_id)
+    # Vecinos precalculados (ver libros.relacionados): una búsqueda por índice
+    libros_relacionados = [
+        fila.relacionado for fila in
+        LibroRelacionado.objects.filter(libro=libro)
+        .select_related('relacionado__autor')
+        .only('posicion', 'libro_id', 'relacionado__id', 'relacionado__titulo', 'relacionado__precio',
+              'relacionado__formato', 'relacionado__autor__nombre')
+        .order_by('posicion')
+    ]
     
     return render(request, 'libros/detalle_libro.html', {
         'libro': libro,
         'libros_relacionados': libros_relacionados
     })
+
+# Un año: el máximo que respetan los navegadores y CDN
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+
+def servir_medio(request, ruta):
+    # Solo con DEBUG (ver libreria_online/urls.py): static.serve no está pensado para producción
+    response = static.serve(request, ruta, document_root=settings.MEDIA_ROOT)
+    # Un nombre por contenido no cambia nunca de contenido: se puede cachear sin revalidar
+    if response.status_code == 200 and direccionado(ruta):
+        response['Cache-Control'] = CACHE_INMUTABLE
+    return response
     
 # libros/views.py
 from django.shortcuts import render, get_object_or_404, redirect
@@ -53,11 +101,13 @@ from .forms import LibroForm
 # Asumo que ya tienes estas vistas
 class LibroListView(ListView):
     model = Libro
+    queryset = Libro.objects.catalogo()
     template_name = 'libros/lista_libros.html'
     context_object_name = 'libros'
 
 class LibroDetailView(DetailView):
     model = Libro
+    queryset = Libro.objects.detalle()
     template_name = 'libros/detalle_libro.html'
     context_object_name = 'libro'
 
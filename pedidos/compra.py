@@ -0,0 +1,122 @@
+# pedidos/compra.py
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+
+from carrito.models import ItemCarrito
+from carrito.precios import calcular_descuento
+from libros.models import Libro
+from .models import DetallePedido, Pedido
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, titulo):
+        super().__init__(f"No hay suficiente stock para '{titulo}'.")
+        self.titulo = titulo
+
+
+def _sin_reservar(cantidades, reservadas):
+    # Por cada libro, la condición de que alcancen sus unidades libres para lo no reservado
+    return reduce(or_, (
+        Q(id=libro_id, stock__gte=F('reservado') + (cantidad - reservadas.get(libro_id, 0)))
+        for libro_id, cantidad in cantidades.items()
+    ))
+
+
+def descontar_stock(cantidades, reservadas=None):
+    """
+    Descuenta {libro_id: cantidad} en un único UPDATE condicionado a que
+    quede stock en cada fila. Las unidades de ``reservadas`` ({libro_id:
+    cantidad}) ya están retenidas en Libro.reservado: se consumen sin
+    volver a comprobarlas y solo el resto tiene que caber en lo libre.
+    Devuelve cuántas filas se actualizaron.
+    """
+    reservadas = reservadas or {}
+    return Libro.objects.filter(_sin_reservar(cantidades, reservadas)).update(
+        stock=Case(
+            *[When(id=libro_id, then=F('stock') - Value(cantidad)) for libro_id, cantidad in cantidades.items()],
+            default=F('stock'),
+            output_field=PositiveIntegerField(),
+        ),
+        reservado=Case(
+            *[When(id=libro_id, then=F('reservado') - Value(reservada))
+              for libro_id, reservada in reservadas.items() if reservada],
+            default=F('reservado'),
+            output_field=PositiveIntegerField(),
+        ),
+    )
+
+
+def reponer_stock(cantidades):
+    """
+    Devuelve {libro_id: cantidad} al stock con un único UPDATE sobre F().
+    Los libros se bloquean antes en orden de id, igual que en crear_pedido,
+    para que una cancelación y una compra simultáneas no se interbloqueen.
+    """
+    if not cantidades:
+        return 0
+    list(Libro.objects.select_for_update().filter(id__in=cantidades).order_by('id').values_list('id', flat=True))
+    return Libro.objects.filter(id__in=cantidades).update(stock=Case(
+        *[When(id=libro_id, then=F('stock') + Value(cantidad)) for libro_id, cantidad in cantidades.items()],
+        default=F('stock'),
+        output_field=PositiveIntegerField(),
+    ))
+
+
+def crear_pedido(usuario, resumen, direccion_envio=''):
+    """
+    Convierte el carrito de ``resumen`` en un pedido con operaciones por
+    conjuntos: bloquea los libros en orden de id (evita interbloqueos entre
+    compras simultáneas), inserta todos los detalles con un bulk_create y
+    descuenta el stock con un UPDATE condicionado que consume las reservas
+    del carrito, sin revisar línea a línea: lo reservado ya está
+    garantizado y el UPDATE comprueba el resto. Lanza StockInsuficiente y
+    deshace todo si algún libro no alcanza.
+    """
+    cantidades = {}
+    for item in resumen.items:
+        cantidades[item.libro_id] = cantidades.get(item.libro_id, 0) + item.cantidad
+
+    with transaction.atomic():
+        libros = list(
+            Libro.objects.select_for_update()
+            .filter(id__in=cantidades)
+            .order_by('id')
+            .only('id', 'titulo', 'precio')
+        )
+        # Reservas leídas con los libros bloqueados: liberar_reservas pudo devolverlas
+        reservadas = dict(
+            ItemCarrito.objects.select_for_update()
+            .filter(carrito=resumen.carrito, libro_id__in=cantidades)
+            .values_list('libro_id', 'reservada')
+        )
+        if len(libros) != len(cantidades):
+            # Algún libro del carrito se borró mientras tanto
+            raise StockInsuficiente(next(item.libro.titulo for item in resumen.items
+                                         if item.libro_id not in {libro.id for libro in libros}))
+
+        # Precios leídos con la fila bloqueada, no los del resumen mostrado
+        subtotal = sum(libro.precio * cantidades[libro.id] for libro in libros)
+        pedido = Pedido.objects.create(
+            usuario=usuario,
+            cupon=resumen.cupon,
+            total=subtotal - calcular_descuento(subtotal, resumen.cupon),
+            direccion_envio=direccion_envio,
+        )
+        DetallePedido.objects.bulk_create([
+            DetallePedido(pedido=pedido, libro_id=libro.id, cantidad=cantidades[libro.id],
+                          precio_unitario=libro.precio)
+            for libro in libros
+        ])
+
+        if descontar_stock(cantidades, reservadas) != len(cantidades):
+            agotado = Libro.objects.filter(id__in=cantidades).exclude(
+                _sin_reservar(cantidades, reservadas)
+            ).values_list('titulo', flat=True).first()
+            raise StockInsuficiente(agotado)
+
+        # Solo las líneas compradas: otra pestaña pudo añadir (y reservar) más desde el resumen
+        ItemCarrito.objects.filter(carrito=resumen.carrito, libro_id__in=cantidades).delete()
+    return pedido
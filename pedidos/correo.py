@@ -0,0 +1,104 @@
+# pedidos/correo.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CorreoPendiente
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 5
+ESPERA_BASE = timedelta(seconds=30)
+ESPERA_MAXIMA = timedelta(hours=1)
+# Tiempo que un lote queda reservado para el proceso que lo tomó
+RESERVA_LOTE = timedelta(minutes=5)
+
+
+def encolar_correo(destinatario, asunto, cuerpo):
+    """
+    Guarda el correo en la bandeja de salida cuando la transacción en curso
+    se confirma; si se deshace (p. ej. un pedido sin stock) no se encola nada.
+    """
+    transaction.on_commit(lambda: CorreoPendiente.objects.create(
+        destinatario=destinatario,
+        asunto=asunto,
+        cuerpo=cuerpo,
+    ))
+
+
+def encolar_confirmacion(pedido):
+    encolar_correo(
+        pedido.usuario.email,
+        f'Confirmación de Pedido #{pedido.numero_orden}',
+        f'Tu pedido #{pedido.numero_orden} ha sido procesado con éxito. Total: ${pedido.total}',
+    )
+
+
+def _espera(intentos):
+    return min(ESPERA_BASE * (2 ** (intentos - 1)), ESPERA_MAXIMA)
+
+
+def _reservar_lote(tamano):
+    ahora = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            CorreoPendiente.objects.select_for_update(skip_locked=True)
+            .filter(estado='pendiente', proximo_intento__lte=ahora)
+            .order_by('proximo_intento', 'id')
+            .values_list('id', flat=True)[:tamano]
+        )
+        # Si el proceso muere a mitad de lote, los correos vuelven a estar
+        # disponibles cuando vence la reserva
+        CorreoPendiente.objects.filter(id__in=ids).update(proximo_intento=ahora + RESERVA_LOTE)
+    return list(CorreoPendiente.objects.filter(id__in=ids).order_by('id'))
+
+
+def enviar_pendientes(tamano_lote=50, max_intentos=MAX_INTENTOS, conexion=None):
+    """
+    Envía un lote de la bandeja de salida por una única conexión SMTP.
+    Los fallos se reintentan con espera exponencial hasta ``max_intentos``.
+    Devuelve (enviados, fallidos).
+    """
+    correos = _reservar_lote(tamano_lote)
+    if not correos:
+        return 0, 0
+
+    conexion = conexion or get_connection()
+    enviados, fallidos = [], []
+    try:
+        conexion.open()
+        for correo in correos:
+            mensaje = EmailMessage(correo.asunto, correo.cuerpo, settings.DEFAULT_FROM_EMAIL,
+                                   [correo.destinatario], connection=conexion)
+            try:
+                mensaje.send()
+                enviados.append(correo.id)
+            except Exception as e:
+                logger.warning("Error al enviar el correo %s: %s", correo.id, e)
+                fallidos.append((correo, str(e)))
+    except Exception as e:
+        # Sin conexión: todo el lote cuenta como un intento fallido
+        logger.warning("No se pudo abrir la conexión SMTP: %s", e)
+        procesados = set(enviados) | {c.id for c, _ in fallidos}
+        fallidos.extend((correo, str(e)) for correo in correos if correo.id not in procesados)
+    finally:
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    ahora = timezone.now()
+    CorreoPendiente.objects.filter(id__in=enviados).update(estado='enviado', fecha_envio=ahora, ultimo_error='')
+    for correo, error in fallidos:
+        intentos = correo.intentos + 1
+        CorreoPendiente.objects.filter(id=correo.id).update(
+            intentos=intentos,
+            ultimo_error=error,
+            estado='fallido' if intentos >= max_intentos else 'pendiente',
+            proximo_intento=ahora + _espera(intentos),
+        )
+    return len(enviados), len(fallidos)
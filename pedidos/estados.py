@@ -0,0 +1,89 @@
+# pedidos/estados.py
+from collections import namedtuple
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, transaction
+from django.db.models import CharField, DateTimeField, IntegerField, Sum, Value
+from django.utils import timezone
+
+from .compra import reponer_stock
+from .models import DetallePedido, HistorialEstadoPedido, Pedido
+
+# Estados a los que se puede pasar desde cada estado
+TRANSICIONES = {
+    'pendiente': {'pagado', 'cancelado'},
+    'pagado': {'enviado', 'cancelado'},
+    'enviado': {'entregado'},
+    'entregado': set(),
+    'cancelado': set(),
+}
+
+# cambiados: pedidos movidos al nuevo estado; omitidos: pedidos que no admitían la transición
+ResultadoCambio = namedtuple('ResultadoCambio', ['cambiados', 'omitidos'])
+
+
+class TransicionInvalida(Exception):
+    pass
+
+
+def estados_origen(nuevo_estado):
+    return [estado for estado, destinos in TRANSICIONES.items() if nuevo_estado in destinos]
+
+
+def _insertar_historial(objetivo, nuevo_estado, usuario, ahora):
+    """
+    Escribe el historial de los pedidos de ``objetivo`` con un único
+    INSERT ... SELECT que lee su estado anterior y los bloquea (FOR UPDATE
+    donde el motor lo admite) hasta el UPDATE. Devuelve las filas escritas.
+    """
+    seleccion = (objetivo.select_for_update(of=('self',))
+                 .annotate(_nuevo=Value(nuevo_estado, output_field=CharField()),
+                           _usuario=Value(usuario.pk if usuario else None, output_field=IntegerField()),
+                           _fecha=Value(ahora, output_field=DateTimeField()))
+                 .order_by()
+                 .values_list('id', 'estado', '_nuevo', '_usuario', '_fecha'))
+    try:
+        sql, params = seleccion.query.sql_with_params()
+    except EmptyResultSet:
+        # Estado sin orígenes (p. ej. volver a pendiente) o selección vacía
+        return 0
+    historial = HistorialEstadoPedido._meta.db_table
+    columnas = ', '.join(connection.ops.quote_name(columna) for columna in
+                         ('pedido_id', 'estado_anterior', 'estado_nuevo', 'usuario_id', 'fecha'))
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {connection.ops.quote_name(historial)} ({columnas}) {sql}', params)
+        return cursor.rowcount
+
+
+def cambiar_estado(pedidos, nuevo_estado, usuario=None):
+    """
+    Mueve a ``nuevo_estado`` todos los pedidos del queryset que lo
+    permitan, con sentencias por conjuntos que no dependen de cuántos
+    pedidos sean: un INSERT ... SELECT para el historial (que bloquea las
+    filas), un único UPDATE ... WHERE id IN (subconsulta) AND estado IN
+    (estados de origen) y, al cancelar, una lectura agrupada de las
+    unidades a reponer. Ningún id pasa por Python.
+
+    Al cancelar se repone el stock de todas las líneas. Solo cuentan los
+    pedidos que salen de un estado no cancelado con la fila bloqueada, así
+    que cancelar dos veces (o en paralelo) no repone dos veces.
+    """
+    if nuevo_estado not in TRANSICIONES:
+        raise TransicionInvalida(f"Estado no válido: {nuevo_estado}")
+    objetivo = Pedido.objects.filter(id__in=pedidos.values('id'), estado__in=estados_origen(nuevo_estado))
+
+    with transaction.atomic():
+        total = pedidos.count()
+        ahora = timezone.now()
+        _insertar_historial(objetivo, nuevo_estado, usuario, ahora)
+
+        if nuevo_estado == 'cancelado':
+            lineas = (DetallePedido.objects.filter(pedido__in=objetivo)
+                      .values('libro_id')
+                      .annotate(unidades=Sum('cantidad'))
+                      .order_by())
+            reponer_stock({linea['libro_id']: linea['unidades'] for linea in lineas})
+
+        cambiados = objetivo.update(estado=nuevo_estado, actualizado=ahora)
+
+    return ResultadoCambio(cambiados, total - cambiados)
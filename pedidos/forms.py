@@ -0,0 +1,46 @@
+# pedidos/forms.py
+from datetime import datetime, time, timedelta
+
+from django import forms
+from django.utils import timezone
+
+from .models import Pedido
+
+
+class FiltroPedidosForm(forms.Form):
+    estado = forms.ChoiceField(choices=[('', 'Todos')] + Pedido.ESTADO_CHOICES, required=False)
+    desde = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    hasta = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    cupon = forms.CharField(max_length=20, required=False)
+    email = forms.EmailField(required=False)
+
+    def clean(self):
+        datos = super().clean()
+        if datos.get('desde') and datos.get('hasta') and datos['desde'] > datos['hasta']:
+            raise forms.ValidationError('La fecha inicial no puede ser posterior a la final.')
+        return datos
+
+    @staticmethod
+    def _inicio_del_dia(fecha):
+        return timezone.make_aware(datetime.combine(fecha, time.min))
+
+    def filtrar(self, pedidos):
+        """
+        Aplica los filtros válidos. Todos son igualdades o rangos sobre
+        columnas indexadas (fecha_creacion se compara con límites de día,
+        no con __date, para que el índice siga sirviendo).
+        """
+        if not self.is_valid():
+            return pedidos
+        datos = self.cleaned_data
+        if datos['estado']:
+            pedidos = pedidos.filter(estado=datos['estado'])
+        if datos['desde']:
+            pedidos = pedidos.filter(fecha_creacion__gte=self._inicio_del_dia(datos['desde']))
+        if datos['hasta']:
+            pedidos = pedidos.filter(fecha_creacion__lt=self._inicio_del_dia(datos['hasta'] + timedelta(days=1)))
+        if datos['cupon']:
+            pedidos = pedidos.filter(cupon__codigo=datos['cupon'].strip())
+        if datos['email']:
+            pedidos = pedidos.filter(usuario__email=datos['email'])
+        return pedidos
@@ -0,0 +1,58 @@
+# pedidos/idempotencia.py
+import secrets
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ClaveIdempotencia
+
+# Pasado este tiempo la clave se puede purgar con `purgar_claves_idempotencia`
+VIGENCIA = timedelta(hours=24)
+
+
+def nueva_clave():
+    return secrets.token_urlsafe(24)
+
+
+def _de_usuario(registro, usuario):
+    return registro if registro is not None and registro.usuario_id == usuario.pk else None
+
+
+def reclamar(clave, usuario):
+    """
+    Registra ``clave`` como en proceso. Devuelve (registro, nueva): si la
+    clave ya se había usado, ``nueva`` es False y el registro guarda el
+    resultado original (o es None si la clave es de otro usuario).
+    Un reenvío se resuelve con una lectura por el índice único, sin abrir
+    transacción; el INSERT va en la suya propia para que un envío
+    simultáneo lo vea enseguida y choque con la restricción única.
+    """
+    claves = ClaveIdempotencia.objects.select_related('pedido').filter(clave=clave)
+    registro = claves.first()
+    if registro is not None:
+        return _de_usuario(registro, usuario), False
+    try:
+        with transaction.atomic():
+            return ClaveIdempotencia.objects.create(
+                clave=clave, usuario=usuario, expira=timezone.now() + VIGENCIA,
+            ), True
+    except IntegrityError:
+        return _de_usuario(claves.first(), usuario), False
+
+
+def completar(registro, pedido):
+    ClaveIdempotencia.objects.filter(pk=registro.pk).update(estado='completado', pedido=pedido)
+
+
+def fallar(registro, mensaje):
+    ClaveIdempotencia.objects.filter(pk=registro.pk).update(estado='fallido', mensaje=mensaje[:255])
+
+
+def liberar(registro):
+    # Error inesperado: se borra la clave para que el usuario pueda reintentar
+    ClaveIdempotencia.objects.filter(pk=registro.pk).delete()
+
+
+def purgar_vencidas(ahora=None):
+    return ClaveIdempotencia.objects.filter(expira__lt=ahora or timezone.now()).delete()[0]
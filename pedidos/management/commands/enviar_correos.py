@@ -0,0 +1,36 @@
+# pedidos/management/commands/enviar_correos.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from pedidos.correo import MAX_INTENTOS, enviar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Envía los correos pendientes de la bandeja de salida."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50,
+                            help="Correos enviados por cada conexión SMTP.")
+        parser.add_argument('--max-intentos', type=int, default=MAX_INTENTOS,
+                            help="Intentos antes de marcar un correo como fallido.")
+        parser.add_argument('--continuo', action='store_true',
+                            help="Seguir esperando correos nuevos en lugar de terminar.")
+        parser.add_argument('--intervalo', type=float, default=5,
+                            help="Segundos de espera cuando la bandeja está vacía (modo continuo).")
+
+    def handle(self, *args, **options):
+        total_enviados = total_fallidos = 0
+        while True:
+            enviados, fallidos = enviar_pendientes(options['lote'], options['max_intentos'])
+            total_enviados += enviados
+            total_fallidos += fallidos
+            if enviados or fallidos:
+                self.stdout.write(f"{enviados} enviados, {fallidos} con error")
+                continue
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_enviados} correos enviados, {total_fallidos} con error"
+        ))
@@ -0,0 +1,12 @@
+# pedidos/management/commands/purgar_claves_idempotencia.py
+from django.core.management.base import BaseCommand
+
+from pedidos.idempotencia import purgar_vencidas
+
+
+class Command(BaseCommand):
+    help = "Borra las claves de idempotencia de compra que ya vencieron."
+
+    def handle(self, *args, **options):
+        borradas = purgar_vencidas()
+        self.stdout.write(self.style.SUCCESS(f"{borradas} claves vencidas borradas"))
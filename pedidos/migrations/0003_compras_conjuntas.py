@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0004_libros_relacionados'),
+        ('pedidos', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompraConjunta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('veces', models.PositiveIntegerField(help_text='Pedidos en los que se compraron juntos')),
+                ('posicion', models.PositiveSmallIntegerField()),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='libros.libro')),
+                ('recomendado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comprado_con', to='libros.libro')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('libro', 'posicion'), name='compra_conjunta_posicion_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0003_compras_conjuntas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatario', models.EmailField(max_length=254)),
+                ('asunto', models.CharField(max_length=200)),
+                ('cuerpo', models.TextField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_proximo_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0004_bandeja_correo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', 'fecha_creacion', 'id'], name='pedido_usuario_fecha_idx'),
+        ),
+    ]
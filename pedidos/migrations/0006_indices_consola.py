@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0005_indice_historial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha_creacion', 'id'], name='pedido_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'fecha_creacion', 'id'], name='pedido_estado_fecha_idx'),
+        ),
+    ]
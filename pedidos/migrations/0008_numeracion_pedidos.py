@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+# CACHE reparte bloques de números por conexión sin tocar la tabla en cada pedido
+SQL_POSTGRESQL = "CREATE SEQUENCE IF NOT EXISTS pedidos_numero_orden_seq CACHE 20"
+SQL_POSTGRESQL_REVERSO = "DROP SEQUENCE IF EXISTS pedidos_numero_orden_seq"
+
+
+def crear_contador(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SQL_POSTGRESQL)
+    ContadorNumeroOrden = apps.get_model('pedidos', 'ContadorNumeroOrden')
+    ContadorNumeroOrden.objects.using(schema_editor.connection.alias).get_or_create(nombre='numero_orden')
+
+
+def borrar_contador(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SQL_POSTGRESQL_REVERSO)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0007_historial_estados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNumeroOrden',
+            fields=[
+                ('nombre', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(crear_contador, borrar_contador),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0008_numeracion_pedidos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True)),
+                ('estado', models.CharField(choices=[('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='procesando', max_length=10)),
+                ('mensaje', models.CharField(blank=True, max_length=255)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('expira', models.DateTimeField(db_index=True)),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pedidos.pedido')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0009_claves_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
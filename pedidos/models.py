@@ -1,8 +1,8 @@
 # pedidos/models.py
 from django.db import models
+from django.utils import timezone
 from usuarios.models import Usuario
 from libros.models import Libro
-import uuid
 
 class Cupon(models.Model):
     codigo = models.CharField(max_length=20, unique=True)
@@ -15,12 +15,20 @@ class Cupon(models.Model):
         return f"{self.codigo} ({self.descuento}%)"
     
     def es_valido(self):
-        from django.utils import timezone
         now = timezone.now()
         return (self.activo and 
                 self.fecha_inicio <= now and 
                 self.fecha_expiracion >= now)
 
+class PedidoQuerySet(models.QuerySet):
+    def con_detalles(self):
+        detalles = DetallePedido.objects.select_related('libro').only(
+            'id', 'pedido_id', 'cantidad', 'precio_unitario', 'libro__id', 'libro__titulo',
+        ).order_by('id')
+        return self.select_related('cupon').prefetch_related(
+            models.Prefetch('detalles', queryset=detalles)
+        )
+
 class Pedido(models.Model):
     ESTADO_CHOICES = [
         ('pendiente', 'Pendiente'),
@@ -33,20 +41,42 @@ class Pedido(models.Model):
     numero_orden = models.CharField(max_length=10, unique=True, editable=False)
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Marca de agua de los reportes; los update() masivos deben fijarlo a mano
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='pendiente')
     cupon = models.ForeignKey(Cupon, on_delete=models.SET_NULL, null=True, blank=True)
     total = models.DecimalField(max_digits=10, decimal_places=2)
     direccion_envio = models.TextField(blank=True, null=True)
     
+    objects = PedidoQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Historial paginado por keyset: WHERE usuario = ? ORDER BY fecha_creacion DESC, id DESC
+            models.Index(fields=['usuario', 'fecha_creacion', 'id'], name='pedido_usuario_fecha_idx'),
+            # Consola de pedidos: listado completo y filtrado por estado, ambos por fecha
+            models.Index(fields=['fecha_creacion', 'id'], name='pedido_fecha_idx'),
+            models.Index(fields=['estado', 'fecha_creacion', 'id'], name='pedido_estado_fecha_idx'),
+        ]
+    
     def __str__(self):
         return f"Pedido #{self.numero_orden}"
     
     def save(self, *args, **kwargs):
         if not self.numero_orden:
-            # Generar número de orden único
-            self.numero_orden = str(uuid.uuid4()).upper()[:10]
+            # Generar número de orden único (ver pedidos/numeracion.py)
+            from .numeracion import generar_numero_orden
+            self.numero_orden = generar_numero_orden()
         super().save(*args, **kwargs)
 
+class ContadorNumeroOrden(models.Model):
+    # Siguiente número de orden libre; en PostgreSQL se usa una secuencia en su lugar
+    nombre = models.CharField(max_length=20, primary_key=True)
+    valor = models.BigIntegerField(default=1)
+    
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+
 class DetallePedido(models.Model):
     pedido = models.ForeignKey(Pedido, related_name='detalles', on_delete=models.CASCADE)
     libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
@@ -57,4 +87,81 @@ class DetallePedido(models.Model):
         return f"{self.cantidad} x {self.libro.titulo}"
     
     def subtotal(self):
-        return self.precio_unitario * self.cantidad
\ No newline at end of file
+        return self.precio_unitario * self.cantidad
+
+class HistorialEstadoPedido(models.Model):
+    # Registro de solo inserción: cada cambio de estado añade una fila
+    pedido = models.ForeignKey(Pedido, related_name='historial', on_delete=models.CASCADE)
+    estado_anterior = models.CharField(max_length=10, choices=Pedido.ESTADO_CHOICES)
+    estado_nuevo = models.CharField(max_length=10, choices=Pedido.ESTADO_CHOICES)
+    usuario = models.ForeignKey(Usuario, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['pedido', 'fecha'], name='historial_pedido_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.pedido_id}: {self.estado_anterior} -> {self.estado_nuevo}"
+
+class ClaveIdempotencia(models.Model):
+    # Una por envío del formulario de confirmación; los reenvíos devuelven el mismo resultado
+    ESTADO_CHOICES = [
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+    
+    clave = models.CharField(max_length=64, unique=True)
+    usuario = models.ForeignKey(Usuario, related_name='+', on_delete=models.CASCADE)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='procesando')
+    pedido = models.ForeignKey(Pedido, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    mensaje = models.CharField(max_length=255, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.clave} ({self.estado})"
+
+class CompraConjunta(models.Model):
+    # "Los clientes también compraron": vecinos de cada libro en la matriz de co-compra
+    libro = models.ForeignKey(Libro, related_name='+', on_delete=models.CASCADE)
+    recomendado = models.ForeignKey(Libro, related_name='comprado_con', on_delete=models.CASCADE)
+    veces = models.PositiveIntegerField(help_text="Pedidos en los que se compraron juntos")
+    posicion = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'posicion'], name='compra_conjunta_posicion_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.libro_id} + {self.recomendado_id} ({self.veces})"
+
+
+class CorreoPendiente(models.Model):
+    # Bandeja de salida: los correos se envían desde el comando enviar_correos
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+    
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=200)
+    cuerpo = models.TextField()
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_proximo_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.asunto} -> {self.destinatario} ({self.estado})"
@@ -0,0 +1,110 @@
+# pedidos/numeracion.py
+"""
+Generadores de ``Pedido.numero_orden``. El generador se elige con el
+ajuste NUMERO_ORDEN_GENERADOR (ruta a una clase con un método
+``generar()`` que devuelve el número como texto de 10 caracteres).
+"""
+import threading
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from .models import ContadorNumeroOrden
+
+# Base32 de Crockford: sin I, L, O ni U para evitar confusiones al dictarlo
+ALFABETO = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+LONGITUD = 10
+SECUENCIA_POSTGRESQL = 'pedidos_numero_orden_seq'
+CONTADOR = 'numero_orden'
+GENERADOR_POR_DEFECTO = 'pedidos.numeracion.GeneradorSecuencial'
+
+
+def base32_crockford(numero, longitud=LONGITUD):
+    """Codifica ``numero`` con ancho fijo para que el orden del texto sea el numérico."""
+    if not 0 <= numero < 32 ** longitud:
+        raise ValueError(f"{numero} no cabe en {longitud} caracteres base32")
+    caracteres = []
+    for _ in range(longitud):
+        numero, resto = divmod(numero, 32)
+        caracteres.append(ALFABETO[resto])
+    return ''.join(reversed(caracteres))
+
+
+class GeneradorUUID:
+    """
+    Esquema original: los 10 primeros caracteres de un uuid4. Aleatorio
+    (cada inserción cae en cualquier hoja del índice único) y con solo
+    40 bits, así que termina colisionando.
+    """
+
+    def generar(self):
+        return str(uuid.uuid4()).upper()[:10]
+
+
+class GeneradorSecuencial:
+    """
+    Números crecientes codificados en base32 de Crockford: las inserciones
+    van siempre al final del índice y no hay colisiones.
+
+    En PostgreSQL sale de una secuencia con CACHE, que ya reparte bloques
+    por conexión y no se deshace con la transacción. En el resto de bases
+    se usa la fila ContadorNumeroOrden: fuera de una transacción se reserva
+    un bloque de ``tamano_bloque`` números por proceso; dentro de una se
+    toma un solo número, que se deshace junto con el pedido si este falla
+    (un bloque reservado ahí podría volver a entregarse tras un rollback).
+    """
+
+    tamano_bloque = 100
+
+    def __init__(self):
+        self._cerrojo = threading.Lock()
+        self._siguiente = self._limite = 0
+
+    def generar(self):
+        return base32_crockford(self.siguiente_valor())
+
+    def siguiente_valor(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT nextval(%s)", [SECUENCIA_POSTGRESQL])
+                return cursor.fetchone()[0]
+
+        with self._cerrojo:
+            if self._siguiente < self._limite:
+                valor = self._siguiente
+                self._siguiente += 1
+                return valor
+            if connection.in_atomic_block:
+                return self._reservar(1)
+            inicio = self._reservar(self.tamano_bloque)
+            self._siguiente, self._limite = inicio + 1, inicio + self.tamano_bloque
+            return inicio
+
+    def _reservar(self, cantidad):
+        # El UPDATE bloquea la fila, así que la lectura posterior es consistente.
+        # Dentro de una transacción no hace falta un savepoint propio
+        contador = ContadorNumeroOrden.objects.filter(nombre=CONTADOR)
+        with transaction.atomic(savepoint=False):
+            if not contador.update(valor=F('valor') + cantidad):
+                # La migración crea la fila; esto cubre bases vaciadas con flush
+                ContadorNumeroOrden.objects.get_or_create(nombre=CONTADOR)
+                contador.update(valor=F('valor') + cantidad)
+            valor = contador.values_list('valor', flat=True).get()
+        return valor - cantidad
+
+
+@lru_cache(maxsize=None)
+def _cargar_generador(ruta):
+    return import_string(ruta)()
+
+
+def obtener_generador():
+    return _cargar_generador(getattr(settings, 'NUMERO_ORDEN_GENERADOR', GENERADOR_POR_DEFECTO))
+
+
+def generar_numero_orden():
+    return obtener_generador().generar()
@@ -0,0 +1,118 @@
+# pedidos/recomendaciones.py
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+from django.db.models import Sum
+
+from libros.models import Libro
+from .models import CompraConjunta, DetallePedido
+
+RECOMENDACIONES_POR_LIBRO = 10
+LINEAS_POR_LOTE = 200_000
+LIBROS_POR_LOTE = 1_000
+
+
+def _incidencia(pedidos, columnas, n_libros):
+    # Matriz pedidos x libros con un 1 por cada libro presente en el pedido
+    filas = np.unique(pedidos, return_inverse=True)[1]
+    matriz = sparse.csr_matrix(
+        (np.ones(len(columnas), dtype=np.int32), (filas, columnas)),
+        shape=(filas.max() + 1 if len(filas) else 0, n_libros),
+    )
+    matriz.sum_duplicates()
+    matriz.data[:] = 1
+    return matriz
+
+
+def construir_matriz(lineas, libro_ids, lineas_por_lote=LINEAS_POR_LOTE):
+    """
+    Construye la matriz dispersa libros x libros de co-compra a partir de
+    ``lineas``, un iterable de (pedido_id, libro_id) ordenado por pedido.
+    Se procesa por lotes de líneas (X.T @ X por lote), así que la memoria
+    depende del lote y del número de pares distintos, no del historial.
+    """
+    libro_ids = np.asarray(libro_ids, dtype=np.int64)
+    n = len(libro_ids)
+    co_compra = sparse.csr_matrix((n, n), dtype=np.int64)
+    if not n:
+        return co_compra
+
+    def acumular(pedidos, libros):
+        nonlocal co_compra
+        pedidos = np.asarray(pedidos, dtype=np.int64)
+        libros = np.asarray(libros, dtype=np.int64)
+        columnas = np.searchsorted(libro_ids, libros)
+        validos = (columnas < n) & (libro_ids[np.minimum(columnas, n - 1)] == libros)
+        if not validos.any():
+            return
+        incidencia = _incidencia(pedidos[validos], columnas[validos], n)
+        co_compra = co_compra + (incidencia.T @ incidencia).astype(np.int64)
+
+    pedidos, libros = [], []
+    for pedido_id, libro_id in lineas:
+        # Cortar solo entre pedidos para no partir uno entre dos lotes
+        if len(pedidos) >= lineas_por_lote and pedido_id != pedidos[-1]:
+            acumular(pedidos, libros)
+            pedidos, libros = [], []
+        pedidos.append(pedido_id)
+        libros.append(libro_id)
+    if pedidos:
+        acumular(pedidos, libros)
+
+    # La diagonal cuenta pedidos por libro, no compras conjuntas
+    co_compra = (co_compra - sparse.diags(co_compra.diagonal(), dtype=np.int64)).tocsr()
+    co_compra.eliminate_zeros()
+    return co_compra
+
+
+def mejores_vecinos(co_compra, libro_ids, fila, limite=RECOMENDACIONES_POR_LIBRO):
+    desde, hasta = co_compra.indptr[fila], co_compra.indptr[fila + 1]
+    columnas = co_compra.indices[desde:hasta]
+    veces = co_compra.data[desde:hasta]
+    # Más compras conjuntas primero y, a igualdad, el libro más reciente
+    orden = np.lexsort((-libro_ids[columnas], -veces))[:limite]
+    return [(int(libro_ids[columnas[i]]), int(veces[i])) for i in orden]
+
+
+def calcular_recomendaciones(lineas_por_lote=LINEAS_POR_LOTE):
+    """Recalcula la tabla CompraConjunta desde el historial. Devuelve (libros, líneas)."""
+    libro_ids = np.fromiter(Libro.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+    lineas = (DetallePedido.objects
+              .exclude(pedido__estado='cancelado')
+              .order_by('pedido_id')
+              .values_list('pedido_id', 'libro_id'))
+    contador = {'lineas': 0}
+
+    def contar(iterable):
+        for linea in iterable:
+            contador['lineas'] += 1
+            yield linea
+
+    co_compra = construir_matriz(contar(lineas.iterator(chunk_size=10_000)), libro_ids, lineas_por_lote)
+
+    for inicio in range(0, len(libro_ids), LIBROS_POR_LOTE):
+        fin = min(inicio + LIBROS_POR_LOTE, len(libro_ids))
+        filas = [
+            CompraConjunta(libro_id=int(libro_ids[fila]), recomendado_id=recomendado_id,
+                           veces=veces, posicion=posicion)
+            for fila in range(inicio, fin)
+            for posicion, (recomendado_id, veces) in enumerate(mejores_vecinos(co_compra, libro_ids, fila))
+        ]
+        with transaction.atomic():
+            CompraConjunta.objects.filter(libro_id__in=[int(i) for i in libro_ids[inicio:fin]]).delete()
+            CompraConjunta.objects.bulk_create(filas)
+    return len(libro_ids), contador['lineas']
+
+
+def recomendaciones_para(libro_ids, limite=4):
+    """Libros que más se compran junto con ``libro_ids`` (una sola consulta)."""
+    libro_ids = list(libro_ids)
+    if not libro_ids:
+        return []
+    return list(
+        Libro.objects.catalogo()
+        .filter(comprado_con__libro_id__in=libro_ids)
+        .exclude(id__in=libro_ids)
+        .annotate(veces=Sum('comprado_con__veces'))
+        .order_by('-veces', '-id')[:limite]
+    )
@@ -10,5 +10,6 @@ urlpatterns = [
     path('detalle/<str:numero_orden>/', views.detalle_pedido, name='detalle_pedido'),
     
     path('pedidos/', views.listar_pedidos, name='listar_pedidos'),
+    path('pedidos/actualizar/', views.actualizar_estados_pedidos, name='actualizar_estados_pedidos'),
     path('pedidos/<int:pedido_id>/actualizar/', views.actualizar_estado_pedido, name='actualizar_estado_pedido'),
 ]
\ No newline at end of file
@@ -3,112 +3,94 @@ from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
-from .models import Pedido, DetallePedido, Cupon
-from carrito.models import Carrito
-from django.core.mail import send_mail
-from django.conf import settings
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from .models import Pedido
+from .compra import StockInsuficiente, crear_pedido
+from .recomendaciones import recomendaciones_para
+from .correo import encolar_confirmacion
+from . import idempotencia
+from carrito.precios import obtener_resumen
+from libros.paginacion import PaginadorCursor
+
+PEDIDOS_POR_PAGINA = 20
+# Más recientes primero; el id desempata pedidos creados en el mismo instante
+ORDEN_HISTORIAL = [('fecha_creacion', True), ('id', True)]
 
 @login_required
 def confirmar_pedido(request):
-    carrito, created = Carrito.objects.get_or_create(usuario=request.user)
+    resumen = obtener_resumen(request)
     
-    if not carrito.items.exists():
+    if not resumen:
         messages.error(request, "Tu carrito está vacío.")
         return redirect('ver_carrito')
     
-    # Obtener cupón si existe en la sesión
-    cupon = None
-    if 'cupon_id' in request.session:
-        try:
-            cupon = Cupon.objects.get(id=request.session['cupon_id'])
-            if not cupon.es_valido():
-                cupon = None
-                messages.warning(request, "El cupón ha expirado y no será aplicado.")
-        except Cupon.DoesNotExist:
-            pass
-    
-    # Calcular el total
-    total = carrito.obtener_total()
-    if cupon:
-        total = carrito.aplicar_cupon(cupon)
+    if resumen.cupon_invalido:
+        messages.warning(request, "El cupón ha expirado y no será aplicado.")
     
     return render(request, 'pedidos/confirmar_pedido.html', {
-        'carrito': carrito,
-        'cupon': cupon,
-        'total': total
+        'carrito': resumen.carrito,
+        'resumen': resumen,
+        'cupon': resumen.cupon,
+        'total': resumen.total,
+        'recomendaciones': recomendaciones_para(resumen.libro_ids()),
+        'clave_idempotencia': idempotencia.nueva_clave(),
     })
 
+def _resultado_repetido(request, registro):
+    # Reenvío del mismo formulario: se repite el resultado sin volver a comprar
+    if registro is None:
+        messages.error(request, "La solicitud no es válida. Vuelve a confirmar tu pedido.")
+        return redirect('confirmar_pedido')
+    if registro.estado == 'completado':
+        # El pedido pudo borrarse después (la clave queda con pedido = NULL)
+        if registro.pedido is None:
+            messages.info(request, "Este pedido ya se había procesado.")
+        else:
+            messages.success(request, f"¡Pedido #{registro.pedido.numero_orden} completado con éxito!")
+        return redirect('historial_pedidos')
+    if registro.estado == 'fallido':
+        messages.error(request, registro.mensaje)
+        return redirect('ver_carrito')
+    messages.info(request, "Tu pedido se está procesando.")
+    return redirect('historial_pedidos')
+
 @login_required
-@transaction.atomic
 def procesar_pedido(request):
     if request.method == 'POST':
-        carrito, _ = Carrito.objects.get_or_create(usuario=request.user)
+        registro = None
+        clave = request.POST.get('clave_idempotencia', '')[:64]
+        if clave:
+            registro, nueva = idempotencia.reclamar(clave, request.user)
+            if not nueva:
+                return _resultado_repetido(request, registro)
         
-        if not carrito.items.exists():
-            messages.error(request, "Tu carrito está vacío.")
-            return redirect('ver_carrito')
-        
-        # Obtener cupón si existe en la sesión
-        cupon = None
-        if 'cupon_id' in request.session:
-            try:
-                cupon = Cupon.objects.get(id=request.session['cupon_id'])
-                if not cupon.es_valido():
-                    cupon = None
-            except Cupon.DoesNotExist:
-                pass
-        
-        # Calcular el total
-        total = carrito.obtener_total()
-        if cupon:
-            total = carrito.aplicar_cupon(cupon)
+        resumen = obtener_resumen(request)
         
-        # Crear pedido
-        pedido = Pedido.objects.create(
-            usuario=request.user,
-            cupon=cupon,
-            total=total,
-            direccion_envio=request.POST.get('direccion', '')
-        )
-        
-        # Crear detalles del pedido y actualizar stock
-        for item in carrito.items.all():
-            if item.cantidad > item.libro.stock:
-                transaction.set_rollback(True)
-                messages.error(request, f"No hay suficiente stock para '{item.libro.titulo}'.")
-                return redirect('ver_carrito')
-            
-            DetallePedido.objects.create(
-                pedido=pedido,
-                libro=item.libro,
-                cantidad=item.cantidad,
-                precio_unitario=item.libro.precio
-            )
-            
-            # Actualizar stock
-            item.libro.stock -= item.cantidad
-            item.libro.save()
+        if not resumen:
+            mensaje = "Tu carrito está vacío."
+            if registro:
+                idempotencia.fallar(registro, mensaje)
+            messages.error(request, mensaje)
+            return redirect('ver_carrito')
         
-        # Enviar email de confirmación
         try:
-            '''send_mail(
-                f'Confirmación de Pedido #{pedido.numero_orden}',
-                f'Tu pedido #{pedido.numero_orden} ha sido procesado con éxito. Total: ${pedido.total}',
-                settings.DEFAULT_FROM_EMAIL,
-                [request.user.email],
-                fail_silently=False,
-            )
-            '''
-            enviarCorreo([request.user.email],f'Tu pedido #{pedido.numero_orden} ha sido procesado con éxito. Total: ${pedido.total}')
-        except Exception as e:
-            # Continuar incluso si el correo falla
-            print(f"Error al enviar email: {e}")
+            with transaction.atomic():
+                pedido = crear_pedido(request.user, resumen, request.POST.get('direccion', ''))
+                if registro:
+                    idempotencia.completar(registro, pedido)
+                # El correo se guarda en la bandeja de salida al confirmar la transacción
+                # y lo envía el proceso `enviar_correos`
+                encolar_confirmacion(pedido)
+        except StockInsuficiente as e:
+            if registro:
+                idempotencia.fallar(registro, str(e))
+            messages.error(request, str(e))
+            return redirect('ver_carrito')
+        except Exception:
+            if registro:
+                idempotencia.liberar(registro)
+            raise
         
-        # Vaciar carrito y sesión
-        carrito.items.all().delete()
+        # El carrito ya quedó vacío dentro de crear_pedido
         if 'cupon_id' in request.session:
             del request.session['cupon_id']
         
@@ -119,28 +101,43 @@ def procesar_pedido(request):
 
 @login_required
 def historial_pedidos(request):
-    pedidos = Pedido.objects.filter(usuario=request.user).order_by('-fecha_creacion')
-    return render(request, 'pedidos/historial_pedidos.html', {'pedidos': pedidos})
+    # Usa el índice (usuario, fecha_creacion, id) y trae los detalles de la página en una consulta
+    pedidos = Pedido.objects.con_detalles().filter(usuario=request.user)
+    paginador = PaginadorCursor(pedidos, ORDEN_HISTORIAL, por_pagina=PEDIDOS_POR_PAGINA)
+    pagina = paginador.pagina(request.GET.get('cursor'))
+    return render(request, 'pedidos/historial_pedidos.html', {'pedidos': pagina, 'pagina': pagina})
 
 @login_required
 def detalle_pedido(request, numero_orden):
-    pedido = get_object_or_404(Pedido, numero_orden=numero_orden, usuario=request.user)
+    pedido = get_object_or_404(Pedido.objects.con_detalles(), numero_orden=numero_orden, usuario=request.user)
     return render(request, 'pedidos/detalle_pedido.html', {'pedido': pedido})
 
 # pedidos/views.py
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from .estados import TransicionInvalida, cambiar_estado
+from .forms import FiltroPedidosForm
 from .models import Pedido
 
+PEDIDOS_POR_PAGINA_ADMIN = 50
+
 def es_superusuario(user):
     return user.is_superuser
 
 @login_required
 @user_passes_test(es_superusuario)
 def listar_pedidos(request):
-    pedidos = Pedido.objects.all().order_by('-fecha_creacion')
-    return render(request, 'pedidos/listar_pedidos.html', {'pedidos': pedidos})
+    # Sin OFFSET ni COUNT: filtros sobre columnas indexadas y paginación por keyset
+    filtros = FiltroPedidosForm(request.GET or None)
+    pedidos = filtros.filtrar(Pedido.objects.con_detalles().select_related('usuario'))
+    paginador = PaginadorCursor(pedidos, ORDEN_HISTORIAL, por_pagina=PEDIDOS_POR_PAGINA_ADMIN)
+    pagina = paginador.pagina(request.GET.get('cursor'))
+    return render(request, 'pedidos/listar_pedidos.html', {
+        'pedidos': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
+    })
 
 @login_required
 @user_passes_test(es_superusuario)
@@ -149,43 +146,49 @@ def actualizar_estado_pedido(request, pedido_id):
     
     if request.method == 'POST':
         nuevo_estado = request.POST.get('estado')
-        if nuevo_estado in [estado[0] for estado in Pedido.ESTADO_CHOICES]:
-            pedido.estado = nuevo_estado
-            pedido.save()
-            messages.success(request, f'Estado del pedido #{pedido.numero_orden} actualizado a {nuevo_estado}')
-        else:
+        try:
+            resultado = cambiar_estado(Pedido.objects.filter(id=pedido.id), nuevo_estado, request.user)
+        except TransicionInvalida:
             messages.error(request, 'Estado no válido')
+        else:
+            if resultado.cambiados:
+                messages.success(request, f'Estado del pedido #{pedido.numero_orden} actualizado a {nuevo_estado}')
+            else:
+                messages.error(request, f'El pedido #{pedido.numero_orden} no puede pasar de {pedido.estado} a {nuevo_estado}')
     
     return redirect('listar_pedidos')
 
-def enviarCorreo(destinatario, mensajeConfirmacion):
-    # Configura los detalles del correo
-    remitente = "pruebas.envio.correos@outlook.com"  # o @outlook.com
-    destinatario = "destinatario@ejemplo.com"
-    contraseña = "Pruebas*2025"
-
-    # Crea el mensaje
-    mensaje = MIMEMultipart()
-    mensaje["From"] = remitente
-    mensaje["To"] = destinatario
-    mensaje["Subject"] = "Confirmación de pedido"
-
-    # Cuerpo del mensaje
-    cuerpo = mensajeConfirmacion
-    mensaje.attach(MIMEText(cuerpo, "plain"))
-
-    # Establece conexión con el servidor SMTP de Hotmail/Outlook
+@login_required
+@user_passes_test(es_superusuario)
+def actualizar_estados_pedidos(request):
+    """Cambio de estado masivo: los pedidos marcados o todos los que cumplen los filtros."""
+    if request.method != 'POST':
+        return redirect('listar_pedidos')
+    
+    if request.POST.get('alcance') == 'filtro':
+        filtros = FiltroPedidosForm(request.POST, prefix='filtro')
+        if not filtros.is_valid():
+            messages.error(request, 'Los filtros no son válidos.')
+            return redirect('listar_pedidos')
+        if not any(filtros.cleaned_data.values()):
+            # Sin filtros el alcance sería la tabla entera
+            messages.error(request, 'Indica al menos un filtro para cambiar los pedidos filtrados.')
+            return redirect('listar_pedidos')
+        pedidos = filtros.filtrar(Pedido.objects.all())
+    else:
+        ids = [i for i in request.POST.getlist('pedidos') if i.isdigit()]
+        if not ids:
+            messages.error(request, 'No seleccionaste ningún pedido.')
+            return redirect('listar_pedidos')
+        pedidos = Pedido.objects.filter(id__in=ids)
+    
     try:
-        servidor = smtplib.SMTP("smtp-mail.outlook.com", 587)
-        servidor.starttls()  # Habilita la seguridad
-        servidor.login(remitente, contraseña)
-        
-        # Envía el correo
-        texto = mensaje.as_string()
-        servidor.sendmail(remitente, destinatario, texto)
-        print("Correo enviado con éxito!")
-        
-    except Exception as e:
-        print(f"Error al enviar el correo: {e}")
-    finally:
-        servidor.quit()
\ No newline at end of file
+        resultado = cambiar_estado(pedidos, request.POST.get('estado'), request.user)
+    except TransicionInvalida:
+        messages.error(request, 'Estado no válido')
+        return redirect('listar_pedidos')
+    
+    messages.success(request, f'{resultado.cambiados} pedidos actualizados a {request.POST["estado"]}.')
+    if resultado.omitidos:
+        messages.warning(request, f'{resultado.omitidos} pedidos no admitían ese cambio de estado y se dejaron igual.')
+    return redirect('listar_pedidos')
@@ -0,0 +1,139 @@
+# reportes/agregacion.py
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from pedidos.models import DetallePedido, Pedido
+from .models import (MarcaAgregacion, VentaCategoriaDiaria, VentaCuponDiaria, VentaDiaria,
+                     VentaFormatoDiaria, VentaLibroDiaria)
+
+MARCA = 'ventas'
+# Un pedido cuya transacción confirma tarde puede quedar con `actualizado`
+# anterior a la marca; se repasa este margen (recalcular un día es idempotente)
+SOLAPE = timedelta(minutes=10)
+DIAS_POR_LOTE = 31
+
+TABLAS = [VentaDiaria, VentaLibroDiaria, VentaCategoriaDiaria, VentaFormatoDiaria, VentaCuponDiaria]
+
+IMPORTE = ExpressionWrapper(
+    F('cantidad') * F('precio_unitario'),
+    output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def dias_modificados(desde=None):
+    """Días (de fecha_creacion) con algún pedido creado o cambiado después de ``desde``."""
+    pedidos = Pedido.objects.all() if desde is None else Pedido.objects.filter(actualizado__gt=desde)
+    dias = pedidos.annotate(dia=TruncDate('fecha_creacion')).values_list('dia', flat=True).order_by().distinct()
+    return sorted(dias)
+
+
+def dias_con_resumen():
+    """Días que ya tienen alguna fila en las tablas de resumen."""
+    dias = set()
+    for modelo in TABLAS:
+        dias.update(modelo.objects.values_list('dia', flat=True).order_by().distinct())
+    return sorted(dias)
+
+
+def _por_dia(queryset, *campos, **agregados):
+    return queryset.values('dia', *campos).annotate(**agregados).order_by()
+
+
+def _filas(dias):
+    # Rango sobre fecha_creacion (usa el índice) y luego los días exactos del lote
+    desde, hasta = _inicio_del_dia(dias[0]), _inicio_del_dia(dias[-1] + timedelta(days=1))
+    pedidos = (Pedido.objects
+               .filter(fecha_creacion__gte=desde, fecha_creacion__lt=hasta)
+               .exclude(estado='cancelado')
+               .annotate(dia=TruncDate('fecha_creacion'))
+               .filter(dia__in=dias))
+    lineas = (DetallePedido.objects
+              .filter(pedido__fecha_creacion__gte=desde, pedido__fecha_creacion__lt=hasta)
+              .exclude(pedido__estado='cancelado')
+              .annotate(dia=TruncDate('pedido__fecha_creacion'))
+              .filter(dia__in=dias))
+    ventas = dict(unidades=Sum('cantidad'), ingresos=Sum(IMPORTE))
+
+    unidades_por_dia = {f['dia']: f['unidades'] for f in _por_dia(lineas, unidades=Sum('cantidad'))}
+    unidades_por_cupon = {
+        (f['dia'], f['pedido__cupon_id']): f['unidades']
+        for f in _por_dia(lineas.filter(pedido__cupon__isnull=False), 'pedido__cupon_id', unidades=Sum('cantidad'))
+    }
+    return {
+        VentaDiaria: [
+            VentaDiaria(dia=f['dia'], pedidos=f['pedidos'], ingresos=f['ingresos'],
+                        unidades=unidades_por_dia.get(f['dia'], 0))
+            for f in _por_dia(pedidos, pedidos=Count('id'), ingresos=Sum('total'))
+        ],
+        VentaLibroDiaria: [
+            VentaLibroDiaria(dia=f['dia'], libro_id=f['libro_id'], unidades=f['unidades'], ingresos=f['ingresos'])
+            for f in _por_dia(lineas, 'libro_id', **ventas)
+        ],
+        VentaCategoriaDiaria: [
+            VentaCategoriaDiaria(dia=f['dia'], categoria_id=f['libro__categorias'],
+                                 unidades=f['unidades'], ingresos=f['ingresos'])
+            for f in _por_dia(lineas.filter(libro__categorias__isnull=False), 'libro__categorias', **ventas)
+        ],
+        VentaFormatoDiaria: [
+            VentaFormatoDiaria(dia=f['dia'], formato=f['libro__formato'], unidades=f['unidades'], ingresos=f['ingresos'])
+            for f in _por_dia(lineas, 'libro__formato', **ventas)
+        ],
+        VentaCuponDiaria: [
+            VentaCuponDiaria(dia=f['dia'], cupon_id=f['cupon_id'], pedidos=f['pedidos'], ingresos=f['ingresos'],
+                             unidades=unidades_por_cupon.get((f['dia'], f['cupon_id']), 0))
+            for f in _por_dia(pedidos.filter(cupon__isnull=False), 'cupon_id', pedidos=Count('id'), ingresos=Sum('total'))
+        ],
+    }
+
+
+def _lotes(dias):
+    # Cada lote abarca como mucho DIAS_POR_LOTE días de calendario, para que
+    # un día suelto antiguo no haga recorrer meses de pedidos
+    lote = []
+    for dia in sorted(dias):
+        if lote and (dia - lote[0]).days >= DIAS_POR_LOTE:
+            yield lote
+            lote = []
+        lote.append(dia)
+    if lote:
+        yield lote
+
+
+def recalcular_dias(dias):
+    """
+    Rehace por completo los resúmenes de ``dias``. Cada lote se borra y se
+    vuelve a insertar en la misma transacción: quien lea el panel ve cada
+    día con sus cifras antiguas o con las nuevas, nunca vacío.
+    """
+    for lote in _lotes(dias):
+        with transaction.atomic():
+            filas = _filas(lote)
+            for modelo in TABLAS:
+                modelo.objects.filter(dia__in=lote).delete()
+                modelo.objects.bulk_create(filas[modelo], batch_size=1000)
+
+
+def actualizar_reportes(desde_cero=False):
+    """
+    Recalcula solo los días con pedidos creados o cambiados desde la
+    última marca y la avanza. ``desde_cero`` lo rehace todo (necesario si
+    se borran pedidos, que no dejan rastro en la marca): los días con
+    pedidos y también los que solo tienen resúmenes, que se quedan vacíos,
+    lote a lote y sin vaciar antes las tablas. Devuelve los días recalculados.
+    """
+    ahora = timezone.now()
+    marca = None if desde_cero else MarcaAgregacion.objects.filter(nombre=MARCA).first()
+    dias = dias_modificados(marca.valor - SOLAPE if marca else None)
+    if desde_cero:
+        dias = sorted(set(dias).union(dias_con_resumen()))
+    recalcular_dias(dias)
+    MarcaAgregacion.objects.update_or_create(nombre=MARCA, defaults={'valor': ahora})
+    return dias
@@ -0,0 +1,184 @@
+# reportes/exportacion.py
+"""
+Exportación masiva de pedidos, líneas, catálogo y cupones a CSV o Parquet.
+Las filas se leen con un cursor del servidor (QuerySet.iterator) en
+bloques, cada bloque se convierte en un DataFrame y se escribe en cuanto
+está listo, así que la memoria depende del bloque y no de la tabla.
+"""
+import pandas as pd
+from django.db import models
+
+from libros.models import Libro
+from pedidos.models import Cupon, DetallePedido, Pedido
+
+FILAS_POR_BLOQUE = 50_000
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportacionNoDisponible(Exception):
+    pass
+
+
+def _importar_pyarrow():
+    # pyarrow es opcional: solo hace falta para Parquet
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportacionNoDisponible("La exportación a Parquet requiere el paquete pyarrow.")
+    return pyarrow
+
+
+def _campo(modelo, ruta):
+    partes = ruta.split('__')
+    for parte in partes[:-1]:
+        modelo = modelo._meta.get_field(parte).related_model
+    campo = modelo._meta.get_field(partes[-1])
+    return campo.target_field if campo.is_relation else campo
+
+
+def _tipo_arrow(pa, campo):
+    if isinstance(campo, models.DecimalField):
+        return pa.decimal128(campo.max_digits, campo.decimal_places)
+    if isinstance(campo, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(campo, models.DateField):
+        return pa.date32()
+    if isinstance(campo, models.BooleanField):
+        return pa.bool_()
+    if isinstance(campo, (models.IntegerField, models.AutoField)):
+        return pa.int64()
+    return pa.string()
+
+
+class Exportacion:
+    """
+    ``columnas`` es una lista de (nombre en el archivo, ruta en el ORM).
+    ``calculadas`` añade columnas derivadas con operaciones de pandas
+    sobre cada bloque: (nombre, función(DataFrame) -> Series, campo modelo
+    que da el tipo en Parquet).
+    """
+
+    def __init__(self, queryset, columnas, calculadas=()):
+        self.queryset = queryset
+        self.columnas = columnas
+        self.calculadas = calculadas
+
+    @property
+    def nombres(self):
+        return [nombre for nombre, _ in self.columnas] + [nombre for nombre, _, _ in self.calculadas]
+
+    def esquema(self):
+        pa = _importar_pyarrow()
+        modelo = self.queryset().model
+        campos = [(nombre, _campo(modelo, ruta)) for nombre, ruta in self.columnas]
+        campos += [(nombre, campo) for nombre, _, campo in self.calculadas]
+        return pa.schema([pa.field(nombre, _tipo_arrow(pa, campo)) for nombre, campo in campos])
+
+    def marco(self, filas):
+        marco = pd.DataFrame.from_records(filas, columns=[nombre for nombre, _ in self.columnas])
+        for nombre, calcular, _ in self.calculadas:
+            marco[nombre] = calcular(marco) if len(marco) else pd.Series(dtype=object)
+        return marco
+
+    def bloques(self, filas_por_bloque=FILAS_POR_BLOQUE):
+        """DataFrames de hasta ``filas_por_bloque`` filas (al menos uno, aunque esté vacío)."""
+        filas = (self.queryset()
+                 .values_list(*[ruta for _, ruta in self.columnas])
+                 .iterator(chunk_size=filas_por_bloque))
+        bloque = []
+        emitido = False
+        for fila in filas:
+            bloque.append(fila)
+            if len(bloque) >= filas_por_bloque:
+                yield self.marco(bloque)
+                bloque = []
+                emitido = True
+        if bloque or not emitido:
+            yield self.marco(bloque)
+
+
+EXPORTACIONES = {
+    'pedidos': Exportacion(
+        lambda: Pedido.objects.order_by('id'),
+        [('id', 'id'), ('numero_orden', 'numero_orden'), ('cliente', 'usuario__email'),
+         ('fecha_creacion', 'fecha_creacion'), ('actualizado', 'actualizado'), ('estado', 'estado'),
+         ('cupon', 'cupon__codigo'), ('total', 'total'), ('direccion_envio', 'direccion_envio')],
+    ),
+    'detalles': Exportacion(
+        lambda: DetallePedido.objects.order_by('id'),
+        [('id', 'id'), ('pedido_id', 'pedido_id'), ('numero_orden', 'pedido__numero_orden'),
+         ('libro_id', 'libro_id'), ('titulo', 'libro__titulo'), ('cantidad', 'cantidad'),
+         ('precio_unitario', 'precio_unitario')],
+        calculadas=[('subtotal', lambda marco: marco['cantidad'] * marco['precio_unitario'],
+                     models.DecimalField(max_digits=14, decimal_places=2))],
+    ),
+    'libros': Exportacion(
+        lambda: Libro.objects.order_by('id'),
+        [('id', 'id'), ('titulo', 'titulo'), ('autor', 'autor__nombre'), ('precio', 'precio'),
+         ('stock', 'stock'), ('formato', 'formato'), ('fecha_publicacion', 'fecha_publicacion')],
+    ),
+    'cupones': Exportacion(
+        lambda: Cupon.objects.order_by('id'),
+        [('id', 'id'), ('codigo', 'codigo'), ('descuento', 'descuento'), ('fecha_inicio', 'fecha_inicio'),
+         ('fecha_expiracion', 'fecha_expiracion'), ('activo', 'activo')],
+    ),
+}
+
+
+def a_csv(exportacion, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Genera el CSV como trozos de texto, uno por bloque."""
+    cabecera = True
+    for marco in exportacion.bloques(filas_por_bloque):
+        yield marco.to_csv(index=False, header=cabecera)
+        cabecera = False
+
+
+class _Sumidero:
+    # Archivo de solo escritura que entrega lo escrito al vaciarlo
+    closed = False
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def a_parquet(exportacion, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Genera el Parquet como trozos de bytes; cada bloque es un grupo de filas."""
+    pa = _importar_pyarrow()
+    esquema = exportacion.esquema()
+    sumidero = _Sumidero()
+    escritor = pa.parquet.ParquetWriter(sumidero, esquema)
+    try:
+        for marco in exportacion.bloques(filas_por_bloque):
+            escritor.write_table(pa.Table.from_pandas(marco, schema=esquema, preserve_index=False))
+            yield sumidero.vaciar()
+    finally:
+        escritor.close()
+    yield sumidero.vaciar()
+
+
+def exportar(conjunto, formato, filas_por_bloque=FILAS_POR_BLOQUE):
+    exportacion = EXPORTACIONES[conjunto]
+    if formato == 'parquet':
+        # Falla antes de empezar a enviar datos si falta pyarrow
+        _importar_pyarrow()
+        return a_parquet(exportacion, filas_por_bloque)
+    return a_csv(exportacion, filas_por_bloque)
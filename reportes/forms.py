@@ -0,0 +1,23 @@
+# reportes/forms.py
+from datetime import timedelta
+
+from django import forms
+from django.utils import timezone
+
+DIAS_POR_DEFECTO = 30
+
+
+class RangoFechasForm(forms.Form):
+    desde = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    hasta = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def rango(self):
+        """(desde, hasta) inclusivos; por defecto los últimos 30 días."""
+        hasta = timezone.localdate()
+        desde = hasta - timedelta(days=DIAS_POR_DEFECTO - 1)
+        if self.is_valid():
+            hasta = self.cleaned_data['hasta'] or hasta
+            desde = self.cleaned_data['desde'] or min(desde, hasta)
+        if desde > hasta:
+            desde, hasta = hasta, desde
+        return desde, hasta
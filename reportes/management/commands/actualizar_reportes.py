@@ -0,0 +1,20 @@
+# reportes/management/commands/actualizar_reportes.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from reportes.agregacion import actualizar_reportes
+
+
+class Command(BaseCommand):
+    help = "Actualiza las tablas de resumen de ventas con los pedidos nuevos o modificados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde-cero', action='store_true',
+                            help="Recalcula todos los días con todo el historial, lote a lote, sin vaciar antes las tablas.")
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        dias = actualizar_reportes(desde_cero=options['desde_cero'])
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(f"{len(dias)} días recalculados en {duracion:.2f}s"))
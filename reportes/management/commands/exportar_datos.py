@@ -0,0 +1,36 @@
+# reportes/management/commands/exportar_datos.py
+from django.core.management.base import BaseCommand, CommandError
+
+from reportes.exportacion import EXPORTACIONES, FILAS_POR_BLOQUE, FORMATOS, ExportacionNoDisponible, exportar
+
+
+class Command(BaseCommand):
+    help = "Exporta pedidos, líneas de pedido, libros o cupones a CSV o Parquet por bloques."
+
+    def add_arguments(self, parser):
+        parser.add_argument('conjunto', choices=sorted(EXPORTACIONES))
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+        parser.add_argument('--salida', default='-',
+                            help="Archivo de destino; '-' escribe el CSV en la salida estándar.")
+        parser.add_argument('--bloque', type=int, default=FILAS_POR_BLOQUE,
+                            help="Filas leídas y escritas por bloque.")
+
+    def handle(self, *args, **options):
+        formato = options['formato']
+        if options['salida'] == '-' and formato == 'parquet':
+            raise CommandError("Parquet es binario: indica un archivo con --salida.")
+        try:
+            trozos = exportar(options['conjunto'], formato, options['bloque'])
+        except ExportacionNoDisponible as e:
+            raise CommandError(str(e))
+
+        if options['salida'] == '-':
+            for trozo in trozos:
+                self.stdout.write(trozo, ending='')
+            return
+
+        modo, codificacion = ('wb', None) if formato == 'parquet' else ('w', 'utf-8')
+        with open(options['salida'], modo, encoding=codificacion, newline='' if codificacion else None) as archivo:
+            for trozo in trozos:
+                archivo.write(trozo)
+        self.stderr.write(self.style.SUCCESS(f"{options['conjunto']} exportado a {options['salida']}"))
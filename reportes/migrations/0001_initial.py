@@ -0,0 +1,86 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('libros', '0004_libros_relacionados'),
+        ('pedidos', '0010_pedido_actualizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaAgregacion',
+            fields=[
+                ('nombre', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(unique=True)),
+                ('pedidos', models.PositiveIntegerField()),
+                ('unidades', models.PositiveIntegerField()),
+                ('ingresos', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VentaFormatoDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('formato', models.CharField(choices=[('fisico', 'Físico'), ('digital', 'Digital')], max_length=10)),
+                ('unidades', models.PositiveIntegerField()),
+                ('ingresos', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dia', 'formato'), name='venta_formato_dia_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaCategoriaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('unidades', models.PositiveIntegerField()),
+                ('ingresos', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='libros.categoria')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dia', 'categoria'), name='venta_categoria_dia_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaCuponDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('pedidos', models.PositiveIntegerField()),
+                ('ingresos', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('cupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pedidos.cupon')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dia', 'cupon'), name='venta_cupon_dia_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaLibroDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('unidades', models.PositiveIntegerField()),
+                ('ingresos', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='libros.libro')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dia', 'libro'), name='venta_libro_dia_unica')],
+            },
+        ),
+    ]
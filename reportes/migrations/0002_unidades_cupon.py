@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+def recalcular_todo(apps, schema_editor):
+    # Sin marca, la siguiente `actualizar_reportes` rehace todos los días y
+    # rellena las unidades de las filas ya agregadas
+    apps.get_model('reportes', 'MarcaAgregacion').objects.filter(nombre='ventas').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ventacupondiaria',
+            name='unidades',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(recalcular_todo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# reportes/models.py
+from django.db import models
+from libros.models import Categoria, Libro
+from pedidos.models import Cupon
+
+# Tablas de resumen por día. Las rellena `actualizar_reportes` a partir de
+# los pedidos no cancelados; el panel solo lee de aquí. Los ingresos por
+# libro, categoría y formato son brutos (cantidad x precio); los diarios y
+# por cupón son los totales cobrados, con el descuento aplicado.
+
+class VentaDiaria(models.Model):
+    dia = models.DateField(unique=True)
+    pedidos = models.PositiveIntegerField()
+    unidades = models.PositiveIntegerField()
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.dia}: {self.ingresos}"
+
+class VentaLibroDiaria(models.Model):
+    dia = models.DateField()
+    libro = models.ForeignKey(Libro, related_name='+', on_delete=models.CASCADE)
+    unidades = models.PositiveIntegerField()
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'libro'], name='venta_libro_dia_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.libro_id}: {self.unidades}"
+
+class VentaCategoriaDiaria(models.Model):
+    # Un libro con varias categorías suma en cada una de ellas
+    dia = models.DateField()
+    categoria = models.ForeignKey(Categoria, related_name='+', on_delete=models.CASCADE)
+    unidades = models.PositiveIntegerField()
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'categoria'], name='venta_categoria_dia_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.categoria_id}: {self.unidades}"
+
+class VentaFormatoDiaria(models.Model):
+    dia = models.DateField()
+    formato = models.CharField(max_length=10, choices=Libro.FORMATO_CHOICES)
+    unidades = models.PositiveIntegerField()
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'formato'], name='venta_formato_dia_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.formato}: {self.unidades}"
+
+class VentaCuponDiaria(models.Model):
+    dia = models.DateField()
+    cupon = models.ForeignKey(Cupon, related_name='+', on_delete=models.CASCADE)
+    pedidos = models.PositiveIntegerField()
+    unidades = models.PositiveIntegerField()
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'cupon'], name='venta_cupon_dia_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.cupon_id}: {self.pedidos}"
+
+class MarcaAgregacion(models.Model):
+    # Hasta dónde (Pedido.actualizado) llegó la última agregación
+    nombre = models.CharField(max_length=50, primary_key=True)
+    valor = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
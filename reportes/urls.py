@@ -0,0 +1,8 @@
+# reportes/urls.py
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('ventas/', views.panel_ventas, name='panel_ventas'),
+    path('exportar/<str:conjunto>/<str:formato>/', views.exportar_datos, name='exportar_datos'),
+]
@@ -0,0 +1,66 @@
+# reportes/views.py
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.db.models import Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+from libros.models import Libro
+from pedidos.views import es_superusuario
+from .agregacion import MARCA
+from .exportacion import EXPORTACIONES, FORMATOS, ExportacionNoDisponible, exportar
+from .forms import RangoFechasForm
+from .models import (MarcaAgregacion, VentaCategoriaDiaria, VentaCuponDiaria, VentaDiaria,
+                     VentaFormatoDiaria, VentaLibroDiaria)
+
+MAS_VENDIDOS = 10
+
+@login_required
+@user_passes_test(es_superusuario)
+def panel_ventas(request):
+    # Solo lee las tablas de resumen: el coste depende del rango pedido, no del historial
+    filtros = RangoFechasForm(request.GET or None)
+    desde, hasta = filtros.rango()
+    rango = {'dia__gte': desde, 'dia__lte': hasta}
+    ventas = {'unidades': Sum('unidades'), 'ingresos': Sum('ingresos')}
+    formatos = dict(Libro.FORMATO_CHOICES)
+
+    return render(request, 'reportes/panel_ventas.html', {
+        'filtros': filtros,
+        'desde': desde,
+        'hasta': hasta,
+        'totales': VentaDiaria.objects.filter(**rango).aggregate(pedidos=Sum('pedidos'), **ventas),
+        'dias': VentaDiaria.objects.filter(**rango).order_by('dia'),
+        'libros': (VentaLibroDiaria.objects.filter(**rango)
+                   .values('libro_id', 'libro__titulo').annotate(**ventas)
+                   .order_by('-ingresos', 'libro_id')[:MAS_VENDIDOS]),
+        'categorias': (VentaCategoriaDiaria.objects.filter(**rango)
+                       .values('categoria__nombre').annotate(**ventas)
+                       .order_by('-ingresos', 'categoria__nombre')),
+        'formatos': [
+            dict(fila, nombre=formatos.get(fila['formato'], fila['formato']))
+            for fila in (VentaFormatoDiaria.objects.filter(**rango)
+                         .values('formato').annotate(**ventas).order_by('-ingresos'))
+        ],
+        'cupones': (VentaCuponDiaria.objects.filter(**rango)
+                    .values('cupon__codigo').annotate(pedidos=Sum('pedidos'), **ventas)
+                    .order_by('-ingresos', 'cupon__codigo')),
+        'marca': MarcaAgregacion.objects.filter(nombre=MARCA).first(),
+        'exportaciones': EXPORTACIONES,
+    })
+
+@login_required
+@user_passes_test(es_superusuario)
+def exportar_datos(request, conjunto, formato):
+    if conjunto not in EXPORTACIONES or formato not in FORMATOS:
+        raise Http404
+    try:
+        contenido = exportar(conjunto, formato)
+    except ExportacionNoDisponible as e:
+        return HttpResponse(str(e), status=501, content_type='text/plain; charset=utf-8')
+
+    tipo, extension = FORMATOS[formato]
+    response = StreamingHttpResponse(contenido, content_type=tipo)
+    nombre = f"{conjunto}-{timezone.localdate():%Y%m%d}.{extension}"
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
@@ -0,0 +1,165 @@
+import pytest
+from decimal import Decimal
+from django.test import Client
+from django.urls import reverse
+from usuarios.models import Usuario
+from libros.models import Libro, Autor, Categoria, LibroBusqueda
+from libros.busqueda import buscar
+
+@pytest.mark.django_db
+class TestBusquedaCatalogo:
+    @pytest.fixture
+    def autor(self):
+        return Autor.objects.create(nombre="Gabriel García Márquez")
+
+    @pytest.fixture
+    def libros(self, autor):
+        otro_autor = Autor.objects.create(nombre="Isabel Allende")
+        realismo = Categoria.objects.create(nombre="Realismo mágico")
+        cien = Libro.objects.create(
+            titulo="Cien años de soledad",
+            autor=autor,
+            descripcion="La historia de la familia Buendía en Macondo",
+            precio=Decimal('30.00'),
+            stock=3,
+            formato="fisico"
+        )
+        cien.categorias.add(realismo)
+        casa = Libro.objects.create(
+            titulo="La casa de los espíritus",
+            autor=otro_autor,
+            descripcion="Saga familiar con toques de soledad",
+            precio=Decimal('25.00'),
+            stock=3,
+            formato="digital"
+        )
+        return cien, casa
+
+    def ids(self, termino):
+        return [libro.id for libro in buscar(Libro.objects.all(), termino).order_by('-rango', 'id')]
+
+    def test_documento_se_crea_al_guardar(self, libros):
+        cien, _ = libros
+        documento = LibroBusqueda.objects.get(libro=cien).documento
+
+        assert "Cien años de soledad" in documento
+        assert "García Márquez" in documento
+        assert "Realismo mágico" in documento
+        assert "Macondo" in documento
+
+    def test_busca_por_titulo_autor_categoria_y_descripcion(self, libros):
+        cien, casa = libros
+
+        assert self.ids("macondo") == [cien.id]
+        assert self.ids("allende") == [casa.id]
+        assert self.ids("realismo") == [cien.id]
+        # Sin tildes y por prefijo
+        assert self.ids("garcia marq") == [cien.id]
+
+    def test_resultados_ordenados_por_relevancia(self, libros):
+        cien, casa = libros
+
+        # "soledad" aparece en el título de uno y solo en la descripción del otro
+        assert set(self.ids("soledad")) == {cien.id, casa.id}
+
+    def test_indice_se_actualiza_con_las_senales(self, libros, autor):
+        cien, casa = libros
+
+        autor.nombre = "Gabo"
+        autor.save()
+        assert self.ids("gabo") == [cien.id]
+
+        nueva = Categoria.objects.create(nombre="Clásicos")
+        casa.categorias.add(nueva)
+        assert self.ids("clasicos") == [casa.id]
+
+        casa.titulo = "Paula"
+        casa.save()
+        assert self.ids("espiritus") == []
+
+        cien.delete()
+        assert self.ids("macondo") == []
+
+    def test_vaciar_una_categoria_reindexa_sus_libros(self, libros):
+        realismo = Categoria.objects.get(nombre="Realismo mágico")
+
+        realismo.libro_set.clear()
+
+        assert self.ids("realismo") == []
+
+    def test_sintaxis_fts_no_rompe_la_consulta(self, libros):
+        assert self.ids('"soledad" OR NEAR(*') == []
+        assert list(buscar(Libro.objects.all(), '***')) == []
+
+    def test_vista_ordena_por_relevancia(self, libros):
+        usuario = Usuario.objects.create_user(
+            username="lector",
+            email="lector@example.com",
+            password="password123"
+        )
+        client = Client()
+        client.force_login(usuario)
+
+        response = client.get(reverse('lista_libros'), {'busqueda': 'soledad'})
+
+        assert response.status_code == 200
+        assert response.context['orden'] == 'relevancia'
+        assert len(response.context['libros']) == 2
+
+    def test_paginacion_por_relevancia(self, libros, autor):
+        from libros.paginacion import PaginadorCursor
+        from libros.views import ORDENES_CATALOGO
+        for i in range(5):
+            Libro.objects.create(
+                titulo=f"Soledad {i}",
+                autor=autor,
+                descripcion="soledad " * i,
+                precio=Decimal('10.00'),
+                stock=1,
+                formato="fisico"
+            )
+        paginador = PaginadorCursor(buscar(Libro.objects.all(), "soledad"), ORDENES_CATALOGO['relevancia'], por_pagina=2)
+
+        vistos = []
+        pagina = paginador.pagina()
+        while True:
+            vistos.extend(libro.id for libro in pagina)
+            if not pagina.siguiente:
+                break
+            pagina = paginador.pagina(pagina.siguiente)
+
+        esperado = buscar(Libro.objects.all(), "soledad").order_by('-rango', '-id')
+        assert vistos == [libro.id for libro in esperado]
+        assert len(set(vistos)) == 7
+
+    def test_paginacion_con_empates_de_relevancia(self, libros, autor):
+        from libros.paginacion import PaginadorCursor
+        from libros.views import ORDENES_CATALOGO
+        # Documentos idénticos: el mismo rango a ambos lados de cada página
+        for i in range(7):
+            Libro.objects.create(titulo="Eco", autor=autor, descripcion="eco", precio=Decimal('10.00'),
+                                 stock=1, formato="fisico")
+        paginador = PaginadorCursor(buscar(Libro.objects.all(), "eco"), ORDENES_CATALOGO['relevancia'], por_pagina=3)
+
+        vistos, paginas = [], 0
+        pagina = paginador.pagina()
+        while True:
+            vistos.extend(libro.id for libro in pagina)
+            paginas += 1
+            if not pagina.siguiente or paginas > 5:
+                break
+            pagina = paginador.pagina(pagina.siguiente)
+
+        assert len({libro.rango for libro in buscar(Libro.objects.all(), "eco")}) == 1
+        assert vistos == list(Libro.objects.filter(titulo="Eco").order_by('-id').values_list('id', flat=True))
+        assert paginas == 3
+
+    def test_rango_postgresql_en_doble_precision(self):
+        from unittest import mock
+        from django.db import connection
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            consulta = buscar(Libro.objects.all(), "eco")
+        rango = consulta.query.annotations['rango']
+
+        assert rango.sql.startswith("SELECT (ts_rank(")
+        assert ")::double precision FROM" in rango.sql
@@ -209,4 +209,265 @@ class TestCarritoViews:
             })
             
             # Verificar que no se guardó ningún cupón en la sesión
-            assert 'cupon_id' not in client.session
\ No newline at end of file
+            assert 'cupon_id' not in client.session
+
+@pytest.mark.django_db
+class TestAgregarAlCarritoAtomico:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(username="testuser", email="test@example.com", password="password123")
+
+    @pytest.fixture
+    def libro(self):
+        autor = Autor.objects.create(nombre="Autor Test")
+        return Libro.objects.create(titulo="Libro de prueba", autor=autor, descripcion="",
+                                    precio=Decimal('19.99'), stock=2, formato="fisico")
+
+    @pytest.fixture
+    def client(self, client, usuario):
+        client.force_login(usuario)
+        return client
+
+    def test_json_suma_sin_pasar_del_stock(self, client, usuario, libro):
+        url = reverse('agregar_al_carrito_json', args=[libro.id])
+
+        primera = client.post(url, HTTP_ACCEPT='application/json')
+        segunda = client.post(url)
+        tercera = client.post(url)
+
+        assert primera.json() == {'ok': True, 'cantidad': 1, 'articulos': 1, 'subtotal': '19.99',
+                                  'descuento': '0.00', 'total': '19.99'}
+        assert segunda.json()['cantidad'] == 2
+        assert tercera.status_code == 409
+        assert tercera.json()['ok'] is False
+        assert tercera.json()['articulos'] == 2
+        assert ItemCarrito.objects.get(carrito__usuario=usuario).cantidad == 2
+
+    def test_json_consultas(self, client, usuario, libro, django_assert_max_num_queries):
+        Carrito.objects.create(usuario=usuario)
+        url = reverse('agregar_al_carrito_json', args=[libro.id])
+
+        # Sesión y usuario, carrito, la reserva y la línea (en SQLite dos sentencias
+        # en un savepoint; en PostgreSQL una sola) y el resumen
+        with django_assert_max_num_queries(8):
+            assert client.post(url).status_code == 200
+
+    def test_json_solo_post_y_libro_inexistente(self, client):
+        assert client.get(reverse('agregar_al_carrito_json', args=[1])).status_code == 405
+        assert client.post(reverse('agregar_al_carrito_json', args=[999])).status_code == 404
+
+    def test_sin_stock_vuelve_al_detalle(self, client, libro):
+        Libro.objects.filter(id=libro.id).update(stock=0)
+
+        response = client.get(reverse('agregar_al_carrito', args=[libro.id]))
+
+        assert response.status_code == 302
+        assert response.url == reverse('detalle_libro', args=[libro.id])
+        assert not ItemCarrito.objects.exists()
+
+    def test_variante_orm(self, usuario, libro):
+        from carrito.operaciones import _sumar_orm
+        carrito = Carrito.objects.create(usuario=usuario)
+
+        assert _sumar_orm(carrito.id, libro.id, 1) == 1
+        assert _sumar_orm(carrito.id, libro.id, 1) == 2
+        assert _sumar_orm(carrito.id, libro.id, 1) is None
+        assert _sumar_orm(carrito.id, 999, 1) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_clics_simultaneos_no_superan_el_stock():
+    from concurrent.futures import ThreadPoolExecutor
+    from django.db import OperationalError, connection
+    from carrito.operaciones import sumar_al_carrito
+
+    usuario = Usuario.objects.create_user(username="c", email="c@example.com", password="password123")
+    libro = Libro.objects.create(titulo="L", autor=Autor.objects.create(nombre="A"), descripcion="",
+                                 precio=Decimal('1.00'), stock=5, formato="fisico")
+    carrito = Carrito.objects.create(usuario=usuario)
+
+    def clic(_):
+        # La base de pruebas en memoria compartida no espera a los bloqueos
+        # como un archivo SQLite: el clic se reintenta, como haría el usuario
+        try:
+            while True:
+                try:
+                    return sumar_al_carrito(carrito.id, libro.id)
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=4) as grupo:
+        resultados = list(grupo.map(clic, range(12)))
+
+    assert sorted(r for r in resultados if r) == [1, 2, 3, 4, 5]
+    assert ItemCarrito.objects.get().cantidad == 5
+
+
+@pytest.mark.django_db
+class TestActualizarCarrito:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(username="testuser", email="test@example.com", password="password123")
+
+    @pytest.fixture
+    def lineas(self, usuario):
+        autor = Autor.objects.create(nombre="Autor Test")
+        carrito = Carrito.objects.create(usuario=usuario)
+        return [
+            ItemCarrito.objects.create(
+                carrito=carrito, cantidad=1,
+                libro=Libro.objects.create(titulo=f"Libro {i}", autor=autor, descripcion="",
+                                           precio=Decimal('10.00'), stock=5, formato="fisico"))
+            for i in range(20)
+        ]
+
+    @pytest.fixture
+    def client(self, client, usuario):
+        client.force_login(usuario)
+        return client
+
+    def test_todas_las_cantidades_en_un_envio(self, client, lineas, django_assert_max_num_queries):
+        datos = {f'cantidad-{linea.id}': 3 for linea in lineas}
+        datos[f'cantidad-{lineas[0].id}'] = 0
+        datos[f'cantidad-{lineas[1].id}'] = 9
+        datos[f'cantidad-{lineas[2].id}'] = 1
+
+        # Sesión, usuario, carrito, líneas con stock, UPDATE, DELETE y guardar los mensajes
+        with django_assert_max_num_queries(9):
+            response = client.post(reverse('actualizar_carrito'), datos)
+
+        assert response.status_code == 302
+        cantidades = dict(ItemCarrito.objects.values_list('id', 'cantidad'))
+        assert lineas[0].id not in cantidades
+        assert cantidades[lineas[1].id] == 1
+        assert cantidades[lineas[2].id] == 1
+        assert all(cantidades[linea.id] == 3 for linea in lineas[3:])
+        mensajes = [str(m) for m in response.wsgi_request._messages]
+        assert "'Libro 0' eliminado del carrito." in mensajes
+        assert "No hay suficiente stock para 9 unidades de 'Libro 1'." in mensajes
+
+    def test_no_toca_carritos_ajenos(self, client, lineas):
+        otro = Usuario.objects.create_user(username="otro", email="otro@example.com", password="password123")
+        ajena = ItemCarrito.objects.create(carrito=Carrito.objects.create(usuario=otro),
+                                           libro=lineas[0].libro, cantidad=1)
+
+        client.post(reverse('actualizar_carrito'), {f'cantidad-{ajena.id}': 0})
+
+        assert ItemCarrito.objects.filter(id=ajena.id).exists()
+
+    def test_cantidad_no_valida(self, client, lineas):
+        client.post(reverse('actualizar_carrito'), {f'cantidad-{lineas[0].id}': 4, f'cantidad-{lineas[1].id}': 'x'})
+
+        assert ItemCarrito.objects.get(id=lineas[0].id).cantidad == 1
+
+    def test_carrito_con_formulario_unico(self, client, lineas):
+        contenido = client.get(reverse('ver_carrito')).content.decode()
+
+        assert contenido.count('form="form-cantidades"') == 20
+        assert f'name="cantidad-{lineas[0].id}"' in contenido
+
+
+@pytest.mark.django_db
+class TestCarritoInvitado:
+    @pytest.fixture
+    def libros(self):
+        autor = Autor.objects.create(nombre="Autor Test")
+        return [Libro.objects.create(titulo=f"Libro {i}", autor=autor, descripcion="",
+                                     precio=Decimal('10.00'), stock=3, formato="fisico")
+                for i in range(3)]
+
+    @staticmethod
+    def escrituras(consultas):
+        return [c['sql'] for c in consultas.captured_queries
+                if c['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))]
+
+    def test_sin_escrituras_en_la_base_de_datos(self, client, libros):
+        from django.test.utils import CaptureQueriesContext
+        from django.db import connection
+
+        with CaptureQueriesContext(connection) as consultas:
+            client.get(reverse('agregar_al_carrito', args=[libros[0].id]))
+            respuesta = client.post(reverse('agregar_al_carrito_json', args=[libros[1].id]))
+            client.post(reverse('actualizar_carrito'), {f'cantidad-{libros[0].id}': 2})
+            contenido = client.get(reverse('ver_carrito')).content.decode()
+
+        assert self.escrituras(consultas) == []
+        assert respuesta.json()['articulos'] == 2
+        assert 'Libro 0' in contenido and 'Libro 1' in contenido
+        assert f'name="cantidad-{libros[0].id}" value="2"' in contenido
+        assert not Carrito.objects.exists()
+
+    def test_stock_y_eliminar(self, client, libros):
+        url = reverse('agregar_al_carrito_json', args=[libros[0].id])
+        for _ in range(3):
+            client.post(url)
+
+        assert client.post(url).status_code == 409
+        client.post(reverse('actualizar_carrito'), {f'cantidad-{libros[0].id}': 9})
+        client.get(reverse('agregar_al_carrito', args=[libros[1].id]))
+        client.get(reverse('eliminar_del_carrito', args=[libros[0].id]))
+
+        contenido = client.get(reverse('ver_carrito')).content.decode()
+        assert f'name="cantidad-{libros[1].id}" value="1"' in contenido
+        assert f'name="cantidad-{libros[0].id}"' not in contenido
+        assert client.get(reverse('eliminar_del_carrito', args=[libros[2].id])).status_code == 404
+
+    def test_cookie_manipulada_se_descarta(self, client, libros):
+        client.get(reverse('agregar_al_carrito', args=[libros[0].id]))
+        valor = client.cookies['carrito'].value
+        client.cookies['carrito'] = valor[:-1] + ('A' if valor[-1] != 'A' else 'B')
+
+        response = client.get(reverse('ver_carrito'))
+
+        assert "Tu carrito está vacío" in response.content.decode()
+        assert client.cookies['carrito'].value == ''
+
+    def test_fusion_al_iniciar_sesion(self, client, libros, django_assert_max_num_queries):
+        usuario = Usuario.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        carrito = Carrito.objects.create(usuario=usuario)
+        ItemCarrito.objects.create(carrito=carrito, libro=libros[0], cantidad=2)
+        client.get(reverse('agregar_al_carrito', args=[libros[0].id]))
+        client.get(reverse('agregar_al_carrito', args=[libros[0].id]))
+        client.get(reverse('agregar_al_carrito', args=[libros[1].id]))
+
+        response = client.post(reverse('login'), {'username': 'test@example.com', 'password': 'password123'})
+
+        assert response.status_code == 302
+        # Las cantidades se suman sin pasar del stock
+        assert dict(carrito.items.values_list('libro_id', 'cantidad')) == {libros[0].id: 3, libros[1].id: 1}
+        assert client.cookies['carrito'].value == ''
+
+    def test_fusion_en_un_solo_upsert(self, libros):
+        from django.test.utils import CaptureQueriesContext
+        from django.db import connection
+        from carrito.invitado import CarritoInvitado, fusionar
+        usuario = Usuario.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        ItemCarrito.objects.create(carrito=Carrito.objects.create(usuario=usuario), libro=libros[0], cantidad=1)
+        invitado = CarritoInvitado({libro.id: 1 for libro in libros})
+
+        with CaptureQueriesContext(connection) as consultas:
+            fusionar(invitado, usuario)
+
+        # El upsert de las líneas y el UPDATE que reserva sus unidades
+        escrituras = self.escrituras(consultas)
+        assert len(escrituras) == 2
+        assert 'ON CONFLICT' in escrituras[0]
+        assert dict(ItemCarrito.objects.values_list('libro_id', 'cantidad')) == {
+            libros[0].id: 2, libros[1].id: 1, libros[2].id: 1}
+        assert [libro.reservado for libro in Libro.objects.order_by('id')] == [1, 1, 1]
+
+    def test_fusion_respeta_las_reservas_de_otros_carritos(self, libros):
+        from carrito.invitado import CarritoInvitado, fusionar
+        from carrito.operaciones import sumar_al_carrito
+        otro = Usuario.objects.create_user(username="otro", email="otro@example.com", password="password123")
+        sumar_al_carrito(Carrito.objects.create(usuario=otro).id, libros[0].id, 2)
+        usuario = Usuario.objects.create_user(username="testuser", email="test@example.com", password="password123")
+
+        carrito = fusionar(CarritoInvitado({libros[0].id: 3}), usuario)
+
+        linea = carrito.items.get()
+        assert (linea.cantidad, linea.reservada) == (1, 1)
+        assert Libro.objects.get(id=libros[0].id).reservado == 3
@@ -0,0 +1,95 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from usuarios.models import Usuario
+from libros.models import Libro, Autor
+from carrito.models import Carrito, ItemCarrito
+from carrito.precios import calcular_resumen
+from pedidos.models import Pedido, DetallePedido
+from pedidos.compra import StockInsuficiente, crear_pedido, descontar_stock
+
+@pytest.mark.django_db
+class TestCrearPedido:
+    @pytest.fixture
+    def autor(self):
+        return Autor.objects.create(nombre="Autor Test")
+
+    def crear_libro(self, autor, stock, precio='10.00'):
+        return Libro.objects.create(
+            titulo=f"Libro {Libro.objects.count()}",
+            autor=autor,
+            descripcion="Descripción",
+            precio=Decimal(precio),
+            stock=stock,
+            formato="fisico"
+        )
+
+    def crear_comprador(self, nombre, lineas):
+        usuario = Usuario.objects.create_user(
+            username=nombre,
+            email=f"{nombre}@example.com",
+            password="password123"
+        )
+        carrito = Carrito.objects.create(usuario=usuario)
+        for libro, cantidad in lineas:
+            ItemCarrito.objects.create(carrito=carrito, libro=libro, cantidad=cantidad)
+        return usuario, carrito
+
+    def test_pedido_con_varias_lineas_usa_operaciones_por_conjuntos(self, autor):
+        libros = [self.crear_libro(autor, stock=10) for _ in range(5)]
+        usuario, carrito = self.crear_comprador("comprador", [(libro, 2) for libro in libros])
+        resumen = calcular_resumen(carrito)
+
+        with CaptureQueriesContext(connection) as consultas:
+            pedido = crear_pedido(usuario, resumen, "Calle 1")
+
+        sql = [c['sql'] for c in consultas.captured_queries]
+        assert len([q for q in sql if q.startswith('INSERT INTO "pedidos_detallepedido"')]) == 1
+        assert len([q for q in sql if q.startswith('UPDATE "libros_libro"')]) == 1
+        assert pedido.total == Decimal('100.00')
+        assert DetallePedido.objects.filter(pedido=pedido).count() == 5
+        assert set(Libro.objects.values_list('stock', flat=True)) == {8}
+        assert not carrito.items.exists()
+
+    def test_compras_simultaneas_del_mismo_titulo_no_sobrevenden(self, autor):
+        libro = self.crear_libro(autor, stock=5)
+        primero = self.crear_comprador("primero", [(libro, 3)])
+        segundo = self.crear_comprador("segundo", [(libro, 3)])
+        # Ambos ven el carrito antes de que nadie compre
+        resumen_primero = calcular_resumen(primero[1])
+        resumen_segundo = calcular_resumen(segundo[1])
+
+        crear_pedido(primero[0], resumen_primero)
+        with pytest.raises(StockInsuficiente) as error:
+            crear_pedido(segundo[0], resumen_segundo)
+
+        assert error.value.titulo == libro.titulo
+        libro.refresh_from_db()
+        assert libro.stock == 2
+        assert Pedido.objects.count() == 1
+        # El carrito del que no pudo comprar se conserva
+        assert segundo[1].items.count() == 1
+
+    def test_descontar_stock_respeta_la_condicion(self, autor):
+        con_stock = self.crear_libro(autor, stock=5)
+        sin_stock = self.crear_libro(autor, stock=2)
+
+        actualizados = descontar_stock({con_stock.id: 3, sin_stock.id: 3})
+
+        assert actualizados == 1
+        con_stock.refresh_from_db()
+        sin_stock.refresh_from_db()
+        assert con_stock.stock == 2
+        assert sin_stock.stock == 2
+
+    def test_usa_el_precio_vigente_al_bloquear(self, autor):
+        libro = self.crear_libro(autor, stock=5, precio='10.00')
+        usuario, carrito = self.crear_comprador("comprador", [(libro, 2)])
+        resumen = calcular_resumen(carrito)
+        Libro.objects.filter(id=libro.id).update(precio=Decimal('12.00'))
+
+        pedido = crear_pedido(usuario, resumen)
+
+        assert pedido.total == Decimal('24.00')
+        assert pedido.detalles.get().precio_unitario == Decimal('12.00')
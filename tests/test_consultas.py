@@ -0,0 +1,117 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from usuarios.models import Usuario
+from libros.models import Libro, Autor, Categoria
+from carrito.models import Carrito, ItemCarrito
+from pedidos.models import Pedido, DetallePedido
+
+@pytest.mark.django_db
+class TestNumeroConsultasConstante:
+    """Las páginas deben costar las mismas consultas con pocas o muchas filas"""
+
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="password123",
+            is_superuser=True
+        )
+
+    @pytest.fixture
+    def client(self, usuario):
+        client = Client()
+        client.force_login(usuario)
+        return client
+
+    @pytest.fixture
+    def categoria(self):
+        return Categoria.objects.create(nombre="Novela")
+
+    def crear_libros(self, cantidad, categoria):
+        libros = []
+        for i in range(cantidad):
+            autor = Autor.objects.create(nombre=f"Autor {len(libros)} {Libro.objects.count()}")
+            libro = Libro.objects.create(
+                titulo=f"Libro {Libro.objects.count()}",
+                autor=autor,
+                descripcion="Descripción",
+                precio=Decimal('10.00'),
+                stock=50,
+                formato="fisico"
+            )
+            libro.categorias.add(categoria)
+            libros.append(libro)
+        return libros
+
+    def contar(self, client, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = client.get(url)
+        assert response.status_code == 200
+        return len(consultas.captured_queries)
+
+    def test_lista_libros(self, client, categoria):
+        self.crear_libros(2, categoria)
+        pocas = self.contar(client, reverse('lista_libros'))
+        self.crear_libros(6, categoria)
+        muchas = self.contar(client, reverse('lista_libros'))
+
+        assert pocas == muchas
+
+    def test_detalle_libro(self, client, categoria):
+        libro = self.crear_libros(2, categoria)[0]
+        pocas = self.contar(client, reverse('detalle_libro', args=[libro.id]))
+        otra = Categoria.objects.create(nombre="Clásicos")
+        libro.categorias.add(otra)
+        for relacionado in self.crear_libros(4, otra):
+            relacionado.categorias.add(categoria)
+        muchas = self.contar(client, reverse('detalle_libro', args=[libro.id]))
+
+        assert pocas == muchas
+
+    def test_carrito(self, client, usuario, categoria):
+        carrito = Carrito.objects.create(usuario=usuario)
+        for libro in self.crear_libros(1, categoria):
+            ItemCarrito.objects.create(carrito=carrito, libro=libro, cantidad=1)
+        pocas = self.contar(client, reverse('ver_carrito'))
+        for libro in self.crear_libros(5, categoria):
+            ItemCarrito.objects.create(carrito=carrito, libro=libro, cantidad=2)
+        muchas = self.contar(client, reverse('ver_carrito'))
+
+        assert pocas == muchas
+
+    def test_detalle_y_listado_de_pedidos(self, client, usuario, categoria):
+        def crear_pedido(lineas):
+            pedido = Pedido.objects.create(usuario=usuario, total=Decimal('10.00'))
+            for libro in self.crear_libros(lineas, categoria):
+                DetallePedido.objects.create(pedido=pedido, libro=libro, cantidad=1, precio_unitario=libro.precio)
+            return pedido
+
+        pedido = crear_pedido(1)
+        detalle_pocas = self.contar(client, reverse('detalle_pedido', args=[pedido.numero_orden]))
+        listado_pocas = self.contar(client, reverse('listar_pedidos'))
+        pedido = crear_pedido(5)
+        crear_pedido(3)
+        detalle_muchas = self.contar(client, reverse('detalle_pedido', args=[pedido.numero_orden]))
+        listado_muchas = self.contar(client, reverse('listar_pedidos'))
+
+        assert detalle_pocas == detalle_muchas
+        assert listado_pocas == listado_muchas
+
+    def test_historial_pedidos(self, client, usuario, categoria):
+        def crear_pedidos(cantidad, lineas):
+            for _ in range(cantidad):
+                pedido = Pedido.objects.create(usuario=usuario, total=Decimal('10.00'))
+                for libro in self.crear_libros(lineas, categoria):
+                    DetallePedido.objects.create(pedido=pedido, libro=libro, cantidad=1, precio_unitario=libro.precio)
+
+        crear_pedidos(1, 1)
+        pocas = self.contar(client, reverse('historial_pedidos'))
+        crear_pedidos(4, 3)
+        muchas = self.contar(client, reverse('historial_pedidos'))
+
+        assert pocas == muchas
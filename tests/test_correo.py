@@ -0,0 +1,94 @@
+import pytest
+from datetime import timedelta
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from pedidos.correo import encolar_correo, enviar_pendientes
+from pedidos.models import CorreoPendiente
+
+
+class ConexionQueFalla:
+    """Backend que no logra conectarse al servidor SMTP"""
+
+    def open(self):
+        raise ConnectionRefusedError("conexión rechazada")
+
+    def close(self):
+        pass
+
+
+@pytest.mark.django_db
+class TestBandejaCorreo:
+    def crear_correos(self, cantidad):
+        return [
+            CorreoPendiente.objects.create(destinatario=f"cliente{i}@example.com",
+                                           asunto=f"Asunto {i}", cuerpo="Cuerpo")
+            for i in range(cantidad)
+        ]
+
+    def test_encolar_espera_al_commit(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks() as callbacks:
+            encolar_correo("cliente@example.com", "Asunto", "Cuerpo")
+            assert not CorreoPendiente.objects.exists()
+
+        for callback in callbacks:
+            callback()
+        assert CorreoPendiente.objects.get().estado == 'pendiente'
+
+    def test_enviar_pendientes(self):
+        self.crear_correos(3)
+
+        enviados, fallidos = enviar_pendientes()
+
+        assert (enviados, fallidos) == (3, 0)
+        assert len(mail.outbox) == 3
+        assert mail.outbox[0].to == ["cliente0@example.com"]
+        assert CorreoPendiente.objects.filter(estado='enviado', fecha_envio__isnull=False).count() == 3
+        # Ya enviados: no se reenvían
+        assert enviar_pendientes() == (0, 0)
+
+    def test_respeta_el_tamano_del_lote(self):
+        self.crear_correos(5)
+
+        assert enviar_pendientes(tamano_lote=2) == (2, 0)
+        assert CorreoPendiente.objects.filter(estado='pendiente').count() == 3
+
+    def test_fallo_reintenta_con_espera(self):
+        correo = self.crear_correos(1)[0]
+
+        assert enviar_pendientes(conexion=ConexionQueFalla()) == (0, 1)
+
+        correo.refresh_from_db()
+        assert correo.estado == 'pendiente'
+        assert correo.intentos == 1
+        assert "rechazada" in correo.ultimo_error
+        assert correo.proximo_intento > timezone.now()
+        # Aún no toca reintentar
+        assert enviar_pendientes() == (0, 0)
+
+        CorreoPendiente.objects.update(proximo_intento=timezone.now() - timedelta(seconds=1))
+        assert enviar_pendientes() == (1, 0)
+        assert len(mail.outbox) == 1
+
+    def test_espera_crece_y_termina_en_fallido(self):
+        correo = self.crear_correos(1)[0]
+        esperas = []
+        for _ in range(3):
+            CorreoPendiente.objects.update(proximo_intento=timezone.now() - timedelta(seconds=1))
+            antes = timezone.now()
+            enviar_pendientes(max_intentos=3, conexion=ConexionQueFalla())
+            correo.refresh_from_db()
+            esperas.append(correo.proximo_intento - antes)
+
+        assert esperas[0] < esperas[1] < esperas[2]
+        assert correo.estado == 'fallido'
+        assert correo.intentos == 3
+
+    def test_comando_vacia_la_bandeja(self):
+        self.crear_correos(4)
+
+        call_command('enviar_correos', '--lote', '3')
+
+        assert len(mail.outbox) == 4
+        assert not CorreoPendiente.objects.filter(estado='pendiente').exists()
@@ -0,0 +1,195 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from usuarios.models import Usuario
+from libros.models import Autor, Libro
+from pedidos.estados import TransicionInvalida, cambiar_estado
+from pedidos.models import DetallePedido, HistorialEstadoPedido, Pedido
+
+@pytest.mark.django_db
+class TestCambioEstadoMasivo:
+    @pytest.fixture
+    def admin(self):
+        return Usuario.objects.create_user(username="admin", email="admin@example.com",
+                                           password="password123", is_superuser=True)
+
+    def crear_pedidos(self, usuario, estado, cantidad):
+        return [Pedido.objects.create(usuario=usuario, total=Decimal('10.00'), estado=estado)
+                for _ in range(cantidad)]
+
+    def test_mueve_solo_transiciones_validas(self, admin):
+        pendientes = self.crear_pedidos(admin, 'pendiente', 3)
+        entregado = self.crear_pedidos(admin, 'entregado', 1)[0]
+
+        resultado = cambiar_estado(Pedido.objects.all(), 'pagado', admin)
+
+        assert resultado.cambiados == 3
+        assert resultado.omitidos == 1
+        assert set(Pedido.objects.filter(estado='pagado').values_list('id', flat=True)) == {p.id for p in pendientes}
+        entregado.refresh_from_db()
+        assert entregado.estado == 'entregado'
+
+    def test_historial_de_solo_insercion(self, admin):
+        pedido = self.crear_pedidos(admin, 'pendiente', 1)[0]
+
+        for estado in ['pagado', 'enviado', 'entregado']:
+            cambiar_estado(Pedido.objects.filter(id=pedido.id), estado, admin)
+
+        historial = list(pedido.historial.order_by('id').values_list('estado_anterior', 'estado_nuevo'))
+        assert historial == [('pendiente', 'pagado'), ('pagado', 'enviado'), ('enviado', 'entregado')]
+        assert set(HistorialEstadoPedido.objects.values_list('usuario_id', flat=True)) == {admin.id}
+
+    def test_cancelar_desde_varios_estados(self, admin):
+        self.crear_pedidos(admin, 'pendiente', 2)
+        self.crear_pedidos(admin, 'pagado', 2)
+        self.crear_pedidos(admin, 'enviado', 1)
+
+        resultado = cambiar_estado(Pedido.objects.all(), 'cancelado')
+
+        assert resultado.cambiados == 4
+        assert resultado.omitidos == 1
+        assert Pedido.objects.get(estado='enviado')
+
+    def test_estado_desconocido(self, admin):
+        self.crear_pedidos(admin, 'pendiente', 1)
+
+        with pytest.raises(TransicionInvalida):
+            cambiar_estado(Pedido.objects.all(), 'perdido')
+
+    def test_consultas_constantes(self, admin):
+        self.crear_pedidos(admin, 'pendiente', 2)
+        with CaptureQueriesContext(connection) as pocas:
+            cambiar_estado(Pedido.objects.filter(estado='pendiente'), 'pagado')
+
+        self.crear_pedidos(admin, 'pendiente', 20)
+        with CaptureQueriesContext(connection) as muchas:
+            cambiar_estado(Pedido.objects.filter(estado='pendiente'), 'pagado')
+
+        assert len(pocas.captured_queries) == len(muchas.captured_queries)
+
+    def test_vista_aplica_a_los_marcados(self, client, admin):
+        marcados = self.crear_pedidos(admin, 'pagado', 2)
+        otro = self.crear_pedidos(admin, 'pagado', 1)[0]
+        client.force_login(admin)
+
+        response = client.post(reverse('actualizar_estados_pedidos'), {
+            'estado': 'enviado', 'alcance': 'seleccion', 'pedidos': [p.id for p in marcados],
+        })
+
+        assert response.status_code == 302
+        assert set(Pedido.objects.filter(estado='enviado').values_list('id', flat=True)) == {p.id for p in marcados}
+        otro.refresh_from_db()
+        assert otro.estado == 'pagado'
+
+    def test_vista_aplica_al_filtro(self, client, admin):
+        cliente = Usuario.objects.create_user(username="cliente", email="cliente@example.com", password="password123")
+        del_cliente = self.crear_pedidos(cliente, 'pendiente', 3)
+        self.crear_pedidos(admin, 'pendiente', 2)
+        client.force_login(admin)
+
+        client.post(reverse('actualizar_estados_pedidos'), {
+            'estado': 'pagado', 'alcance': 'filtro',
+            'filtro-estado': 'pendiente', 'filtro-email': 'cliente@example.com',
+        })
+
+        assert set(Pedido.objects.filter(estado='pagado').values_list('id', flat=True)) == {p.id for p in del_cliente}
+
+    def test_vista_rechaza_el_filtro_vacio(self, client, admin):
+        self.crear_pedidos(admin, 'pendiente', 2)
+        client.force_login(admin)
+
+        client.post(reverse('actualizar_estados_pedidos'), {'estado': 'pagado', 'alcance': 'filtro'})
+
+        assert not Pedido.objects.filter(estado='pagado').exists()
+
+    def test_una_sentencia_por_paso(self, admin):
+        self.crear_pedidos(admin, 'pendiente', 5)
+
+        with CaptureQueriesContext(connection) as consultas:
+            cambiar_estado(Pedido.objects.all(), 'pagado', admin)
+
+        sql = [c['sql'] for c in consultas.captured_queries]
+        assert len([q for q in sql if q.startswith('INSERT INTO "pedidos_historialestadopedido"')]) == 1
+        actualizacion = [q for q in sql if q.startswith('UPDATE "pedidos_pedido"')]
+        assert len(actualizacion) == 1 and 'SELECT' in actualizacion[0]
+        assert list(HistorialEstadoPedido.objects.values_list('estado_anterior', 'estado_nuevo').distinct()) == [
+            ('pendiente', 'pagado')]
+
+    def test_vista_individual_rechaza_transicion(self, client, admin):
+        pedido = self.crear_pedidos(admin, 'entregado', 1)[0]
+        client.force_login(admin)
+
+        client.post(reverse('actualizar_estado_pedido', args=[pedido.id]), {'estado': 'pendiente'})
+
+        pedido.refresh_from_db()
+        assert pedido.estado == 'entregado'
+        assert not HistorialEstadoPedido.objects.exists()
+
+
+@pytest.mark.django_db
+class TestReposicionAlCancelar:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(username="cliente", email="cliente@example.com", password="password123")
+
+    @pytest.fixture
+    def libros(self):
+        autor = Autor.objects.create(nombre="Autor")
+        return [Libro.objects.create(titulo=f"Libro {i}", autor=autor, descripcion="", precio=Decimal('10.00'),
+                                     stock=5, formato="fisico") for i in range(3)]
+
+    def crear_pedido(self, usuario, lineas, estado='pagado'):
+        pedido = Pedido.objects.create(usuario=usuario, total=Decimal('10.00'), estado=estado)
+        for libro, cantidad in lineas:
+            DetallePedido.objects.create(pedido=pedido, libro=libro, cantidad=cantidad, precio_unitario=libro.precio)
+        return pedido
+
+    def stock(self, libros):
+        return [Libro.objects.get(id=libro.id).stock for libro in libros]
+
+    def test_cancelar_repone_todas_las_lineas(self, usuario, libros):
+        a, b, c = libros
+        self.crear_pedido(usuario, [(a, 2), (b, 1)])
+        self.crear_pedido(usuario, [(a, 1), (c, 4)], estado='pendiente')
+
+        cambiar_estado(Pedido.objects.all(), 'cancelado')
+
+        assert self.stock(libros) == [8, 6, 9]
+
+    def test_cancelar_dos_veces_no_repone_dos_veces(self, usuario, libros):
+        pedido = self.crear_pedido(usuario, [(libros[0], 3)])
+
+        cambiar_estado(Pedido.objects.filter(id=pedido.id), 'cancelado')
+        resultado = cambiar_estado(Pedido.objects.filter(id=pedido.id), 'cancelado')
+
+        assert resultado.omitidos == 1
+        assert self.stock(libros)[0] == 8
+
+    def test_pedido_enviado_no_se_repone(self, usuario, libros):
+        self.crear_pedido(usuario, [(libros[0], 3)], estado='enviado')
+
+        cambiar_estado(Pedido.objects.all(), 'cancelado')
+
+        assert self.stock(libros)[0] == 5
+
+    def test_otros_estados_no_tocan_stock(self, usuario, libros):
+        self.crear_pedido(usuario, [(libros[0], 3)], estado='pendiente')
+
+        cambiar_estado(Pedido.objects.all(), 'pagado')
+
+        assert self.stock(libros)[0] == 5
+
+    def test_consultas_constantes(self, usuario, libros):
+        self.crear_pedido(usuario, [(libros[0], 1)])
+        with CaptureQueriesContext(connection) as pocas:
+            cambiar_estado(Pedido.objects.filter(estado='pagado'), 'cancelado')
+
+        for _ in range(10):
+            self.crear_pedido(usuario, [(libro, 1) for libro in libros])
+        with CaptureQueriesContext(connection) as muchas:
+            cambiar_estado(Pedido.objects.filter(estado='pagado'), 'cancelado')
+
+        assert len(pocas.captured_queries) == len(muchas.captured_queries)
+        assert self.stock(libros) == [16, 15, 15]
@@ -0,0 +1,96 @@
+import io
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from django.urls import reverse
+from usuarios.models import Usuario
+from libros.models import Autor, Libro
+from pedidos.models import DetallePedido, Pedido
+from reportes.exportacion import EXPORTACIONES, a_csv
+
+@pytest.mark.django_db
+class TestExportacion:
+    @pytest.fixture
+    def admin(self):
+        return Usuario.objects.create_user(username="admin", email="admin@example.com",
+                                           password="password123", is_superuser=True)
+
+    @pytest.fixture
+    def pedidos(self, admin):
+        autor = Autor.objects.create(nombre="Autor")
+        libro = Libro.objects.create(titulo="Libro, con coma", autor=autor, descripcion="",
+                                     precio=Decimal('12.50'), stock=100)
+        pedidos = []
+        for i in range(5):
+            pedido = Pedido.objects.create(usuario=admin, total=Decimal('25.00'))
+            DetallePedido.objects.create(pedido=pedido, libro=libro, cantidad=i + 1, precio_unitario=libro.precio)
+            pedidos.append(pedido)
+        return pedidos
+
+    def test_csv_por_bloques_con_una_cabecera(self, pedidos):
+        trozos = list(a_csv(EXPORTACIONES['detalles'], filas_por_bloque=2))
+
+        assert len(trozos) == 3
+        lineas = "".join(trozos).splitlines()
+        assert lineas[0] == "id,pedido_id,numero_orden,libro_id,titulo,cantidad,precio_unitario,subtotal"
+        assert len(lineas) == 6
+        assert lineas[1].endswith('"Libro, con coma",1,12.50,12.50')
+        assert lineas[5].endswith(",5,12.50,62.50")
+
+    def test_csv_vacio_solo_cabecera(self):
+        assert "".join(a_csv(EXPORTACIONES['cupones'])) == (
+            "id,codigo,descuento,fecha_inicio,fecha_expiracion,activo\n")
+
+    def test_comando_escribe_archivo(self, pedidos, tmp_path):
+        salida = tmp_path / "pedidos.csv"
+
+        call_command('exportar_datos', 'pedidos', '--salida', str(salida), '--bloque', '2')
+
+        lineas = salida.read_text(encoding='utf-8').splitlines()
+        assert lineas[0].startswith("id,numero_orden,cliente,")
+        assert [linea.split(',')[1] for linea in lineas[1:]] == [p.numero_orden for p in pedidos]
+
+    def test_parquet(self, pedidos, tmp_path):
+        pq = pytest.importorskip('pyarrow.parquet')
+        salida = tmp_path / "detalles.parquet"
+
+        call_command('exportar_datos', 'detalles', '--formato', 'parquet', '--salida', str(salida), '--bloque', '2')
+
+        archivo = pq.ParquetFile(salida)
+        assert archivo.num_row_groups == 3
+        tabla = archivo.read()
+        assert tabla.column('subtotal').to_pylist() == [Decimal('12.50') * n for n in range(1, 6)]
+        assert tabla.column('titulo').to_pylist()[0] == "Libro, con coma"
+
+    def test_vista_transmite_csv(self, client, admin, pedidos):
+        client.force_login(admin)
+
+        response = client.get(reverse('exportar_datos', args=['libros', 'csv']))
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert response['Content-Disposition'].startswith('attachment; filename="libros-')
+        contenido = b"".join(response.streaming_content).decode('utf-8')
+        assert contenido.splitlines()[1].startswith(f'{pedidos[0].detalles.get().libro_id},"Libro, con coma",')
+
+    def test_vista_parquet(self, client, admin, pedidos):
+        pq = pytest.importorskip('pyarrow.parquet')
+        client.force_login(admin)
+
+        response = client.get(reverse('exportar_datos', args=['pedidos', 'parquet']))
+
+        tabla = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+        assert tabla.num_rows == 5
+        assert tabla.column('cliente').to_pylist() == ["admin@example.com"] * 5
+
+    def test_vista_conjunto_desconocido(self, client, admin):
+        client.force_login(admin)
+
+        assert client.get(reverse('exportar_datos', args=['usuarios', 'csv'])).status_code == 404
+        assert client.get(reverse('exportar_datos', args=['pedidos', 'xlsx'])).status_code == 404
+
+    def test_vista_requiere_superusuario(self, client):
+        normal = Usuario.objects.create_user(username="cliente", email="cliente@example.com", password="password123")
+        client.force_login(normal)
+
+        assert client.get(reverse('exportar_datos', args=['pedidos', 'csv'])).status_code == 302
@@ -0,0 +1,232 @@
+import io
+import re
+import pytest
+from decimal import Decimal
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import Http404
+from django.urls import Resolver404, resolve, reverse
+from usuarios.models import Usuario
+from libros.almacenamiento import direccionado
+from libros.models import Autor, Categoria, Libro
+from libros.views import servir_medio
+
+def portada(nombre="portada.png", tamano=(800, 1200), modo='RGBA'):
+    salida = io.BytesIO()
+    Image.new(modo, tamano, (200, 30, 30, 255) if modo == 'RGBA' else (200, 30, 30)).save(salida, 'PNG')
+    return SimpleUploadedFile(nombre, salida.getvalue(), content_type='image/png')
+
+@pytest.mark.django_db
+class TestVariantesImagen:
+    @pytest.fixture(autouse=True)
+    def almacenamiento(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.IMAGENES_HILOS = 0
+        return tmp_path
+
+    @pytest.fixture
+    def autor(self):
+        return Autor.objects.create(nombre="Autor")
+
+    def crear_libro(self, autor, **kwargs):
+        return Libro.objects.create(titulo="Libro", autor=autor, descripcion="", precio=Decimal('10.00'),
+                                    stock=1, formato="fisico", **kwargs)
+
+    def test_genera_variantes_al_confirmar(self, autor, almacenamiento, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            libro = self.crear_libro(autor, imagen=portada())
+            assert libro.variantes_imagen == {}
+        assert len(callbacks) == 1
+
+        libro.refresh_from_db()
+        variantes = libro.variantes_imagen
+        assert variantes['origen'] == libro.imagen.name
+        assert [ancho for ancho, _ in variantes['tarjeta']['webp']] == [250, 500]
+        with Image.open(almacenamiento / variantes['tarjeta']['jpeg'][0][1]) as jpeg:
+            assert (jpeg.format, jpeg.size, jpeg.mode) == ('JPEG', (250, 280), 'RGB')
+        with Image.open(almacenamiento / variantes['detalle']['webp'][0][1]) as webp:
+            assert (webp.format, webp.size) == ('WEBP', (480, 720))
+        # Junto al original
+        assert variantes['miniatura']['webp'][0][1].startswith('libros/')
+
+    def test_sin_ampliar_portadas_pequenas(self, autor, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            libro = self.crear_libro(autor, imagen=portada(tamano=(300, 400), modo='RGB'))
+
+        libro.refresh_from_db()
+        assert [ancho for ancho, _ in libro.variantes_imagen['tarjeta']['jpeg']] == [250]
+        assert [ancho for ancho, _ in libro.variantes_imagen['detalle']['jpeg']] == [300]
+
+    def test_cambiar_portada_borra_variantes_anteriores(self, autor, almacenamiento, settings,
+                                                          django_capture_on_commit_callbacks):
+        # Con un almacenamiento que no comparte archivos entre libros
+        settings.STORAGES = {**settings.STORAGES,
+                             'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}}
+        with django_capture_on_commit_callbacks(execute=True):
+            libro = self.crear_libro(autor, imagen=portada("a.png"))
+        libro.refresh_from_db()
+        anterior = almacenamiento / libro.variantes_imagen['tarjeta']['webp'][0][1]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            libro.imagen = portada("b.png")
+            libro.save()
+        libro.refresh_from_db()
+        # Guardar sin cambiar la portada no vuelve a generar nada
+        with django_capture_on_commit_callbacks() as callbacks:
+            libro.stock = 5
+            libro.save()
+
+        assert libro.variantes_imagen['origen'] == "libros/b.png"
+        assert not anterior.exists()
+        assert callbacks == []
+
+    def test_vista_no_genera_en_la_peticion(self, client, autor, django_capture_on_commit_callbacks):
+        usuario = Usuario.objects.create_user(username="admin", email="admin@example.com", password="password123")
+        client.force_login(usuario)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = client.post(reverse('crear_libro'), {
+                'titulo': "Nuevo", 'autor': autor.id, 'descripcion': "Texto", 'precio': "9.99",
+                'stock': 1, 'formato': 'fisico', 'imagen': portada(),
+                'categorias': [Categoria.objects.create(nombre="Novela").id],
+            })
+
+        assert response.status_code == 302
+        assert len(callbacks) == 1
+        assert Libro.objects.get(titulo="Nuevo").variantes_imagen == {}
+
+    def test_comando_rellena_pendientes(self, autor):
+        libros = [self.crear_libro(autor, imagen=portada()) for _ in range(3)]
+        self.crear_libro(autor)
+
+        call_command('generar_variantes_imagen', '--hilos', '0')
+
+        for libro in libros:
+            libro.refresh_from_db()
+            assert libro.variantes_imagen['origen'] == libro.imagen.name
+
+    def test_plantillas_usan_srcset(self, client, autor, django_capture_on_commit_callbacks):
+        usuario = Usuario.objects.create_user(username="cliente", email="cliente@example.com", password="password123")
+        client.force_login(usuario)
+        pendiente = self.crear_libro(autor, imagen=portada())
+        with django_capture_on_commit_callbacks(execute=True):
+            libro = self.crear_libro(autor, imagen=portada())
+
+        catalogo = client.get(reverse('lista_libros')).content.decode()
+        detalle = client.get(reverse('detalle_libro', args=[libro.id])).content.decode()
+
+        assert 'type="image/webp"' in catalogo
+        assert re.search(r'srcset="/media/libros/[^" ]+\.webp 250w, [^" ]+\.webp 500w"', catalogo)
+        assert re.search(r'srcset="/media/libros/[^" ]+\.jpg 250w, [^" ]+\.jpg 500w"', catalogo)
+        # Mientras no hay variantes se sirve el original
+        assert f'src="{pendiente.imagen.url}"' in catalogo
+        assert re.search(r'srcset="/media/libros/[^" ]+\.webp 480w"', detalle)
+
+@pytest.mark.django_db
+class TestAlmacenamientoContenido:
+    @pytest.fixture(autouse=True)
+    def almacenamiento(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.IMAGENES_HILOS = 0
+        return tmp_path
+
+    @pytest.fixture
+    def autor(self):
+        return Autor.objects.create(nombre="Autor")
+
+    def crear_libro(self, autor, **kwargs):
+        return Libro.objects.create(titulo="Libro", autor=autor, descripcion="", precio=Decimal('10.00'),
+                                    stock=1, formato="fisico", **kwargs)
+
+    def test_nombre_por_contenido_sin_duplicados(self, autor, almacenamiento):
+        uno = self.crear_libro(autor, imagen=portada("Portada.PNG"))
+        dos = self.crear_libro(autor, imagen=portada("otra.png"))
+        distinta = self.crear_libro(autor, imagen=portada("x.png", tamano=(10, 10)))
+
+        assert uno.imagen.name == dos.imagen.name
+        assert distinta.imagen.name != uno.imagen.name
+        assert direccionado(uno.imagen.name)
+        partes = uno.imagen.name.split('/')
+        assert partes[0] == 'libros' and partes[3].startswith(partes[1] + partes[2]) and partes[3].endswith('.png')
+        assert len([f for f in almacenamiento.rglob('*.png')]) == 2
+
+    def test_variantes_compartidas_no_se_borran(self, autor, almacenamiento, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            uno = self.crear_libro(autor, imagen=portada())
+            dos = self.crear_libro(autor, imagen=portada())
+        with django_capture_on_commit_callbacks(execute=True):
+            uno.imagen = portada("nueva.png", tamano=(600, 900))
+            uno.save()
+
+        dos.refresh_from_db()
+        assert (almacenamiento / dos.variantes_imagen['tarjeta']['webp'][0][1]).exists()
+        assert direccionado(dos.variantes_imagen['tarjeta']['webp'][0][1])
+
+    def test_servir_con_cache_inmutable(self, rf, autor):
+        libro = self.crear_libro(autor, imagen=portada())
+
+        response = servir_medio(rf.get(libro.imagen.url), libro.imagen.name)
+
+        assert response.status_code == 200
+        assert response['Cache-Control'] == 'public, max-age=31536000, immutable'
+        with pytest.raises(Http404):
+            servir_medio(rf.get('/'), 'libros/no-existe.png')
+
+    def test_sin_debug_no_se_sirven_medios(self, client, autor):
+        libro = self.crear_libro(autor, imagen=portada())
+
+        with pytest.raises(Resolver404):
+            resolve(libro.imagen.url)
+        assert client.get(libro.imagen.url).status_code == 404
+
+    def test_subidas_simultaneas_del_mismo_contenido(self, almacenamiento):
+        datos = portada().read()
+        contenido = ContentFile(datos)
+        nombre = default_storage.nombre_por_contenido('libros/portada.png', contenido)
+
+        # Lo que hacen dos save() que comprobaron exists() antes de que ninguno escribiera
+        guardados = [default_storage._save(default_storage.get_available_name(nombre), contenido)
+                     for _ in range(2)]
+
+        assert guardados == [nombre, nombre]
+        archivos = [ruta for ruta in almacenamiento.rglob('*') if ruta.is_file()]
+        assert [ruta.read_bytes() for ruta in archivos] == [datos]
+
+    def test_permisos_de_los_archivos_guardados(self, almacenamiento, settings):
+        import stat
+        settings.FILE_UPLOAD_PERMISSIONS = 0o640
+
+        nombre = default_storage.save('libros/portada.png', ContentFile(portada().read()))
+
+        assert stat.S_IMODE((almacenamiento / nombre).stat().st_mode) == 0o640
+
+    def test_reubicar_archivos_existentes(self, autor, almacenamiento, settings):
+        antiguos = almacenamiento / 'libros'
+        antiguos.mkdir()
+        for nombre in ('a.png', 'b.png', 'a.tarjeta-250w.webp'):
+            (antiguos / nombre).write_bytes(portada().read() if nombre.endswith('png') else b'webp')
+        a = self.crear_libro(autor)
+        b = self.crear_libro(autor)
+        roto = self.crear_libro(autor)
+        Libro.objects.filter(id=a.id).update(imagen='libros/a.png', variantes_imagen={
+            'origen': 'libros/a.png', 'tarjeta': {'webp': [[250, 'libros/a.tarjeta-250w.webp']], 'jpeg': []}})
+        Libro.objects.filter(id=b.id).update(imagen='libros/b.png')
+        Libro.objects.filter(id=roto.id).update(imagen='libros/no-existe.png')
+
+        call_command('reubicar_imagenes', '--lote', '2')
+
+        a.refresh_from_db()
+        b.refresh_from_db()
+        assert a.imagen.name == b.imagen.name
+        assert direccionado(a.imagen.name)
+        assert a.variantes_imagen['origen'] == a.imagen.name
+        assert direccionado(a.variantes_imagen['tarjeta']['webp'][0][1])
+        assert not (antiguos / 'a.png').exists()
+        assert not (antiguos / 'a.tarjeta-250w.webp').exists()
+        assert Libro.objects.get(id=roto.id).imagen.name == 'libros/no-existe.png'
+        # Una segunda pasada no tiene nada que mover
+        call_command('reubicar_imagenes')
+        assert Libro.objects.get(id=a.id).imagen.name == a.imagen.name
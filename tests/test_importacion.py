@@ -0,0 +1,123 @@
+import json
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from libros.busqueda import buscar
+from libros.importacion import ImportadorCatalogo, leer_csv
+from libros.models import Autor, Categoria, Libro, LibroRelacionado
+
+CSV = """titulo,autor,categorias,descripcion,precio,stock,formato,fecha_publicacion
+Rayuela,Julio Cortázar,Novela|Clásicos,Una novela,19.90,5,fisico,1963-06-28
+Bestiario,Julio Cortázar,Cuentos,,9.50,2,digital,
+Sin precio,Autor,Novela,,caro,1,fisico,
+Ficciones,Jorge Luis Borges,Cuentos|Clásicos,Relatos,12.00,0,,1944-01-01
+"""
+
+@pytest.mark.django_db
+class TestImportacionCatalogo:
+    def test_importa_csv(self, tmp_path, capsys):
+        archivo = tmp_path / "catalogo.csv"
+        archivo.write_text(CSV, encoding='utf-8')
+        Autor.objects.create(nombre="Julio Cortázar")
+
+        call_command('importar_catalogo', str(archivo))
+
+        assert Libro.objects.count() == 3
+        assert Autor.objects.filter(nombre="Julio Cortázar").count() == 1
+        rayuela = Libro.objects.get(titulo="Rayuela")
+        assert rayuela.precio == Decimal('19.90')
+        assert rayuela.fecha_publicacion.year == 1963
+        assert sorted(rayuela.categorias.values_list('nombre', flat=True)) == ["Clásicos", "Novela"]
+        assert Libro.objects.get(titulo="Ficciones").formato == "fisico"
+        assert Categoria.objects.filter(nombre="Cuentos").count() == 1
+        # Índice de búsqueda y relacionados, aunque bulk_create no envíe señales
+        assert list(buscar(Libro.objects.all(), "borges").values_list('titulo', flat=True)) == ["Ficciones"]
+        assert LibroRelacionado.objects.filter(libro=rayuela).exists()
+
+        salida = capsys.readouterr()
+        assert "3 libros importados" in salida.out
+        assert "1 filas descartadas" in salida.out
+        assert "Línea 4: Precio no válido" in salida.err
+
+    def test_importa_jsonl(self, tmp_path):
+        archivo = tmp_path / "catalogo.jsonl"
+        filas = [
+            {"titulo": "Uno", "autor": "A", "categorias": ["X", "Y"], "precio": "1.00", "stock": 3},
+            {"titulo": "Dos", "autor": "A", "categorias": "Y", "precio": 2, "formato": "digital"},
+        ]
+        archivo.write_text("\n".join(json.dumps(f) for f in filas) + "\n\n{roto\n", encoding='utf-8')
+
+        call_command('importar_catalogo', str(archivo), '--sin-relacionados')
+
+        assert list(Libro.objects.order_by('titulo').values_list('titulo', 'stock', 'formato')) == [
+            ("Dos", 0, "digital"), ("Uno", 3, "fisico")]
+        assert Libro.categorias.through.objects.count() == 3
+        assert not LibroRelacionado.objects.exists()
+
+    def test_consultas_por_lote_constantes(self, tmp_path):
+        lineas = ["titulo,autor,categorias,precio"]
+        lineas += [f"Libro {i},Autor {i % 7},Cat A{i % 3}|Cat B{i % 5},10.00" for i in range(200)]
+        archivo = tmp_path / "grande.csv"
+        archivo.write_text("\n".join(lineas), encoding='utf-8')
+
+        with open(archivo, encoding='utf-8', newline='') as f, CaptureQueriesContext(connection) as consultas:
+            resultado = ImportadorCatalogo(tamano_lote=50).importar(leer_csv(f))
+
+        assert resultado.creados == 200
+        assert Libro.categorias.through.objects.count() == 400
+        # Un número de consultas por lote que no crece con las filas
+        assert len(consultas) < 4 * 12
+
+    def escribir(self, ruta, filas):
+        cabecera = "referencia,titulo,autor,categorias,descripcion,precio,stock"
+        ruta.write_text("\n".join([cabecera, *filas]) + "\n", encoding='utf-8')
+        return str(ruta)
+
+    def test_referencia_repetida_sin_sincronizar(self, tmp_path, capsys):
+        archivo = self.escribir(tmp_path / "a.csv", ["R1,Uno,A,X,,1.00,1", "R1,Otra vez,A,X,,1.00,1"])
+
+        call_command('importar_catalogo', archivo, '--sin-relacionados')
+        call_command('importar_catalogo', archivo, '--sin-relacionados')
+
+        assert list(Libro.objects.values_list('titulo', flat=True)) == ["Uno"]
+        assert "La referencia 'R1' ya existe." in capsys.readouterr().err
+
+    def test_sincronizar_aplica_solo_diferencias(self, tmp_path):
+        filas = [f"R{i},Libro {i},Autor,Novela|Cuentos,Texto,10.00,5" for i in range(20)]
+        call_command('importar_catalogo', self.escribir(tmp_path / "dia1.csv", filas), '--sin-relacionados')
+        cambiado = Libro.objects.get(referencia="R3")
+        relaciones = dict(Libro.categorias.through.objects.filter(libro=cambiado)
+                          .values_list('categoria__nombre', 'id'))
+        Libro.objects.filter(referencia="R7").update(titulo="Título de la tienda")
+
+        filas[3] = "R3,Libro 3 renombrado,Autor,Novela|Ensayo,Texto nuevo,12.5,5"
+        filas.append("R20,Nuevo,Autor,Ensayo,,3.00,1")
+        archivo = self.escribir(tmp_path / "dia2.csv", filas)
+        with open(archivo, encoding='utf-8', newline='') as f, CaptureQueriesContext(connection) as consultas:
+            resultado = ImportadorCatalogo(sincronizar=True).importar(leer_csv(f))
+
+        assert resultado == (1, 1, 19, 0)
+        cambiado.refresh_from_db()
+        assert (cambiado.titulo, cambiado.precio, cambiado.stock, cambiado.descripcion) == (
+            "Libro 3", Decimal('12.50'), 5, "Texto nuevo")
+        # Se conserva la relación con Novela, se quita Cuentos y se añade Ensayo
+        nuevas = dict(Libro.categorias.through.objects.filter(libro=cambiado)
+                      .values_list('categoria__nombre', 'id'))
+        assert nuevas.keys() == {"Novela", "Ensayo"}
+        assert nuevas["Novela"] == relaciones["Novela"]
+        assert Libro.objects.get(referencia="R7").titulo == "Título de la tienda"
+        assert list(buscar(Libro.objects.all(), "texto nuevo").values_list('referencia', flat=True)) == ["R3"]
+        # Las filas sin cambios no se leen ni se escriben una a una
+        updates = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('UPDATE "libros_libro"')]
+        assert len(updates) == 1
+        assert '"titulo"' not in updates[0]
+
+    def test_sincronizar_exige_referencia(self, tmp_path, capsys):
+        archivo = self.escribir(tmp_path / "a.csv", [",Sin referencia,A,X,,1.00,1"])
+
+        call_command('importar_catalogo', archivo, '--sincronizar')
+
+        assert not Libro.objects.exists()
+        assert "Falta 'referencia'." in capsys.readouterr().err
@@ -0,0 +1,134 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from usuarios.models import Usuario
+from libros.models import Libro, Autor, Categoria
+from libros.paginacion import PaginadorCursor
+from libros.views import ORDENES_CATALOGO
+
+@pytest.mark.django_db
+class TestPaginacionCatalogo:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(
+            username="lector",
+            email="lector@example.com",
+            password="password123"
+        )
+
+    @pytest.fixture
+    def categoria(self):
+        return Categoria.objects.create(nombre="Novela")
+
+    @pytest.fixture
+    def libros(self, categoria):
+        autor = Autor.objects.create(nombre="Autor Test")
+        libros = []
+        for i in range(7):
+            libro = Libro.objects.create(
+                titulo=f"Libro {i % 3}",
+                autor=autor,
+                descripcion="Descripción",
+                precio=Decimal('10.00') + i % 2,
+                stock=5,
+                formato="fisico" if i % 2 else "digital",
+                # Algunos libros sin fecha para probar los nulos
+                fecha_publicacion=date(2020, 1, i + 1) if i % 3 else None,
+            )
+            if i < 4:
+                libro.categorias.add(categoria)
+            libros.append(libro)
+        return libros
+
+    def recorrer(self, queryset, orden, por_pagina=2):
+        paginador = PaginadorCursor(queryset, orden, por_pagina=por_pagina)
+        vistos = []
+        pagina = paginador.pagina()
+        paginas = [pagina]
+        while True:
+            vistos.extend(libro.id for libro in pagina)
+            if not pagina.siguiente:
+                break
+            pagina = paginador.pagina(pagina.siguiente)
+            paginas.append(pagina)
+        return vistos, paginas
+
+    @pytest.mark.parametrize('orden', ['titulo', 'precio', 'fecha', 'recientes'])
+    def test_recorrido_completo_sin_repetidos(self, libros, orden):
+        campos = ORDENES_CATALOGO[orden]
+        esperado = list(
+            Libro.objects.order_by(*[
+                ('-' if desc else '') + campo for campo, desc in campos
+            ]).values_list('id', flat=True)
+        )
+        vistos, _ = self.recorrer(Libro.objects.all(), campos)
+
+        assert sorted(vistos) == sorted(esperado)
+        assert len(vistos) == len(set(vistos))
+        if orden != 'fecha':
+            assert vistos == esperado
+
+    def test_fecha_nulos_al_final(self, libros):
+        vistos, _ = self.recorrer(Libro.objects.all(), ORDENES_CATALOGO['fecha'])
+        fechas = [Libro.objects.get(id=i).fecha_publicacion for i in vistos]
+
+        sin_fecha = [f for f in fechas if f is None]
+        assert fechas[-len(sin_fecha):] == sin_fecha
+        con_fecha = fechas[:-len(sin_fecha)]
+        assert con_fecha == sorted(con_fecha, reverse=True)
+
+    def test_volver_a_pagina_anterior(self, libros):
+        paginador = PaginadorCursor(Libro.objects.all(), ORDENES_CATALOGO['titulo'], por_pagina=3)
+        primera = paginador.pagina()
+        segunda = paginador.pagina(primera.siguiente)
+
+        assert primera.anterior is None
+        assert segunda.anterior is not None
+        vuelta = paginador.pagina(segunda.anterior)
+        assert [l.id for l in vuelta] == [l.id for l in primera]
+        assert vuelta.anterior is None
+        assert vuelta.siguiente is not None
+
+    def test_cursor_invalido_vuelve_al_inicio(self, libros):
+        paginador = PaginadorCursor(Libro.objects.all(), ORDENES_CATALOGO['precio'], por_pagina=3)
+
+        assert [l.id for l in paginador.pagina('no-es-un-cursor')] == [l.id for l in paginador.pagina()]
+
+    def test_vista_con_filtros_sin_offset_ni_count(self, usuario, libros, categoria):
+        client = Client()
+        client.force_login(usuario)
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = client.get(reverse('lista_libros'), {
+                'categoria': categoria.id,
+                'formato': 'digital',
+                'orden': 'precio',
+            })
+
+        assert response.status_code == 200
+        ids = [libro.id for libro in response.context['libros']]
+        assert ids == list(
+            Libro.objects.filter(categorias=categoria, formato='digital')
+            .order_by('precio', 'id').values_list('id', flat=True)
+        )
+        sql = ' '.join(c['sql'].upper() for c in consultas.captured_queries)
+        assert 'OFFSET' not in sql
+        assert 'COUNT(' not in sql
+
+    def test_vista_pagina_siguiente(self, usuario, libros):
+        client = Client()
+        client.force_login(usuario)
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr('libros.views.LIBROS_POR_PAGINA', 5)
+            primera = client.get(reverse('lista_libros'), {'orden': 'recientes'})
+            pagina = primera.context['pagina']
+            segunda = client.get(reverse('lista_libros'), {'orden': 'recientes', 'cursor': pagina.siguiente})
+
+        assert len(pagina) == 5
+        assert [l.id for l in segunda.context['libros']] == [libros[1].id, libros[0].id]
+        assert segunda.context['pagina'].siguiente is None
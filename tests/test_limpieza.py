@@ -0,0 +1,100 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from usuarios.models import Usuario
+from libros.models import Libro, Autor
+from carrito.models import Carrito, ItemCarrito
+from carrito.limpieza import compactar, purgar_carritos, purgar_sesiones
+from carrito.operaciones import sumar_al_carrito
+
+@pytest.mark.django_db
+class TestPurga:
+    @pytest.fixture
+    def libro(self):
+        autor = Autor.objects.create(nombre="Autor Test")
+        return Libro.objects.create(titulo="Libro", autor=autor, descripcion="",
+                                    precio=Decimal('10.00'), stock=50, formato="fisico")
+
+    def crear_carrito(self, nombre, libro, dias):
+        usuario = Usuario.objects.create_user(username=nombre, email=f"{nombre}@example.com",
+                                              password="password123")
+        carrito = Carrito.objects.create(usuario=usuario)
+        sumar_al_carrito(carrito.id, libro.id, 2)
+        Carrito.objects.filter(id=carrito.id).update(actualizado=timezone.now() - timedelta(days=dias))
+        return carrito
+
+    def test_borra_los_abandonados_por_lotes(self, libro):
+        abandonados = [self.crear_carrito(f"viejo{i}", libro, dias=40) for i in range(5)]
+        reciente = self.crear_carrito("reciente", libro, dias=2)
+
+        resultado = purgar_carritos(30, lote=2)
+
+        assert resultado.filas == {'carrito_itemcarrito': 5, 'carrito_carrito': 5}
+        assert list(Carrito.objects.values_list('id', flat=True)) == [reciente.id]
+        assert not ItemCarrito.objects.filter(carrito__in=abandonados).exists()
+        # Sus reservas vuelven al stock
+        assert Libro.objects.get(id=libro.id).reservado == 2
+
+    def test_actividad_durante_la_purga(self, libro):
+        from unittest import mock
+        from carrito import limpieza
+        carrito = self.crear_carrito("comprador", libro, dias=40)
+        bloquear = limpieza.bloquear_libros
+
+        def usar_entre_medias(libro_ids):
+            # Otra petición añade al carrito tras elegir el lote y antes de bloquearlo
+            sumar_al_carrito(carrito.id, libro.id, 1)
+            Carrito.objects.filter(id=carrito.id).update(actualizado=timezone.now())
+            bloquear(libro_ids)
+
+        with mock.patch.object(limpieza, 'bloquear_libros', usar_entre_medias):
+            resultado = purgar_carritos(30)
+
+        assert resultado.filas == {'carrito_itemcarrito': 0, 'carrito_carrito': 0}
+        assert carrito.items.get().reservada == 3
+        assert Libro.objects.get(id=libro.id).reservado == 3
+
+    def test_la_actividad_renueva_el_carrito(self, client, libro):
+        carrito = self.crear_carrito("comprador", libro, dias=40)
+        client.force_login(carrito.usuario)
+
+        client.get(reverse('agregar_al_carrito', args=[libro.id]))
+
+        assert purgar_carritos(30).filas == {}
+        assert Carrito.objects.get(id=carrito.id).actualizado > timezone.now() - timedelta(minutes=1)
+
+    def test_sesiones_caducadas(self):
+        for caducada in (True, True, False):
+            sesion = SessionStore()
+            sesion.set_expiry(-60 if caducada else 3600)
+            sesion.create()
+
+        resultado = purgar_sesiones(lote=1)
+
+        assert resultado.filas == {'django_session': 2}
+        assert Session.objects.count() == 1
+
+    def test_sin_sesiones_en_la_base_de_datos(self, settings):
+        settings.SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+        assert purgar_sesiones() is None
+
+    def test_compactar_dentro_de_una_transaccion_no_hace_nada(self):
+        assert compactar(['carrito_carrito']) == []
+
+    def test_comando(self, libro):
+        self.crear_carrito("viejo", libro, dias=40)
+        salida = StringIO()
+
+        call_command('purgar_carritos', '--dias', '30', '--pausa', '0', '--compactar', stdout=salida)
+
+        texto = salida.getvalue()
+        assert "carrito_carrito: 1 filas borradas" in texto
+        assert "filas/s" in texto
+        assert "Tablas compactadas: ninguna" in texto
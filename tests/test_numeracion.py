@@ -0,0 +1,66 @@
+import pytest
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from usuarios.models import Usuario
+from pedidos.models import ContadorNumeroOrden, Pedido
+from pedidos.numeracion import ALFABETO, GeneradorSecuencial, base32_crockford
+
+
+class TestBase32Crockford:
+    def test_ancho_fijo_y_orden(self):
+        numeros = [0, 1, 31, 32, 1_000, 10 ** 9, 32 ** 10 - 1]
+        codigos = [base32_crockford(n) for n in numeros]
+
+        assert all(len(codigo) == 10 for codigo in codigos)
+        assert codigos == sorted(codigos)
+        assert codigos[0] == "0000000000"
+        assert codigos[-1] == "ZZZZZZZZZZ"
+
+    def test_sin_caracteres_ambiguos(self):
+        assert not set("ILOU") & set(ALFABETO)
+
+    def test_fuera_de_rango(self):
+        with pytest.raises(ValueError):
+            base32_crockford(32 ** 10)
+
+
+@pytest.mark.django_db
+class TestGeneradorSecuencial:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create(username="testuser", email="test@example.com")
+
+    def test_numeros_crecientes_sin_repetir(self, usuario):
+        pedidos = [Pedido.objects.create(usuario=usuario, total=Decimal('10.00')) for _ in range(20)]
+        numeros = [pedido.numero_orden for pedido in pedidos]
+
+        assert numeros == sorted(numeros)
+        assert len(set(numeros)) == 20
+        assert all(len(numero) == 10 and set(numero) <= set(ALFABETO) for numero in numeros)
+
+    def test_rollback_no_deja_huecos_repetidos(self, usuario):
+        generador = GeneradorSecuencial()
+        antes = generador.siguiente_valor()
+        with pytest.raises(IntegrityError):
+            with transaction.atomic():
+                generador.siguiente_valor()
+                raise IntegrityError("el pedido falló")
+
+        # El número tomado dentro de la transacción deshecha vuelve a estar libre
+        assert generador.siguiente_valor() == antes + 1
+
+    def test_reserva_bloques_fuera_de_transaccion(self, usuario, monkeypatch):
+        generador = GeneradorSecuencial()
+        monkeypatch.setattr('pedidos.numeracion.connection.in_atomic_block', False)
+
+        valores = [generador.siguiente_valor() for _ in range(3)]
+
+        assert valores == [valores[0], valores[0] + 1, valores[0] + 2]
+        assert ContadorNumeroOrden.objects.get().valor == valores[0] + generador.tamano_bloque
+
+    def test_se_elige_por_ajuste(self, usuario, settings):
+        settings.NUMERO_ORDEN_GENERADOR = 'pedidos.numeracion.GeneradorUUID'
+
+        pedido = Pedido.objects.create(usuario=usuario, total=Decimal('10.00'))
+
+        assert pedido.numero_orden[8] == '-'
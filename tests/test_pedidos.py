@@ -115,8 +115,9 @@ class TestPedido:
         assert pedido.total == Decimal('80.00')
     
     @patch('uuid.uuid4')
-    def test_generacion_numero_orden(self, mock_uuid, usuario):
-        """Test para verificar que se genera un número de orden único"""
+    def test_generacion_numero_orden(self, mock_uuid, usuario, settings):
+        """Test para verificar el generador original basado en uuid4"""
+        settings.NUMERO_ORDEN_GENERADOR = 'pedidos.numeracion.GeneradorUUID'
         mock_uuid.return_value = "123e4567-e89b-12d3-a456-426614174000"
         
         pedido = Pedido.objects.create(
@@ -1,5 +1,6 @@
 import pytest
 from django.urls import reverse
+from django.core.management import call_command
 from django.test import RequestFactory
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.contrib.auth.models import AnonymousUser
@@ -7,9 +8,11 @@ from django.contrib.messages import get_messages
 from decimal import Decimal
 from unittest.mock import patch, MagicMock
 from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from datetime import timedelta
 
-from pedidos.models import Pedido, DetallePedido, Cupon
+from pedidos.models import Pedido, DetallePedido, Cupon, CorreoPendiente, ClaveIdempotencia
 from pedidos.views import confirmar_pedido, procesar_pedido, historial_pedidos, detalle_pedido, listar_pedidos, actualizar_estado_pedido
 from carrito.models import Carrito, ItemCarrito
 from usuarios.models import Usuario
@@ -118,8 +121,7 @@ class TestVistasPedidos:
         # Aquí podrías verificar el contenido de la respuesta en lugar de context_data
         assert 'carrito' in response.content.decode()  # O cualquier otra verificación que sea relevante
 
-    @patch('pedidos.views.enviarCorreo')
-    def test_procesar_pedido_exitoso(self, mock_enviar_correo, factory, usuario, libro, carrito_con_items):
+    def test_procesar_pedido_exitoso(self, factory, usuario, libro, carrito_con_items, django_capture_on_commit_callbacks):
         """Test para procesar_pedido exitoso"""
         # Configurar request
         request = factory.post(reverse('procesar_pedido'), {'direccion': 'Calle Prueba 123'})
@@ -127,7 +129,8 @@ class TestVistasPedidos:
         
         # Mockear métodos del carrito
         with patch('carrito.models.Carrito.obtener_total', return_value=Decimal('51.98')):
-            response = procesar_pedido(request)
+            with django_capture_on_commit_callbacks(execute=True):
+                response = procesar_pedido(request)
         
         # Verificar resultados
         assert response.status_code == 302
@@ -149,8 +152,10 @@ class TestVistasPedidos:
         libro.refresh_from_db()
         assert libro.stock == 8
         
-        # Verificar que se envió el correo
-        mock_enviar_correo.assert_called_once()
+        # Verificar que el correo quedó en la bandeja de salida
+        correo = CorreoPendiente.objects.get()
+        assert correo.destinatario == usuario.email
+        assert pedido.numero_orden in correo.asunto
         
         # Verificar mensajes
         messages = list(get_messages(request))
@@ -230,4 +235,201 @@ class TestVistasPedidos:
         # Verificar mensajes
         messages = list(get_messages(request))
         assert len(messages) == 1
-        assert f"Estado del pedido #{pedido.numero_orden} actualizado a pagado" in str(messages[0])
\ No newline at end of file
+        assert f"Estado del pedido #{pedido.numero_orden} actualizado a pagado" in str(messages[0])
+
+
+@pytest.mark.django_db
+class TestHistorialPaginado:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(username="comprador", email="comprador@example.com", password="password123")
+
+    def test_recorre_el_historial_por_paginas(self, client, usuario, monkeypatch):
+        monkeypatch.setattr('pedidos.views.PEDIDOS_POR_PAGINA', 2)
+        otro = Usuario.objects.create_user(username="otro", email="otro@example.com", password="password123")
+        Pedido.objects.create(usuario=otro, total=Decimal('1.00'))
+        pedidos = [Pedido.objects.create(usuario=usuario, total=Decimal('10.00')) for _ in range(5)]
+        esperados = [p.numero_orden for p in sorted(pedidos, key=lambda p: (p.fecha_creacion, p.id), reverse=True)]
+        client.force_login(usuario)
+
+        vistos = []
+        cursor = None
+        while True:
+            response = client.get(reverse('historial_pedidos'), {'cursor': cursor} if cursor else {})
+            pagina = response.context['pagina']
+            vistos.extend(p.numero_orden for p in pagina)
+            cursor = pagina.siguiente
+            if not cursor:
+                break
+
+        assert vistos == esperados
+
+        anterior = client.get(reverse('historial_pedidos'), {'cursor': pagina.anterior}).context['pagina']
+        assert [p.numero_orden for p in anterior] == esperados[2:4]
+
+
+@pytest.mark.django_db
+class TestConsolaPedidos:
+    @pytest.fixture
+    def admin(self):
+        return Usuario.objects.create_user(username="admin", email="admin@example.com",
+                                           password="password123", is_superuser=True)
+
+    @pytest.fixture
+    def cliente(self):
+        return Usuario.objects.create_user(username="cliente", email="cliente@example.com", password="password123")
+
+    @pytest.fixture
+    def cupon(self):
+        return Cupon.objects.create(codigo="VERANO", descuento=10, fecha_inicio=timezone.now(),
+                                    fecha_expiracion=timezone.now() + timedelta(days=30))
+
+    def listar(self, client, admin, **filtros):
+        client.force_login(admin)
+        response = client.get(reverse('listar_pedidos'), filtros)
+        assert response.status_code == 200
+        return response.context['pagina']
+
+    def test_filtros(self, client, admin, cliente, cupon):
+        pagado = Pedido.objects.create(usuario=cliente, total=Decimal('10.00'), estado='pagado')
+        con_cupon = Pedido.objects.create(usuario=cliente, total=Decimal('20.00'), cupon=cupon)
+        del_admin = Pedido.objects.create(usuario=admin, total=Decimal('30.00'))
+        antiguo = Pedido.objects.create(usuario=admin, total=Decimal('40.00'))
+        Pedido.objects.filter(id=antiguo.id).update(fecha_creacion=timezone.now() - timedelta(days=10))
+        hoy = timezone.localdate()
+
+        def numeros(pagina):
+            return {p.numero_orden for p in pagina}
+
+        assert numeros(self.listar(client, admin, estado='pagado')) == {pagado.numero_orden}
+        assert numeros(self.listar(client, admin, cupon='VERANO')) == {con_cupon.numero_orden}
+        assert numeros(self.listar(client, admin, email='admin@example.com')) == {del_admin.numero_orden, antiguo.numero_orden}
+        assert numeros(self.listar(client, admin, desde=hoy.isoformat())) == {
+            pagado.numero_orden, con_cupon.numero_orden, del_admin.numero_orden}
+        assert numeros(self.listar(client, admin, hasta=(hoy - timedelta(days=5)).isoformat())) == {antiguo.numero_orden}
+
+    def test_rango_invalido_no_filtra(self, client, admin, cliente):
+        Pedido.objects.create(usuario=cliente, total=Decimal('10.00'))
+        hoy = timezone.localdate()
+
+        client.force_login(admin)
+        response = client.get(reverse('listar_pedidos'), {'desde': hoy.isoformat(),
+                                                          'hasta': (hoy - timedelta(days=1)).isoformat()})
+
+        assert len(response.context['pagina']) == 1
+        assert response.context['filtros'].errors
+
+    def test_paginacion_conserva_filtros(self, client, admin, cliente, monkeypatch):
+        monkeypatch.setattr('pedidos.views.PEDIDOS_POR_PAGINA_ADMIN', 2)
+        for _ in range(3):
+            Pedido.objects.create(usuario=cliente, total=Decimal('10.00'), estado='enviado')
+        Pedido.objects.create(usuario=cliente, total=Decimal('10.00'))
+
+        primera = self.listar(client, admin, estado='enviado')
+        segunda = self.listar(client, admin, estado='enviado', cursor=primera.siguiente)
+
+        assert len(primera) == 2
+        assert [p.estado for p in segunda] == ['enviado']
+        assert segunda.siguiente is None
+
+
+@pytest.mark.django_db
+class TestClavesIdempotencia:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(username="comprador", email="comprador@example.com", password="password123")
+
+    @pytest.fixture
+    def libro(self):
+        autor = Autor.objects.create(nombre="Autor de prueba")
+        return Libro.objects.create(titulo="Libro de prueba", precio=Decimal('25.99'), stock=3, autor=autor)
+
+    @pytest.fixture
+    def cliente(self, client, usuario, libro):
+        carrito = Carrito.objects.create(usuario=usuario)
+        ItemCarrito.objects.create(carrito=carrito, libro=libro, cantidad=2)
+        client.force_login(usuario)
+        return client
+
+    def confirmar(self, cliente):
+        response = cliente.get(reverse('confirmar_pedido'))
+        clave = response.context['clave_idempotencia']
+        assert f'value="{clave}"' in response.content.decode()
+        return clave
+
+    def procesar(self, cliente, clave):
+        return cliente.post(reverse('procesar_pedido'), {'direccion': 'Calle 1', 'clave_idempotencia': clave})
+
+    def test_reenvio_devuelve_el_mismo_pedido(self, cliente, libro):
+        clave = self.confirmar(cliente)
+        primera = self.procesar(cliente, clave)
+
+        with CaptureQueriesContext(connection) as consultas:
+            segunda = self.procesar(cliente, clave)
+
+        assert primera.url == segunda.url == reverse('historial_pedidos')
+        assert Pedido.objects.count() == 1
+        libro.refresh_from_db()
+        assert libro.stock == 1
+        sql = " ".join(q['sql'] for q in consultas.captured_queries)
+        assert 'libros_libro' not in sql
+        assert 'SAVEPOINT' not in sql
+        pedido = Pedido.objects.get()
+        assert ClaveIdempotencia.objects.get(clave=clave).pedido == pedido
+        mensajes = [str(m) for m in get_messages(segunda.wsgi_request)]
+        assert any(pedido.numero_orden in m for m in mensajes)
+
+    def test_reenvio_con_el_pedido_borrado(self, cliente):
+        clave = self.confirmar(cliente)
+        self.procesar(cliente, clave)
+        Pedido.objects.all().delete()
+
+        response = self.procesar(cliente, clave)
+
+        assert response.url == reverse('historial_pedidos')
+        assert not Pedido.objects.exists()
+        mensajes = [str(m) for m in get_messages(response.wsgi_request)]
+        assert "Este pedido ya se había procesado." in mensajes
+
+    def test_fallo_por_stock_se_repite(self, cliente, libro):
+        libro.stock = 1
+        libro.save()
+        clave = self.confirmar(cliente)
+
+        primera = self.procesar(cliente, clave)
+        libro.stock = 10
+        libro.save()
+        segunda = self.procesar(cliente, clave)
+
+        assert primera.url == segunda.url == reverse('ver_carrito')
+        assert not Pedido.objects.exists()
+        assert ClaveIdempotencia.objects.get(clave=clave).estado == 'fallido'
+        # Una clave nueva sí vuelve a intentar la compra
+        assert self.procesar(cliente, self.confirmar(cliente)).url == reverse('historial_pedidos')
+        assert Pedido.objects.count() == 1
+
+    def test_clave_de_otro_usuario(self, cliente, libro):
+        otro = Usuario.objects.create_user(username="otro", email="otro@example.com", password="password123")
+        ClaveIdempotencia.objects.create(clave="compartida", usuario=otro, expira=timezone.now() + timedelta(hours=1))
+
+        response = self.procesar(cliente, "compartida")
+
+        assert response.url == reverse('confirmar_pedido')
+        assert not Pedido.objects.exists()
+
+    def test_error_inesperado_libera_la_clave(self, cliente):
+        clave = self.confirmar(cliente)
+        with patch('pedidos.views.crear_pedido', side_effect=RuntimeError):
+            with pytest.raises(RuntimeError):
+                self.procesar(cliente, clave)
+
+        assert not ClaveIdempotencia.objects.filter(clave=clave).exists()
+        assert self.procesar(cliente, clave).url == reverse('historial_pedidos')
+
+    def test_purgar_vencidas(self, usuario):
+        ClaveIdempotencia.objects.create(clave="vieja", usuario=usuario, expira=timezone.now() - timedelta(hours=1))
+        ClaveIdempotencia.objects.create(clave="vigente", usuario=usuario, expira=timezone.now() + timedelta(hours=1))
+
+        call_command('purgar_claves_idempotencia')
+
+        assert list(ClaveIdempotencia.objects.values_list('clave', flat=True)) == ["vigente"]
@@ -0,0 +1,98 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from usuarios.models import Usuario
+from libros.models import Libro, Autor
+from carrito.models import Carrito, ItemCarrito
+from carrito.precios import calcular_resumen, obtener_resumen
+from pedidos.models import Cupon
+
+@pytest.mark.django_db
+class TestResumenCarrito:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="password123"
+        )
+
+    @pytest.fixture
+    def carrito(self, usuario):
+        carrito = Carrito.objects.create(usuario=usuario)
+        autor = Autor.objects.create(nombre="Autor Test")
+        for precio, cantidad in [('19.99', 2), ('5.50', 1), ('0.33', 3)]:
+            libro = Libro.objects.create(
+                titulo=f"Libro {precio}",
+                autor=autor,
+                descripcion="Descripción",
+                precio=Decimal(precio),
+                stock=10,
+                formato="fisico"
+            )
+            ItemCarrito.objects.create(carrito=carrito, libro=libro, cantidad=cantidad)
+        return carrito
+
+    @pytest.fixture
+    def cupon(self):
+        now = timezone.now()
+        return Cupon.objects.create(
+            codigo="DESC15",
+            descuento=15,
+            fecha_inicio=now - timedelta(days=1),
+            fecha_expiracion=now + timedelta(days=1),
+        )
+
+    def test_resumen_en_una_consulta(self, carrito, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            resumen = calcular_resumen(carrito)
+
+        assert [item.subtotal for item in resumen.items] == [Decimal('39.98'), Decimal('5.50'), Decimal('0.99')]
+        assert resumen.cantidad_articulos == 6
+        assert resumen.subtotal == Decimal('46.47')
+        assert resumen.descuento == Decimal('0.00')
+        assert resumen.total == Decimal('46.47')
+
+    def test_descuento_redondeado_a_centavos(self, carrito, cupon):
+        resumen = calcular_resumen(carrito, cupon)
+
+        assert resumen.descuento == Decimal('6.97')
+        assert resumen.total == Decimal('39.50')
+        assert carrito.aplicar_cupon(cupon) == Decimal('39.50')
+
+    def test_cupon_expirado_no_descuenta(self, carrito, cupon):
+        cupon.fecha_expiracion = timezone.now() - timedelta(minutes=1)
+        cupon.save()
+
+        resumen = calcular_resumen(carrito, cupon)
+
+        assert resumen.cupon is None
+        assert resumen.cupon_invalido
+        assert resumen.total == resumen.subtotal
+
+    def test_memorizado_por_peticion(self, usuario, carrito, django_assert_num_queries):
+        request = RequestFactory().get('/')
+        request.user = usuario
+        SessionMiddleware(lambda req: None).process_request(request)
+
+        primero = obtener_resumen(request)
+        with django_assert_num_queries(0):
+            assert obtener_resumen(request) is primero
+
+    def test_vista_carrito_con_cupon(self, usuario, carrito, cupon):
+        client = Client()
+        client.force_login(usuario)
+        session = client.session
+        session['cupon_id'] = cupon.id
+        session.save()
+
+        response = client.get(reverse('ver_carrito'))
+
+        assert response.context['resumen'].total == Decimal('39.50')
+        contenido = response.content.decode()
+        assert "Descuento de 15%" in contenido
+        assert "$39,50" in contenido  # LANGUAGE_CODE es-co
@@ -0,0 +1,108 @@
+import pytest
+import numpy as np
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from usuarios.models import Usuario
+from libros.models import Libro, Autor
+from carrito.models import Carrito, ItemCarrito
+from pedidos.models import Pedido, DetallePedido, CompraConjunta
+from pedidos.recomendaciones import construir_matriz, mejores_vecinos, recomendaciones_para
+
+class TestMatrizCoCompra:
+    def test_cuenta_pedidos_en_comun(self):
+        lineas = [(1, 10), (1, 20), (2, 10), (2, 20), (2, 30), (3, 30), (3, 30)]
+        libro_ids = np.array([10, 20, 30])
+
+        matriz = construir_matriz(lineas, libro_ids).toarray()
+
+        assert matriz.tolist() == [
+            [0, 2, 1],
+            [2, 0, 1],
+            [1, 1, 0],
+        ]
+
+    def test_lotes_pequenos_no_parten_pedidos(self):
+        lineas = [(p, l) for p in range(50) for l in (1, 2, 3)]
+        libro_ids = np.array([1, 2, 3])
+
+        completa = construir_matriz(lineas, libro_ids).toarray()
+        por_lotes = construir_matriz(lineas, libro_ids, lineas_por_lote=2).toarray()
+
+        assert (completa == por_lotes).all()
+        assert completa[0, 1] == 50
+
+    def test_mejores_vecinos_desempata_por_id(self):
+        lineas = [(1, 1), (1, 2), (1, 3), (2, 1), (2, 2)]
+        libro_ids = np.array([1, 2, 3])
+        matriz = construir_matriz(lineas, libro_ids)
+
+        assert mejores_vecinos(matriz, libro_ids, 0) == [(2, 2), (3, 1)]
+        assert mejores_vecinos(matriz, libro_ids, 2) == [(2, 1), (1, 1)]
+
+@pytest.mark.django_db
+class TestRecomendaciones:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="password123"
+        )
+
+    @pytest.fixture
+    def libros(self):
+        autor = Autor.objects.create(nombre="Autor Test")
+        return [
+            Libro.objects.create(
+                titulo=f"Libro {i}",
+                autor=autor,
+                descripcion="Descripción",
+                precio=Decimal('10.00'),
+                stock=10,
+                formato="fisico"
+            )
+            for i in range(4)
+        ]
+
+    @pytest.fixture
+    def historial(self, usuario, libros):
+        a, b, c, d = libros
+        for estado, comprados in [('pagado', [a, b]), ('entregado', [a, b, c]),
+                                  ('pendiente', [a, c]), ('cancelado', [a, d])]:
+            pedido = Pedido.objects.create(usuario=usuario, total=Decimal('10.00'), estado=estado)
+            for libro in comprados:
+                DetallePedido.objects.create(pedido=pedido, libro=libro, cantidad=1, precio_unitario=libro.precio)
+
+    def test_comando_guarda_vecinos(self, historial, libros):
+        a, b, c, d = libros
+        call_command('calcular_recomendaciones', lote=2)
+
+        vecinos = list(CompraConjunta.objects.filter(libro=a).order_by('posicion')
+                       .values_list('recomendado_id', 'veces'))
+        # Los pedidos cancelados no cuentan
+        assert vecinos == [(c.id, 2), (b.id, 2)]
+        assert not CompraConjunta.objects.filter(recomendado=d).exists()
+
+    def test_recomendaciones_para_excluye_lo_que_ya_esta(self, historial, libros, django_assert_num_queries):
+        a, b, c, d = libros
+        call_command('calcular_recomendaciones')
+
+        with django_assert_num_queries(1):
+            recomendados = recomendaciones_para([a.id, b.id])
+
+        assert [libro.id for libro in recomendados] == [c.id]
+
+    def test_se_muestran_en_el_carrito(self, historial, usuario, libros):
+        a, b, c, d = libros
+        call_command('calcular_recomendaciones')
+        carrito = Carrito.objects.create(usuario=usuario)
+        ItemCarrito.objects.create(carrito=carrito, libro=b, cantidad=1)
+        client = Client()
+        client.force_login(usuario)
+
+        response = client.get(reverse('ver_carrito'))
+
+        assert [libro.id for libro in response.context['recomendaciones']] == [a.id, c.id]
+        assert "Los clientes también compraron" in response.content.decode()
@@ -0,0 +1,205 @@
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from usuarios.models import Usuario
+from libros.models import Libro, Autor, Categoria, LibroRelacionado, RelacionadoPendiente
+from libros import relacionados
+from libros.relacionados import calcular_todos
+
+@pytest.mark.django_db
+class TestLibrosRelacionados:
+    @pytest.fixture
+    def catalogo(self):
+        autor = Autor.objects.create(nombre="Autor A")
+        otro = Autor.objects.create(nombre="Autor B")
+        novela = Categoria.objects.create(nombre="Novela")
+        historia = Categoria.objects.create(nombre="Historia")
+        poesia = Categoria.objects.create(nombre="Poesía")
+
+        def libro(titulo, autor, *categorias):
+            libro = Libro.objects.create(
+                titulo=titulo,
+                autor=autor,
+                descripcion="Descripción",
+                precio=Decimal('10.00'),
+                stock=5,
+                formato="fisico"
+            )
+            libro.categorias.add(*categorias)
+            return libro
+
+        return {
+            'base': libro("Base", autor, novela, historia),
+            'dos_categorias': libro("Dos categorías", otro, novela, historia),
+            'mismo_autor': libro("Mismo autor", autor),
+            'una_categoria': libro("Una categoría", otro, novela),
+            'sin_relacion': libro("Sin relación", otro, poesia),
+        }
+
+    def vecinos(self, libro):
+        return list(
+            LibroRelacionado.objects.filter(libro=libro).order_by('posicion')
+            .values_list('relacionado__titulo', 'puntuacion')
+        )
+
+    def test_se_mantienen_con_las_senales(self, catalogo):
+        # A igual puntuación gana el libro más reciente
+        assert self.vecinos(catalogo['base']) == [
+            ("Mismo autor", 2),
+            ("Dos categorías", 2),
+            ("Una categoría", 1),
+        ]
+
+    def test_calculo_por_lotes_coincide_con_el_incremental(self, catalogo):
+        incremental = {libro.id: self.vecinos(libro) for libro in Libro.objects.all()}
+        LibroRelacionado.objects.all().delete()
+
+        assert calcular_todos(tamano_lote=2) == 5
+        assert {libro.id: self.vecinos(libro) for libro in Libro.objects.all()} == incremental
+
+    def test_comando(self, catalogo):
+        LibroRelacionado.objects.all().delete()
+        call_command('calcular_relacionados', lote=3)
+
+        assert self.vecinos(catalogo['base'])[0] == ("Mismo autor", 2)
+
+    def test_cambio_de_categorias_actualiza_vecinos(self, catalogo):
+        poesia = Categoria.objects.get(nombre="Poesía")
+        catalogo['base'].categorias.add(poesia)
+
+        assert ("Sin relación", 1) in self.vecinos(catalogo['base'])
+        assert ("Base", 1) in self.vecinos(catalogo['sin_relacion'])
+
+    def test_vaciar_una_categoria_actualiza_vecinos(self, catalogo):
+        Categoria.objects.get(nombre="Historia").libro_set.clear()
+
+        assert ("Dos categorías", 1) in self.vecinos(catalogo['base'])
+        assert ("Base", 1) in self.vecinos(catalogo['dos_categorias'])
+
+    def test_borrar_libro_recalcula_a_quien_lo_listaba(self, catalogo):
+        catalogo['dos_categorias'].delete()
+
+        assert [titulo for titulo, _ in self.vecinos(catalogo['base'])] == ["Mismo autor", "Una categoría"]
+
+    def test_vista_detalle_usa_la_tabla(self, catalogo):
+        usuario = Usuario.objects.create_user(
+            username="lector",
+            email="lector@example.com",
+            password="password123"
+        )
+        client = Client()
+        client.force_login(usuario)
+
+        response = client.get(reverse('detalle_libro', args=[catalogo['base'].id]))
+
+        assert [l.titulo for l in response.context['libros_relacionados']] == [
+            "Mismo autor", "Dos categorías", "Una categoría"
+        ]
+
+    def test_lotes_acotados_por_pares(self, catalogo):
+        from unittest import mock
+        from libros import relacionados
+        incremental = {libro.id: self.vecinos(libro) for libro in Libro.objects.all()}
+        lotes = []
+        originales = relacionados._lotes
+
+        def registrar(*args):
+            for lote in originales(*args):
+                lotes.append(len(lote))
+                yield lote
+
+        with mock.patch.object(relacionados, '_lotes', registrar):
+            calcular_todos(tamano_lote=500, max_pares=4)
+
+        # Cada libro comparte con al menos 3 y nadie cabe con otro bajo un tope de 4
+        assert lotes == [1, 1, 1, 1, 1]
+        assert {libro.id: self.vecinos(libro) for libro in Libro.objects.all()} == incremental
+
+    def test_un_libro_nuevo_aparece_en_quien_debe_listarlo(self, catalogo):
+        # Los cuatro vecinos del libro nuevo son del autor B y no incluyen a Base,
+        # pero Base (con un hueco libre) sí debe listarlo por compartir Novela
+        novela = Categoria.objects.get(nombre="Novela")
+        autor_b = catalogo['una_categoria'].autor
+        Libro.objects.create(titulo="Extra", autor=autor_b, descripcion="",
+                             precio=Decimal('10.00'), stock=1, formato="fisico")
+        nuevo = Libro.objects.create(titulo="Nuevo", autor=autor_b, descripcion="",
+                                     precio=Decimal('10.00'), stock=1, formato="fisico")
+        nuevo.categorias.add(novela)
+
+        assert "Base" not in [titulo for titulo, _ in self.vecinos(nuevo)]
+        assert ("Nuevo", 1) in self.vecinos(catalogo['base'])
+
+    def test_recalculo_parcial_con_matrices(self, catalogo):
+        incremental = {libro.id: self.vecinos(libro) for libro in Libro.objects.all()}
+        LibroRelacionado.objects.all().delete()
+
+        assert calcular_todos(libro_ids=[catalogo['base'].id, 999]) == 1
+        assert self.vecinos(catalogo['base']) == incremental[catalogo['base'].id]
+        assert LibroRelacionado.objects.values('libro_id').distinct().count() == 1
+
+    def tabla(self):
+        return {libro.id: self.vecinos(libro) for libro in Libro.objects.all()}
+
+    def nuevo(self, titulo, autor, *categorias):
+        libro = Libro.objects.create(titulo=titulo, autor=autor, descripcion="",
+                                     precio=Decimal('10.00'), stock=1, formato="fisico")
+        libro.categorias.add(*categorias)
+        return libro
+
+    def test_incremental_coincide_con_el_calculo_completo(self, catalogo):
+        novela, historia, poesia = (Categoria.objects.get(nombre=n) for n in ("Novela", "Historia", "Poesía"))
+        autor_b = catalogo['una_categoria'].autor
+        extra = [self.nuevo(f"Extra {i}", autor_b, novela) for i in range(4)]
+        catalogo['base'].categorias.remove(historia)
+        catalogo['sin_relacion'].autor = catalogo['base'].autor
+        catalogo['sin_relacion'].save()
+        poesia.libro_set.add(catalogo['base'], extra[0])
+        novela.libro_set.remove(extra[1])
+        incremental = self.tabla()
+
+        LibroRelacionado.objects.all().delete()
+        calcular_todos()
+
+        assert self.tabla() == incremental
+        assert not RelacionadoPendiente.objects.exists()
+
+    def test_categoria_grande_se_encola(self, catalogo, monkeypatch, django_capture_on_commit_callbacks):
+        monkeypatch.setattr(relacionados, 'MAX_INCREMENTAL', 2)
+        novela = Categoria.objects.get(nombre="Novela")
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            nuevo = self.nuevo("Nuevo", Autor.objects.create(nombre="Autor C"), novela)
+
+        # Su propia lista sí se calcula en la petición; las de Novela quedan encoladas
+        assert [titulo for titulo, _ in self.vecinos(nuevo)] == ["Una categoría", "Dos categorías", "Base"]
+        assert ("Nuevo", 1) not in self.vecinos(catalogo['base'])
+        assert list(RelacionadoPendiente.objects.values_list('libro_id', flat=True)) == [nuevo.id]
+        assert callbacks == [relacionados.programar_pendientes]
+
+        call_command('calcular_relacionados', '--pendientes')
+
+        assert ("Nuevo", 1) in self.vecinos(catalogo['base'])
+        assert not RelacionadoPendiente.objects.exists()
+        incremental = self.tabla()
+        calcular_todos()
+        assert self.tabla() == incremental
+
+    def test_anadir_muchos_libros_a_una_categoria_se_encola(self, catalogo, monkeypatch, settings):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        settings.RELACIONADOS_EN_SEGUNDO_PLANO = False
+        monkeypatch.setattr(relacionados, 'MAX_CAMBIADOS', 2)
+        poesia = Categoria.objects.get(nombre="Poesía")
+        libros = [catalogo['base'], catalogo['mismo_autor'], catalogo['una_categoria']]
+
+        with CaptureQueriesContext(connection) as consultas:
+            poesia.libro_set.add(*libros)
+
+        assert len(consultas) < 15
+        assert sorted(RelacionadoPendiente.objects.values_list('libro_id', flat=True)) == sorted(l.id for l in libros)
+        relacionados.procesar_pendientes()
+        incremental = self.tabla()
+        calcular_todos()
+        assert self.tabla() == incremental
@@ -0,0 +1,135 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from usuarios.models import Usuario
+from libros.models import Autor, Categoria, Libro
+from pedidos.estados import cambiar_estado
+from pedidos.models import Cupon, DetallePedido, Pedido
+from reportes.agregacion import actualizar_reportes
+from reportes.models import (VentaCategoriaDiaria, VentaCuponDiaria, VentaDiaria,
+                             VentaFormatoDiaria, VentaLibroDiaria)
+
+@pytest.mark.django_db
+class TestResumenesVentas:
+    @pytest.fixture
+    def usuario(self):
+        return Usuario.objects.create_user(username="admin", email="admin@example.com",
+                                           password="password123", is_superuser=True)
+
+    @pytest.fixture
+    def libros(self):
+        autor = Autor.objects.create(nombre="Autor")
+        novela = Categoria.objects.create(nombre="Novela")
+        historia = Categoria.objects.create(nombre="Historia")
+        fisico = Libro.objects.create(titulo="Físico", autor=autor, descripcion="", precio=Decimal('20.00'),
+                                      stock=50, formato="fisico")
+        digital = Libro.objects.create(titulo="Digital", autor=autor, descripcion="", precio=Decimal('5.00'),
+                                       stock=50, formato="digital")
+        fisico.categorias.add(novela, historia)
+        digital.categorias.add(novela)
+        return fisico, digital
+
+    @pytest.fixture
+    def cupon(self):
+        return Cupon.objects.create(codigo="DIEZ", descuento=10, fecha_inicio=timezone.now(),
+                                    fecha_expiracion=timezone.now() + timedelta(days=1))
+
+    def crear_pedido(self, usuario, lineas, hace_dias=0, cupon=None, total=None):
+        subtotal = sum(libro.precio * cantidad for libro, cantidad in lineas)
+        pedido = Pedido.objects.create(usuario=usuario, total=total or subtotal, cupon=cupon)
+        for libro, cantidad in lineas:
+            DetallePedido.objects.create(pedido=pedido, libro=libro, cantidad=cantidad, precio_unitario=libro.precio)
+        if hace_dias:
+            Pedido.objects.filter(id=pedido.id).update(fecha_creacion=timezone.now() - timedelta(days=hace_dias))
+        return pedido
+
+    def test_agrega_por_dimension(self, usuario, libros, cupon):
+        fisico, digital = libros
+        hoy = timezone.localdate()
+        self.crear_pedido(usuario, [(fisico, 2), (digital, 1)], cupon=cupon, total=Decimal('40.50'))
+        self.crear_pedido(usuario, [(digital, 3)])
+        self.crear_pedido(usuario, [(fisico, 1)], hace_dias=1)
+
+        actualizar_reportes()
+
+        diaria = VentaDiaria.objects.get(dia=hoy)
+        assert (diaria.pedidos, diaria.unidades, diaria.ingresos) == (2, 6, Decimal('55.50'))
+        assert VentaDiaria.objects.get(dia=hoy - timedelta(days=1)).ingresos == Decimal('20.00')
+        assert dict(VentaLibroDiaria.objects.filter(dia=hoy).values_list('libro__titulo', 'unidades')) == {
+            "Físico": 2, "Digital": 4}
+        assert dict(VentaCategoriaDiaria.objects.filter(dia=hoy).values_list('categoria__nombre', 'ingresos')) == {
+            "Novela": Decimal('60.00'), "Historia": Decimal('40.00')}
+        assert dict(VentaFormatoDiaria.objects.filter(dia=hoy).values_list('formato', 'unidades')) == {
+            "fisico": 2, "digital": 4}
+        cupon_dia = VentaCuponDiaria.objects.get(dia=hoy)
+        assert (cupon_dia.cupon, cupon_dia.pedidos, cupon_dia.unidades, cupon_dia.ingresos) == (
+            cupon, 1, 3, Decimal('40.50'))
+
+    def test_incremental_solo_dias_modificados(self, usuario, libros):
+        fisico, _ = libros
+        antiguo = self.crear_pedido(usuario, [(fisico, 1)], hace_dias=40)
+        self.crear_pedido(usuario, [(fisico, 1)])
+        assert len(actualizar_reportes()) == 2
+
+        # Sin cambios no hay nada que recalcular (salvo el margen de solape)
+        Pedido.objects.update(actualizado=timezone.now() - timedelta(hours=1))
+        assert actualizar_reportes() == []
+
+        cambiar_estado(Pedido.objects.filter(id=antiguo.id), 'cancelado')
+        assert actualizar_reportes() == [timezone.localdate() - timedelta(days=40)]
+        assert not VentaDiaria.objects.filter(dia=timezone.localdate() - timedelta(days=40)).exists()
+        assert VentaDiaria.objects.filter(dia=timezone.localdate()).exists()
+
+    def test_desde_cero(self, usuario, libros):
+        pedido = self.crear_pedido(usuario, [(libros[0], 1)])
+        actualizar_reportes()
+        pedido.delete()
+
+        call_command('actualizar_reportes', '--desde-cero')
+
+        assert not VentaDiaria.objects.exists()
+        assert not VentaLibroDiaria.objects.exists()
+
+    def test_desde_cero_sin_vaciar_las_tablas(self, usuario, libros):
+        hoy = timezone.localdate()
+        self.crear_pedido(usuario, [(libros[0], 1)])
+        borrado = self.crear_pedido(usuario, [(libros[1], 2)], hace_dias=40)
+        actualizar_reportes()
+        borrado.delete()
+
+        with CaptureQueriesContext(connection) as consultas:
+            dias = actualizar_reportes(desde_cero=True)
+
+        assert dias == [hoy - timedelta(days=40), hoy]
+        assert list(VentaDiaria.objects.values_list('dia', flat=True)) == [hoy]
+        assert not VentaLibroDiaria.objects.filter(dia=hoy - timedelta(days=40)).exists()
+        # Cada DELETE se limita a los días de su lote
+        borrados = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('DELETE')]
+        assert borrados and all('"dia" IN' in sql for sql in borrados)
+
+    def test_panel_solo_lee_resumenes(self, client, usuario, libros, cupon):
+        self.crear_pedido(usuario, [(libros[0], 2)], cupon=cupon)
+        actualizar_reportes()
+        client.force_login(usuario)
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = client.get(reverse('panel_ventas'))
+
+        assert response.status_code == 200
+        assert response.context['totales']['unidades'] == 2
+        assert [fila['libro__titulo'] for fila in response.context['libros']] == ["Físico"]
+        assert [(fila['cupon__codigo'], fila['unidades']) for fila in response.context['cupones']] == [("DIEZ", 2)]
+        sql = " ".join(q['sql'] for q in consultas.captured_queries)
+        assert 'pedidos_pedido' not in sql
+        assert 'pedidos_detallepedido' not in sql
+
+    def test_panel_requiere_superusuario(self, client):
+        normal = Usuario.objects.create_user(username="cliente", email="cliente@example.com", password="password123")
+        client.force_login(normal)
+
+        assert client.get(reverse('panel_ventas')).status_code == 302
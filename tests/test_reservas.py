@@ -0,0 +1,183 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from usuarios.models import Usuario
+from libros.models import Libro, Autor
+from carrito.models import Carrito, ItemCarrito
+from carrito.operaciones import _sumar_orm, actualizar_cantidades, sumar_al_carrito
+from carrito.precios import calcular_resumen
+from carrito.reservas import liberar_vencidas
+from pedidos.compra import StockInsuficiente, crear_pedido
+
+@pytest.mark.django_db
+class TestReservas:
+    @pytest.fixture
+    def libro(self):
+        autor = Autor.objects.create(nombre="Autor Test")
+        return Libro.objects.create(titulo="Libro", autor=autor, descripcion="",
+                                    precio=Decimal('10.00'), stock=5, formato="fisico")
+
+    def crear_carrito(self, nombre):
+        usuario = Usuario.objects.create_user(username=nombre, email=f"{nombre}@example.com",
+                                              password="password123")
+        return Carrito.objects.create(usuario=usuario)
+
+    def vencer(self, *carritos):
+        ItemCarrito.objects.filter(carrito__in=carritos).update(
+            reservado_hasta=timezone.now() - timedelta(minutes=1))
+
+    def test_anadir_reserva_para_otros_carritos(self, libro):
+        primero, segundo = self.crear_carrito("primero"), self.crear_carrito("segundo")
+
+        assert sumar_al_carrito(primero.id, libro.id, 3) == 3
+        assert sumar_al_carrito(segundo.id, libro.id, 3) is None
+        assert sumar_al_carrito(segundo.id, libro.id, 2) == 2
+
+        libro.refresh_from_db()
+        assert (libro.reservado, libro.unidades_disponibles, libro.disponible()) == (5, 0, False)
+        linea = primero.items.get()
+        assert linea.reservada == 3
+        assert linea.reservado_hasta > timezone.now()
+
+    def test_variante_orm_reserva_igual(self, libro):
+        carrito = self.crear_carrito("orm")
+
+        assert _sumar_orm(carrito.id, libro.id, 2) == 2
+        assert _sumar_orm(carrito.id, libro.id, 3) == 5
+        assert _sumar_orm(carrito.id, libro.id, 1) is None
+        assert Libro.objects.get(id=libro.id).reservado == 5
+        assert carrito.items.get().reservada == 5
+
+    def test_cambiar_cantidades_ajusta_la_reserva(self, libro):
+        carrito, otro = self.crear_carrito("comprador"), self.crear_carrito("otro")
+        sumar_al_carrito(carrito.id, libro.id, 2)
+        sumar_al_carrito(otro.id, libro.id, 2)
+        linea = carrito.items.get()
+
+        resultado = actualizar_cantidades(carrito, {linea.id: 4})
+        assert resultado.sin_stock and Libro.objects.get(id=libro.id).reservado == 4
+
+        actualizar_cantidades(carrito, {linea.id: 3})
+        assert Libro.objects.get(id=libro.id).reservado == 5
+        actualizar_cantidades(carrito, {linea.id: 1})
+        assert Libro.objects.get(id=libro.id).reservado == 3
+        actualizar_cantidades(carrito, {linea.id: 0})
+        assert Libro.objects.get(id=libro.id).reservado == 2
+
+    def test_subir_una_linea_vencida_la_reserva_entera(self, libro):
+        carrito = self.crear_carrito("comprador")
+        sumar_al_carrito(carrito.id, libro.id, 3)
+        self.vencer(carrito)
+        liberar_vencidas()
+        linea = carrito.items.get()
+
+        actualizar_cantidades(carrito, {linea.id: 4})
+
+        linea.refresh_from_db()
+        assert (linea.cantidad, linea.reservada) == (4, 4)
+        assert linea.reservado_hasta > timezone.now()
+        assert Libro.objects.get(id=libro.id).reservado == 4
+        assert crear_pedido(carrito.usuario, calcular_resumen(carrito)).detalles.get().cantidad == 4
+
+    def test_eliminar_libera_la_reserva(self, client, libro):
+        carrito = self.crear_carrito("comprador")
+        sumar_al_carrito(carrito.id, libro.id, 2)
+        client.force_login(carrito.usuario)
+
+        client.get(reverse('eliminar_del_carrito', args=[carrito.items.get().id]))
+
+        assert not carrito.items.exists()
+        assert Libro.objects.get(id=libro.id).reservado == 0
+
+    def test_liberar_vencidas_por_lotes(self, libro):
+        carritos = [self.crear_carrito(f"c{i}") for i in range(5)]
+        for carrito in carritos:
+            sumar_al_carrito(carrito.id, libro.id, 1)
+        self.vencer(*carritos[:3])
+
+        assert liberar_vencidas(lote=2) == 3
+
+        libro.refresh_from_db()
+        assert libro.reservado == 2
+        # Las líneas siguen en el carrito, sin reserva
+        assert ItemCarrito.objects.count() == 5
+        assert ItemCarrito.objects.filter(reservada=0, reservado_hasta__isnull=True).count() == 3
+        assert liberar_vencidas() == 0
+
+    def test_comando(self, libro):
+        carrito = self.crear_carrito("comprador")
+        sumar_al_carrito(carrito.id, libro.id, 2)
+        self.vencer(carrito)
+        salida = StringIO()
+
+        call_command('liberar_reservas', '--lote', '10', stdout=salida)
+
+        assert "1 reservas vencidas liberadas" in salida.getvalue()
+        assert Libro.objects.get(id=libro.id).reservado == 0
+
+    def test_comprar_consume_la_reserva(self, libro):
+        carrito, otro = self.crear_carrito("comprador"), self.crear_carrito("otro")
+        sumar_al_carrito(carrito.id, libro.id, 3)
+        sumar_al_carrito(otro.id, libro.id, 2)
+
+        pedido = crear_pedido(carrito.usuario, calcular_resumen(carrito))
+
+        libro.refresh_from_db()
+        assert pedido.detalles.get().cantidad == 3
+        assert (libro.stock, libro.reservado) == (2, 2)
+
+    def test_sin_reserva_se_valida_contra_lo_libre(self, libro):
+        carrito, otro = self.crear_carrito("comprador"), self.crear_carrito("otro")
+        sumar_al_carrito(carrito.id, libro.id, 3)
+        self.vencer(carrito)
+        liberar_vencidas()
+        # Mientras tanto otro carrito retiene casi todo el stock
+        sumar_al_carrito(otro.id, libro.id, 4)
+
+        with pytest.raises(StockInsuficiente):
+            crear_pedido(carrito.usuario, calcular_resumen(carrito))
+
+        libro.refresh_from_db()
+        assert (libro.stock, libro.reservado) == (5, 4)
+
+    def test_editar_el_libro_no_pisa_las_reservas(self, client, libro):
+        from unittest import mock
+        from libros.models import Categoria
+        from libros.views import LibroUpdateView
+        carrito = self.crear_carrito("comprador")
+        categoria = Categoria.objects.create(nombre="Novela")
+        form_valid = LibroUpdateView.form_valid
+
+        def reservar_entre_medias(vista, form):
+            # El libro ya está leído por la vista cuando un carrito reserva
+            sumar_al_carrito(carrito.id, libro.id, 2)
+            return form_valid(vista, form)
+
+        with mock.patch.object(LibroUpdateView, 'form_valid', reservar_entre_medias):
+            response = client.post(reverse('editar_libro', args=[libro.id]), {
+                'titulo': "Libro editado", 'autor': libro.autor_id, 'categorias': [categoria.id],
+                'descripcion': "Nueva", 'precio': '12.00', 'stock': 8, 'formato': 'fisico',
+            })
+
+        assert response.status_code == 302
+        libro.refresh_from_db()
+        assert (libro.titulo, libro.stock, libro.reservado) == ("Libro editado", 8, 2)
+
+    def test_comprar_conserva_las_lineas_anadidas_despues(self, libro):
+        otro_libro = Libro.objects.create(titulo="Otro", autor=libro.autor, descripcion="",
+                                          precio=Decimal('5.00'), stock=4, formato="fisico")
+        carrito = self.crear_carrito("comprador")
+        sumar_al_carrito(carrito.id, libro.id, 1)
+        resumen = calcular_resumen(carrito)
+        # Desde otra pestaña, antes de confirmar
+        sumar_al_carrito(carrito.id, otro_libro.id, 2)
+
+        crear_pedido(carrito.usuario, resumen)
+
+        linea = carrito.items.get()
+        assert (linea.libro_id, linea.reservada) == (otro_libro.id, 2)
+        assert Libro.objects.get(id=otro_libro.id).reservado == 2